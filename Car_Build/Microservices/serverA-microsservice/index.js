@@ -115,12 +115,22 @@ async function connectToDatabase() {
   }
 }
 
-// Função para buscar peças do banco de dados
+// Função para buscar peças do banco de dados, com a versão do catálogo do modelo
 async function getPecasFromDatabase(modelo) {
   const startTime = Date.now();
   const client = await pool.connect();
   
   try {
+    // Versão lida antes das peças: se o catálogo mudar entre as duas consultas,
+    // a P-API guarda a versão antiga e recarrega as peças na próxima revalidação
+    let versao = "";
+    try {
+      versao = await getVersaoFromDatabase(modelo, client);
+    } catch (error) {
+      // Banco criado antes da tabela catalogo_versao: peças sem versão
+      if (error.code !== "42P01") throw error;
+    }
+
     const query = `
       SELECT id, nome, valor 
       FROM pecas 
@@ -133,7 +143,7 @@ async function getPecasFromDatabase(modelo) {
     dbQueriesTotal.labels('success').inc();
     dbQueryDuration.observe((Date.now() - startTime) / 1000);
     
-    return result.rows;
+    return { pecas: result.rows, versao };
   } catch (error) {
     // Registra erro da query
     dbQueriesTotal.labels('error').inc();
@@ -143,6 +153,24 @@ async function getPecasFromDatabase(modelo) {
   }
 }
 
+// Versão do catálogo de um modelo (tabela catalogo_versao, mantida por trigger)
+async function getVersaoFromDatabase(modelo, db = pool) {
+  const startTime = Date.now();
+  try {
+    const result = await db.query(
+      "SELECT versao FROM catalogo_versao WHERE modelo = LOWER($1)",
+      [modelo]
+    );
+    dbQueriesTotal.labels('success').inc();
+    dbQueryDuration.observe((Date.now() - startTime) / 1000);
+    // Modelo sem nenhuma peça cadastrada ainda: versão "0"
+    return result.rows.length > 0 ? String(result.rows[0].versao) : "0";
+  } catch (error) {
+    dbQueriesTotal.labels('error').inc();
+    throw error;
+  }
+}
+
 const catalogoService = {
   GetPecas: async (call, callback) => {
     const startTime = Date.now();
@@ -154,7 +182,7 @@ const catalogoService = {
 
     try {
       // Busca peças no banco de dados
-      const pecasDoModelo = await getPecasFromDatabase(modelo);
+      const { pecas: pecasDoModelo, versao } = await getPecasFromDatabase(modelo);
 
       // Converte os dados para o formato esperado pelo gRPC
       const pecasFormatadas = pecasDoModelo.map((peca) => ({
@@ -165,6 +193,7 @@ const catalogoService = {
 
       const response = {
         pecas: pecasFormatadas,
+        versao,
       };
 
       console.log(
@@ -189,6 +218,30 @@ const catalogoService = {
       });
     }
   },
+
+  GetVersao: async (call, callback) => {
+    const startTime = Date.now();
+    const { modelo } = call.request;
+
+    try {
+      const versao = await getVersaoFromDatabase(modelo);
+
+      grpcRequestsTotal.labels('GetVersao', 'success').inc();
+      grpcRequestDuration.labels('GetVersao').observe((Date.now() - startTime) / 1000);
+
+      callback(null, { versao });
+    } catch (error) {
+      grpcRequestsTotal.labels('GetVersao', 'error').inc();
+      grpcRequestDuration.labels('GetVersao').observe((Date.now() - startTime) / 1000);
+
+      // Banco criado antes da tabela catalogo_versao: a P-API volta a usar só o GetPecas
+      const code = error.code === "42P01" ? grpc.status.UNIMPLEMENTED : grpc.status.INTERNAL;
+      callback({
+        code,
+        message: `Erro ao buscar versão do catálogo: ${error.message}`,
+      });
+    }
+  },
 };
 
 // Inicializar servidor
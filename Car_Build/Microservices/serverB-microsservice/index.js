@@ -1,5 +1,7 @@
+const crypto = require("crypto");
 const grpc = require("@grpc/grpc-js");
 const protoLoader = require("@grpc/proto-loader");
+const { Pool } = require("pg");
 const express = require("express");
 const promClient = require("prom-client");
 
@@ -42,6 +44,13 @@ const valorTotalCompras = new promClient.Counter({
   registers: [register]
 });
 
+const idempotenciaRequisicoes = new promClient.Counter({
+  name: 'server_b_idempotency_requests_total',
+  help: 'Compras com Idempotency-Key por resultado (new, replayed, in_progress, conflict, unavailable)',
+  labelNames: ['result'],
+  registers: [register]
+});
+
 // Servidor HTTP Express para expor métricas
 const metricsApp = express();
 metricsApp.get('/metrics', async (req, res) => {
@@ -105,6 +114,153 @@ const calcularFrete = (subtotal, itens) => {
   return freteCalculado;
 };
 
+// Valida o valor total e cria o pedido
+const realizarCompra = (request) => {
+  const { itens, valor_total } = request;
+
+  console.log(
+    `[SERVER B] Processando compra para ${itens.length} tipos de itens`
+  );
+
+  // Validar novamente o preço
+  const { precoTotal, frete, total } = calcularPrecoTotal(itens);
+
+  // Verificar se o valor total confere (tolerância de 1 centavo)
+  if (Math.abs(total - valor_total) > 0.01) {
+    throw new Error(
+      `Valor total não confere. Calculado: R$ ${total.toFixed(2)}, Enviado: R$ ${valor_total.toFixed(2)}`
+    );
+  }
+
+  // Gerar ID único do pedido
+  const pedidoId = `PED-${Date.now()}-${Math.random().toString(36).substr(2, 9).toUpperCase()}`;
+
+  // Simular salvamento no banco (futuramente pode ser implementado)
+  const pedido = {
+    id: pedidoId,
+    itens: itens,
+    subtotal: precoTotal,
+    frete: frete,
+    total: total,
+    data: new Date().toISOString(),
+    status: "CONFIRMADO",
+  };
+
+  console.log(`[SERVER B] Pedido criado:`, {
+    id: pedido.id,
+    total: `R$ ${pedido.total.toFixed(2)}`,
+    itens: pedido.itens.length,
+  });
+
+  const response = {
+    pedido_id: pedidoId,
+    status: "CONFIRMADO",
+    valor_total: total,
+    data_pedido: pedido.data,
+    itens_comprados: itens,
+    subtotal: precoTotal,
+    frete: frete,
+  };
+
+  return response;
+};
+
+// Configuração do PostgreSQL (registro das Idempotency-Key)
+const pool = new Pool({
+  host: process.env.DB_HOST || "localhost",
+  port: process.env.DB_PORT || 5432,
+  database: process.env.DB_NAME || "car_build_db",
+  user: process.env.DB_USER || "car_build_user",
+  password: process.env.DB_PASSWORD || "car_build_password",
+  max: 10,
+  idleTimeoutMillis: 30000,
+  connectionTimeoutMillis: 2000,
+});
+
+// Respostas guardadas por IDEMPOTENCY_TTL_SECONDS; uma compra "em andamento"
+// há mais de IDEMPOTENCY_LOCK_SECONDS é tratada como abandonada (réplica caiu)
+const IDEMPOTENCY_TTL_SECONDS = Number(process.env.IDEMPOTENCY_TTL_SECONDS || 3600);
+const IDEMPOTENCY_LOCK_SECONDS = Number(process.env.IDEMPOTENCY_LOCK_SECONDS || 30);
+
+const erroGrpc = (code, message) => Object.assign(new Error(message), { grpcCode: code });
+
+// Compra com Idempotency-Key (repassada pela P-API no metadata). A chave é
+// registrada no PostgreSQL antes da compra, então repetições vindas de
+// qualquer worker/pod da P-API ou réplica do Server B recebem o mesmo pedido
+async function compraIdempotente(chave, request) {
+  const impressao = crypto.createHash("sha256").update(JSON.stringify(request)).digest("hex");
+
+  let reservada;
+  try {
+    // Reserva a chave; uma resposta vencida ou uma compra abandonada é substituída
+    const result = await pool.query(
+      `INSERT INTO compras_idempotentes (chave, impressao) VALUES ($1, $2)
+       ON CONFLICT (chave) DO UPDATE SET impressao = EXCLUDED.impressao, resposta = NULL, criado_em = NOW()
+       WHERE (compras_idempotentes.resposta IS NOT NULL
+              AND compras_idempotentes.criado_em < NOW() - make_interval(secs => $3))
+          OR (compras_idempotentes.resposta IS NULL
+              AND compras_idempotentes.criado_em < NOW() - make_interval(secs => $4))
+       RETURNING chave`,
+      [chave, impressao, IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_LOCK_SECONDS]
+    );
+    reservada = result.rowCount === 1;
+  } catch (error) {
+    idempotenciaRequisicoes.labels('unavailable').inc();
+    // Banco criado antes da tabela: compra sem deduplicação (a P-API ainda agrupa por worker)
+    if (error.code === "42P01") {
+      console.warn("[SERVER B] Tabela compras_idempotentes ausente, compra sem deduplicação");
+      return realizarCompra(request);
+    }
+    throw erroGrpc(grpc.status.UNAVAILABLE, `Registro de idempotência indisponível: ${error.message}`);
+  }
+
+  if (reservada) {
+    idempotenciaRequisicoes.labels('new').inc();
+    let response;
+    try {
+      response = realizarCompra(request);
+      await pool.query(
+        "UPDATE compras_idempotentes SET resposta = $2 WHERE chave = $1",
+        [chave, JSON.stringify(response)]
+      );
+      return response;
+    } catch (error) {
+      // Só compras concluídas ficam registradas: a próxima repetição tenta de novo
+      await pool.query("DELETE FROM compras_idempotentes WHERE chave = $1", [chave]).catch(() => {});
+      if (response) {
+        throw erroGrpc(grpc.status.UNAVAILABLE, `Registro de idempotência indisponível: ${error.message}`);
+      }
+      throw error;
+    }
+  }
+
+  const { rows } = await pool.query(
+    "SELECT impressao, resposta FROM compras_idempotentes WHERE chave = $1",
+    [chave]
+  ).catch((error) => {
+    throw erroGrpc(grpc.status.UNAVAILABLE, `Registro de idempotência indisponível: ${error.message}`);
+  });
+  if (rows.length === 0 || rows[0].resposta === null) {
+    // Outra réplica está processando a mesma chave (ou acabou de desistir dela)
+    idempotenciaRequisicoes.labels('in_progress').inc();
+    throw erroGrpc(grpc.status.ABORTED, "Compra com esta Idempotency-Key em andamento");
+  }
+  if (rows[0].impressao !== impressao) {
+    idempotenciaRequisicoes.labels('conflict').inc();
+    throw erroGrpc(grpc.status.FAILED_PRECONDITION, "Idempotency-Key já usada com outro corpo de requisição");
+  }
+  idempotenciaRequisicoes.labels('replayed').inc();
+  return { ...rows[0].resposta, repetida: true };
+}
+
+// Remove periodicamente as chaves vencidas
+setInterval(() => {
+  pool.query(
+    "DELETE FROM compras_idempotentes WHERE criado_em < NOW() - make_interval(secs => $1)",
+    [Math.max(IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_LOCK_SECONDS)]
+  ).catch(() => {});
+}, 10 * 60 * 1000).unref();
+
 const pricingService = {
   Calcular: (call, callback) => {
     const startTime = Date.now();
@@ -156,61 +312,22 @@ const pricingService = {
     }
   },
 
-  RealizarCompra: (call, callback) => {
+  RealizarCompra: async (call, callback) => {
     const startTime = Date.now();
-    
-    try {
-      const { itens, valor_total } = call.request;
+    const [chave] = call.metadata.get("idempotency-key");
 
-      console.log(
-        `[SERVER B] Processando compra para ${itens.length} tipos de itens`
-      );
-
-      // Validar novamente o preço
-      const { precoTotal, frete, total } = calcularPrecoTotal(itens);
-
-      // Verificar se o valor total confere (tolerância de 1 centavo)
-      if (Math.abs(total - valor_total) > 0.01) {
-        throw new Error(
-          `Valor total não confere. Calculado: R$ ${total.toFixed(2)}, Enviado: R$ ${valor_total.toFixed(2)}`
-        );
-      }
-
-      // Gerar ID único do pedido
-      const pedidoId = `PED-${Date.now()}-${Math.random().toString(36).substr(2, 9).toUpperCase()}`;
-
-      // Simular salvamento no banco (futuramente pode ser implementado)
-      const pedido = {
-        id: pedidoId,
-        itens: itens,
-        subtotal: precoTotal,
-        frete: frete,
-        total: total,
-        data: new Date().toISOString(),
-        status: "CONFIRMADO",
-      };
-
-      console.log(`[SERVER B] Pedido criado:`, {
-        id: pedido.id,
-        total: `R$ ${pedido.total.toFixed(2)}`,
-        itens: pedido.itens.length,
-      });
-
-      const response = {
-        pedido_id: pedidoId,
-        status: "CONFIRMADO",
-        valor_total: total,
-        data_pedido: pedido.data,
-        itens_comprados: itens,
-        subtotal: precoTotal,
-        frete: frete,
-      };
+    try {
+      const response = chave
+        ? await compraIdempotente(String(chave), call.request)
+        : realizarCompra(call.request);
 
-      // Registra métricas de sucesso
+      // Registra métricas de sucesso (a repetição não é uma compra nova)
       grpcRequestsTotal.labels('RealizarCompra', 'success').inc();
       grpcRequestDuration.labels('RealizarCompra').observe((Date.now() - startTime) / 1000);
-      comprasProcessadas.labels('CONFIRMADO').inc();
-      valorTotalCompras.inc(total);
+      if (!response.repetida) {
+        comprasProcessadas.labels('CONFIRMADO').inc();
+        valorTotalCompras.inc(response.valor_total);
+      }
 
       callback(null, response);
     } catch (error) {
@@ -222,11 +339,39 @@ const pricingService = {
       comprasProcessadas.labels('ERRO').inc();
 
       callback({
-        code: grpc.status.INVALID_ARGUMENT,
+        code: error.grpcCode ?? grpc.status.INVALID_ARGUMENT,
         message: error.message,
       });
     }
   },
+
+  // Vários orçamentos em uma chamada (micro-batching da P-API): cada pedido
+  // recebe o preço ou o erro, na mesma ordem, sem derrubar os demais
+  CalcularLote: (call, callback) => {
+    const startTime = Date.now();
+    const { pedidos } = call.request;
+    let recusados = 0;
+
+    const resultados = pedidos.map(({ itens }) => {
+      try {
+        const { precoTotal, frete, total } = calcularPrecoTotal(itens);
+        return { preco: { preco: precoTotal, frete: frete, total: total } };
+      } catch (error) {
+        recusados += 1;
+        return { erro: error.message };
+      }
+    });
+
+    console.log(
+      `[SERVER B] Lote de ${pedidos.length} orçamentos calculado (${recusados} recusados)`
+    );
+
+    grpcRequestsTotal.labels('CalcularLote', 'success').inc();
+    grpcRequestDuration.labels('CalcularLote').observe((Date.now() - startTime) / 1000);
+    calculosRealizados.inc(pedidos.length - recusados);
+
+    callback(null, { resultados });
+  },
 };
 
 const server = new grpc.Server();
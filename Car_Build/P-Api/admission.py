@@ -0,0 +1,133 @@
+"""
+Controle de admissão (load shedding) adaptativo por endpoint.
+
+Cada endpoint protegido tem um limite de requisições simultâneas ajustado por
+AIMD a partir da latência observada:
+
+- aumento aditivo: +1 a cada requisição rápida quando o endpoint está usando
+  pelo menos metade do limite;
+- redução multiplicativa: limite * P_API_LIMIT_BACKOFF quando a latência passa
+  de P_API_LIMIT_LATENCY_TARGET ou a resposta é 5xx (no máximo uma redução
+  por janela de latência alvo, para um pico não derrubar o limite ao mínimo).
+
+Os 503 dados pela própria P-API (admissão e compartimentos, bulkhead.py) não
+entram no ajuste: um compartimento cheio não diz nada sobre os backends e,
+se contasse, reduziria o limite de todos os endpoints. `rejeitar` marca a
+recusa no scope ASGI (RECUSA_LOCAL).
+
+Requisições acima do limite recebem 503 imediato com `Retry-After`, em vez de
+se acumularem no servidor. Opcionalmente, uma fila pequena
+(P_API_LIMIT_QUEUE_SIZE) segura requisições por até P_API_LIMIT_QUEUE_TIMEOUT
+segundos esperando uma vaga (slots.Vagas, a mesma dos compartimentos).
+
+O middleware é ASGI puro para não adicionar o custo do BaseHTTPMiddleware no
+caminho de toda requisição.
+"""
+import os
+import time
+
+from metrics import (
+    REQUEST_COUNT,
+    ADMISSION_LIMIT,
+    ADMISSION_INFLIGHT,
+    ADMISSION_QUEUE,
+    ADMISSION_REJECTED,
+)
+from slots import Vagas
+
+
+ADMISSION_ENABLED = os.getenv("P_API_ADMISSION", "1") != "0"
+LIMIT_INITIAL = float(os.getenv("P_API_LIMIT_INITIAL", "100"))
+LIMIT_MIN = float(os.getenv("P_API_LIMIT_MIN", "10"))
+LIMIT_MAX = float(os.getenv("P_API_LIMIT_MAX", "1000"))
+LIMIT_LATENCY_TARGET = float(os.getenv("P_API_LIMIT_LATENCY_TARGET", "0.5"))
+LIMIT_BACKOFF = float(os.getenv("P_API_LIMIT_BACKOFF", "0.9"))
+LIMIT_QUEUE_SIZE = int(os.getenv("P_API_LIMIT_QUEUE_SIZE", "0"))
+LIMIT_QUEUE_TIMEOUT = float(os.getenv("P_API_LIMIT_QUEUE_TIMEOUT", "0.05"))
+RETRY_AFTER = os.getenv("P_API_RETRY_AFTER", "1")
+
+# Chave do scope ASGI que marca a requisição recusada pela própria P-API
+RECUSA_LOCAL = "p_api.recusa_local"
+
+
+class LimiteAIMD(Vagas):
+    """Limite de concorrência de um endpoint, ajustado por AIMD."""
+
+    def __init__(self, endpoint):
+        super().__init__(
+            int(LIMIT_INITIAL), LIMIT_QUEUE_SIZE, LIMIT_QUEUE_TIMEOUT,
+            ADMISSION_INFLIGHT.labels(endpoint=endpoint), ADMISSION_QUEUE.labels(endpoint=endpoint),
+        )
+        self.endpoint = endpoint
+        self.limite = LIMIT_INITIAL
+        self._ultima_reducao = 0.0
+        self._limite_gauge = ADMISSION_LIMIT.labels(endpoint=endpoint)
+        self._limite_gauge.set(self.limite)
+
+    def liberar(self, latencia=None, falhou=False):
+        """Devolve a vaga; com `latencia`, usa a amostra para ajustar o limite."""
+        if latencia is not None:
+            agora = time.monotonic()
+            if falhou or latencia > LIMIT_LATENCY_TARGET:
+                if agora - self._ultima_reducao >= LIMIT_LATENCY_TARGET:
+                    self.limite = max(LIMIT_MIN, self.limite * LIMIT_BACKOFF)
+                    self._ultima_reducao = agora
+            elif self.em_uso * 2 >= self.limite:
+                self.limite = min(LIMIT_MAX, self.limite + 1)
+            self.capacidade = int(self.limite)
+            self._limite_gauge.set(self.limite)
+        super().liberar()
+
+
+class AdmissionMiddleware:
+    """Aplica um `LimiteAIMD` a cada endpoint listado em `endpoints`."""
+
+    def __init__(self, app, endpoints):
+        self.app = app
+        self.limites = {endpoint: LimiteAIMD(endpoint) for endpoint in endpoints}
+
+    async def __call__(self, scope, receive, send):
+        limite = self.limites.get(scope["path"]) if scope["type"] == "http" else None
+        if limite is None or not ADMISSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        if await limite.adquirir() is not None:
+            ADMISSION_REJECTED.labels(endpoint=limite.endpoint).inc()
+            REQUEST_COUNT.labels(method=scope["method"], endpoint=limite.endpoint, status='503').inc()
+            await rejeitar(scope, send)
+            return
+
+        status = 500
+        inicio = time.monotonic()
+
+        async def send_com_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_com_status)
+        finally:
+            if scope.get(RECUSA_LOCAL):
+                # Recusada por um compartimento: devolve a vaga sem amostra para o AIMD
+                limite.liberar()
+            else:
+                limite.liberar(time.monotonic() - inicio, falhou=status >= 500)
+
+
+async def rejeitar(scope, send):
+    """503 com Retry-After (também usado pelos compartimentos, bulkhead.py)."""
+    scope[RECUSA_LOCAL] = True
+    corpo = b'{"detail":"Servidor sobrecarregado, tente novamente"}'
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(corpo)).encode()),
+            (b"retry-after", RETRY_AFTER.encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": corpo})
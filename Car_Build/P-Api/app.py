@@ -1,43 +1,100 @@
 
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import PlainTextResponse
-from google.protobuf import json_format
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import asyncio
+from collections import namedtuple
 import grpc
+import hashlib
+import json
 import os
+import logging
 import time
+from admission import AdmissionMiddleware
+from batching import LoteCalcular
+from bulkhead import BulkheadMiddleware
+from compression import CompressionMiddleware
+from tracing import TracingMiddleware
+import backends
+import codec
+import logs
+import saturation
+import tracing
+import warmup
 import generated.catalogo_pb2 as catalogo_pb2
-import generated.catalogo_pb2_grpc as catalogo_pb2_grpc
 import generated.pricing_pb2 as pricing_pb2
-import generated.pricing_pb2_grpc as pricing_pb2_grpc
-from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
+from catalog_cache import CatalogoCache, chave_carro
+from idempotency import ChaveIdempotenciaInvalida, RegistroIdempotencia
+from resilience import CircuitoAberto
+from metrics import (
+    REQUEST_COUNT, REQUEST_LATENCY, ACTIVE_REQUESTS, CHECKOUT_LATENCY,
+    CATALOG_CACHE_REVALIDATIONS,
+    gerar_metricas, encerrar_processo,
+)
 
 
-# Métricas customizadas para monitoramento
-REQUEST_COUNT = Counter(
-    'p_api_requests_total', 
-    'Total de requisições recebidas pela P-API',
-    ['method', 'endpoint', 'status']
-)
+@asynccontextmanager
+async def lifespan(app):
+    # Canais gRPC são criados no startup, dentro de cada worker: grpc.aio exige o
+    # event loop ativo e canais criados antes de um fork não são seguros
+    await backends.conectar()
+    logs.iniciar()
+    saturation.iniciar()
+    # Aquecimento em segundo plano: /health já responde, /ready só depois dele
+    warmup.iniciar(_catalogo)
+    yield
+    warmup.parar()
+    saturation.parar()
+    logs.parar()
+    await backends.fechar()
+    encerrar_processo()
+    logs.encerrar()
 
-REQUEST_LATENCY = Histogram(
-    'p_api_request_duration_seconds',
-    'Latência das requisições em segundos',
-    ['method', 'endpoint']
-)
 
-GRPC_CALLS = Counter(
-    'p_api_grpc_calls_total',
-    'Total de chamadas gRPC para microserviços',
-    ['service', 'status']
-)
+app = FastAPI(lifespan=lifespan)
 
-ACTIVE_REQUESTS = Gauge(
-    'p_api_active_requests',
-    'Número de requisições ativas no momento'
-)
+# Cache do catálogo de peças (TTL + LRU, com coalescência de misses)
+catalogo_cache = CatalogoCache()
+
+# Orçamentos simultâneos (/calcular e /checkout) agrupados em CalcularLote
+lote_calcular = LoteCalcular(backends.server_b)
+
+# Respostas do /pagar por Idempotency-Key (repetições não geram outro pedido)
+idempotencia = RegistroIdempotencia()
 
-app = FastAPI()
+# Limites do /get-pecas/batch: chamadas simultâneas ao Server A e carros por lote
+BATCH_CONCURRENCY = int(os.getenv("P_API_BATCH_CONCURRENCY", "8"))
+BATCH_MAX_ITEMS = int(os.getenv("P_API_BATCH_MAX_ITEMS", "50"))
+
+# Revalidação das entradas expiradas do cache pela versão do catálogo (GetVersao).
+# Desligada sozinha se o Server A responder UNIMPLEMENTED.
+CATALOG_VERSION = os.getenv("P_API_CATALOG_VERSION", "1") != "0"
+_versao_suportada = CATALOG_VERSION
+
+# Loggers por endpoint (debug/info amostrados conforme P_API_LOG_SAMPLE)
+log_get_pecas = logs.obter("get_pecas", endpoint="/get-pecas")
+log_calcular = logs.obter("calcular", endpoint="/calcular")
+log_pagar = logs.obter("pagar", endpoint="/pagar")
+log_checkout = logs.obter("checkout", endpoint="/checkout")
+log_catalogo = logs.obter("catalogo")
+
+# Compressão gzip/brotli das respostas acima de P_API_COMPRESSION_MIN_SIZE.
+# Primeiro middleware adicionado = mais interno: a CPU da compressão entra na
+# latência vista pelo controle de admissão.
+app.add_middleware(CompressionMiddleware)
+
+# Compartimentos por endpoint (vagas, fila e threads próprias). Dentro da
+# admissão: só disputa vaga no compartimento quem já foi admitido. /health e
+# /metrics não têm compartimento e usam o threadpool padrão, reservado a eles.
+app.add_middleware(BulkheadMiddleware)
+
+# Controle de admissão adaptativo (503 + Retry-After acima do limite de cada endpoint).
+# Adicionado antes do CORS para que as respostas 503 também recebam os headers de CORS.
+app.add_middleware(
+    AdmissionMiddleware,
+    endpoints=["/get-pecas", "/get-pecas/batch", "/calcular", "/pagar", "/checkout"],
+)
 
 # Configurar CORS
 app.add_middleware(
@@ -54,112 +111,564 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Usar variáveis de ambiente para hostnames dos containers
-SERVER_A_HOST = os.getenv("SERVER_A_HOST", "localhost")
-SERVER_B_HOST = os.getenv("SERVER_B_HOST", "localhost")
+# Tracing W3C (traceparent), o mais externo: o span da requisição inclui a
+# espera na admissão e a compressão
+app.add_middleware(TracingMiddleware)
 
-stub_a = catalogo_pb2_grpc.CatalogoServiceStub(grpc.insecure_channel(f"{SERVER_A_HOST}:50051"))
-stub_b = pricing_pb2_grpc.OrcamentoServiceStub(grpc.insecure_channel(f"{SERVER_B_HOST}:50052"))
-
-@app.get("/metrics", response_class=PlainTextResponse)
-def metrics():
+@app.get("/metrics")
+def metrics(request: Request):
     """Endpoint que expõe as métricas para o Prometheus coletar"""
-    return generate_latest()
+    # Os exemplars (trace_id) só existem no formato OpenMetrics
+    openmetrics = "application/openmetrics-text" in request.headers.get("accept", "")
+    conteudo, tipo = gerar_metricas(openmetrics)
+    return Response(content=conteudo, media_type=tipo)
 
 @app.get("/health")
 def health_check():
-    """Endpoint de health check para Kubernetes liveness/readiness probes"""
+    """Liveness: o processo está de pé (não depende dos microserviços)"""
     REQUEST_COUNT.labels(method='GET', endpoint='/health', status='200').inc()
     return {"status": "healthy", "service": "p-api"}
 
+@app.get("/ready")
+def readiness_check():
+    """Readiness: 503 enquanto o worker aquece (canais e catálogo) ou desliga"""
+    estado = warmup.estado()
+    status = 200 if estado["pronto"] else 503
+    REQUEST_COUNT.labels(method='GET', endpoint='/ready', status=str(status)).inc()
+    return JSONResponse(status_code=status, content={"service": "p-api", **estado})
+
+@app.get("/debug/logs")
+def ver_logs():
+    """Nível e taxas de amostragem dos logs (deste worker)"""
+    return logs.configuracao()
+
+@app.get("/debug/traces")
+def ver_traces(trace_id: str = None):
+    """Últimos traces exportados por este worker (amostrados, lentos ou com erro)"""
+    if trace_id:
+        return [t for t in tracing.recentes if t["trace_id"] == trace_id]
+    return list(tracing.recentes)
+
+@app.get("/debug/saturation")
+async def ver_saturacao():
+    """Ocupação do threadpool e atraso do event loop deste worker"""
+    # async de propósito: uma rota síncrona esperaria na mesma fila que está medindo
+    return saturation.resumo()
+
+@app.put("/debug/logs")
+async def alterar_logs(request: Request):
+    """
+    Troca o nível e/ou a amostragem dos logs em execução, sem reiniciar, em
+    todos os workers (logs.publicar):
+    {"nivel": "DEBUG", "amostragem": {"/pagar": 1, "/get-pecas": 0.01}, "amostragem_padrao": 1}
+    """
+    if not logs.LOG_ADMIN:
+        raise HTTPException(status_code=403, detail="alteração dos logs desabilitada (P_API_LOG_ADMIN=1 habilita)")
+    try:
+        body = json.loads(await request.body())
+        if not isinstance(body, dict):
+            raise ValueError("esperado um objeto JSON")
+        if "nivel" in body:
+            logs.definir_nivel(str(body["nivel"]))
+        if "amostragem" in body or "amostragem_padrao" in body:
+            logs.definir_amostragem(body.get("amostragem", logs.configuracao()["amostragem"]),
+                                    body.get("amostragem_padrao"))
+    except (ValueError, TypeError, AttributeError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    logs.publicar()
+    return logs.configuracao()
+
+def _observar_latencia(method, endpoint, duracao):
+    """REQUEST_LATENCY com o trace_id como exemplar quando o trace é exportado"""
+    REQUEST_LATENCY.labels(method=method, endpoint=endpoint).observe(duracao, tracing.exemplar(duracao))
+
+
+def _json_response(conteudo):
+    return Response(content=conteudo, media_type="application/json")
+
+
+# A mesma URL responde JSON ou protobuf conforme o Accept
+_VARY_ACCEPT = {"Vary": "Accept"}
+
+
+def _resposta(request, mensagem):
+    """Resposta em protobuf se o Accept pedir application/x-protobuf, senão em JSON"""
+    with tracing.span("codificar"):
+        if codec.aceita_protobuf(request.headers.get("accept")):
+            return Response(content=mensagem.SerializeToString(), media_type=codec.PROTOBUF, headers=_VARY_ACCEPT)
+        return Response(content=codec.codificar(mensagem), media_type="application/json", headers=_VARY_ACCEPT)
+
+
+def _ler(request, cls, body):
+    """Corpo da requisição como `cls`, em protobuf ou JSON conforme o Content-Type"""
+    with tracing.span("decodificar"):
+        return codec.ler(cls, body, request.headers.get("content-type"))
+
+
+def _indisponivel(endpoint, e, method='POST'):
+    """503 para chamadas recusadas pelo circuit breaker do microserviço"""
+    REQUEST_COUNT.labels(method=method, endpoint=endpoint, status='503').inc()
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+# PecasResponse de um carro já serializado nos dois formatos de resposta, com a
+# ETag (hash do conteúdo) e a versão do catálogo no Server A quando disponível
+CatalogoSerializado = namedtuple("CatalogoSerializado", ["json", "protobuf", "etag", "versao"])
+
+
+async def _versao_catalogo(carro):
+    """Versão atual do catálogo do carro no Server A, ou None se não der para obter"""
+    global _versao_suportada
+    if not _versao_suportada:
+        return None
+    try:
+        return (await backends.server_a.chamar("GetVersao", carro)).versao
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.UNIMPLEMENTED:
+            _versao_suportada = False
+            log_catalogo.warning("server-a sem GetVersao, revalidação do cache desligada", erro=e.details())
+        return None
+    except CircuitoAberto:
+        return None
+
+
+async def _buscar_catalogo(carro, anterior=None):
+    """
+    PecasResponse do carro serializado em JSON e protobuf. Se `anterior`
+    (entrada expirada do cache) tem a mesma versão que o Server A informa
+    agora, é reaproveitada sem chamar o GetPecas. Sem entrada anterior, só o
+    GetPecas é chamado: a versão vem junto com as peças.
+    """
+    if anterior is not None and anterior.versao is not None:
+        versao = await _versao_catalogo(carro)
+        if versao == anterior.versao:
+            CATALOG_CACHE_REVALIDATIONS.labels(result='unchanged').inc()
+            return anterior
+        if versao is not None:
+            CATALOG_CACHE_REVALIDATIONS.labels(result='changed').inc()
+
+    resp = await backends.server_a.chamar("GetPecas", carro)
+    # Server A sem a tabela catalogo_versao responde a versão vazia: sem revalidação
+    versao = resp.versao or None
+    # A versão é interna: clientes recebem o mesmo PecasResponse de antes (e a mesma ETag)
+    resp.ClearField("versao")
+    protobuf = resp.SerializeToString(deterministic=True)
+    etag = 'W/"' + hashlib.blake2b(protobuf, digest_size=12).hexdigest() + '"'
+    return CatalogoSerializado(codec.codificar(resp), protobuf, etag, versao)
+
+
+async def _catalogo(carro):
+    """PecasResponse serializado do carro, vindo do cache ou do Server A"""
+    with tracing.span("catalogo"):
+        return await catalogo_cache.obter(chave_carro(carro), lambda anterior: _buscar_catalogo(carro, anterior))
+
+
+def _etag_confere(if_none_match, etag):
+    """Comparação fraca do If-None-Match com a ETag atual (RFC 9110)"""
+    if if_none_match.strip() == "*":
+        return True
+    alvo = etag.removeprefix("W/")
+    return any(item.strip().removeprefix("W/") == alvo for item in if_none_match.split(","))
+
+
+async def _carro_do_corpo(request):
+    return _ler(request, catalogo_pb2.Carro, await request.body())
+
+
+async def _carro_da_query(request):
+    modelo = request.query_params.get("modelo")
+    ano = request.query_params.get("ano", "0")
+    if not modelo:
+        raise codec.CodecError("parâmetro 'modelo' é obrigatório")
+    try:
+        return catalogo_pb2.Carro(modelo=modelo, ano=int(ano))
+    except ValueError:
+        raise codec.CodecError(f"ano inválido: {ano!r}") from None
+
+
 @app.post("/get-pecas")
-def get_pecas(body: dict):
+async def get_pecas(request: Request):
+    return await _get_pecas(request, 'POST', _carro_do_corpo)
+
+
+@app.get("/get-pecas")
+async def get_pecas_condicional(request: Request):
+    """
+    Mesmo catálogo do POST, em GET (?modelo=civic&ano=2023) para o navegador
+    guardar a resposta e revalidá-la com If-None-Match: se a ETag não mudou,
+    a resposta é 304 sem corpo.
+    """
+    return await _get_pecas(request, 'GET', _carro_da_query)
+
+
+async def _get_pecas(request, metodo, ler_carro):
     ACTIVE_REQUESTS.inc()  # Incrementa requisições ativas
     start_time = time.time()
     
     try:
-        carro = catalogo_pb2.Carro()
-        json_format.ParseDict(body, carro)
-        resp = stub_a.GetPecas(carro)
+        carro = await ler_carro(request)
+        catalogo = await _catalogo(carro)
+        headers = {"Vary": "Accept", "ETag": catalogo.etag, "Cache-Control": "no-cache"}
+
+        # Condicional só no GET: num POST, If-None-Match que confere seria 412 (RFC 9110)
+        if_none_match = request.headers.get("if-none-match")
+        if metodo == 'GET' and if_none_match and _etag_confere(if_none_match, catalogo.etag):
+            REQUEST_COUNT.labels(method=metodo, endpoint='/get-pecas', status='304').inc()
+            return Response(status_code=304, headers=headers)
         
         # Registra sucesso
-        REQUEST_COUNT.labels(method='POST', endpoint='/get-pecas', status='200').inc()
-        GRPC_CALLS.labels(service='server-a', status='success').inc()
+        REQUEST_COUNT.labels(method=metodo, endpoint='/get-pecas', status='200').inc()
         
-        return json_format.MessageToDict(resp)
+        if codec.aceita_protobuf(request.headers.get("accept")):
+            return Response(content=catalogo.protobuf, media_type=codec.PROTOBUF, headers=headers)
+        return Response(content=catalogo.json, media_type="application/json", headers=headers)
     
+    except codec.CodecError as e:
+        REQUEST_COUNT.labels(method=metodo, endpoint='/get-pecas', status='422').inc()
+        raise HTTPException(status_code=422, detail=str(e))
+    except CircuitoAberto as e:
+        raise _indisponivel('/get-pecas', e, metodo)
     except Exception as e:
-        REQUEST_COUNT.labels(method='POST', endpoint='/get-pecas', status='500').inc()
-        GRPC_CALLS.labels(service='server-a', status='error').inc()
+        REQUEST_COUNT.labels(method=metodo, endpoint='/get-pecas', status='500').inc()
+        log_get_pecas.error("erro ao buscar catálogo", exc_info=True)
         raise
     
     finally:
         # Registra latência e decrementa requisições ativas
-        REQUEST_LATENCY.labels(method='POST', endpoint='/get-pecas').observe(time.time() - start_time)
+        _observar_latencia(metodo, '/get-pecas', time.time() - start_time)
+        ACTIVE_REQUESTS.dec()
+
+
+def _linha_batch(indices, carro, conteudo=None, erro=None):
+    """Uma linha NDJSON do batch: índices do lote, carro e as peças (ou o erro)"""
+    prefixo = b'{"indices":' + json.dumps(indices, separators=(",", ":")).encode() + b',"carro":' + codec.codificar(carro)
+    if erro is not None:
+        return prefixo + b',"erro":' + json.dumps(erro, ensure_ascii=False).encode("utf-8") + b'}\n'
+    # Reaproveita o JSON do PecasResponse em cache, sem desserializar: {"pecas":[...]}
+    corpo = conteudo[1:]
+    return prefixo + (b',' if corpo != b'}' else b'') + corpo + b'\n'
+
+
+class _StreamingComEncerramento(StreamingResponse):
+    """
+    StreamingResponse que chama `ao_encerrar()` ao terminar de responder. O
+    `finally` do gerador não basta: se o envio falha antes da primeira
+    iteração (cliente desconectou), o corpo do gerador nunca roda.
+    """
+
+    def __init__(self, conteudo, ao_encerrar, **kwargs):
+        super().__init__(conteudo, **kwargs)
+        self._ao_encerrar = ao_encerrar
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._ao_encerrar()
+
+
+@app.post("/get-pecas/batch")
+async def get_pecas_batch(request: Request):
+    """
+    Catálogo de vários carros em uma requisição. Carros repetidos no lote são
+    consultados uma única vez e as respostas são enviadas em NDJSON conforme
+    ficam prontas, então o modelo mais lento não atrasa os demais.
+    """
+    ACTIVE_REQUESTS.inc()
+    start_time = time.time()
+
+    def encerrar():
+        _observar_latencia('POST', '/get-pecas/batch', time.time() - start_time)
         ACTIVE_REQUESTS.dec()
 
+    resposta = None
+    try:
+        try:
+            carros = json.loads(await request.body())
+        except ValueError as e:
+            raise codec.CodecError(f"JSON inválido: {e}") from None
+        if not isinstance(carros, list) or not carros:
+            raise codec.CodecError("o corpo deve ser uma lista não vazia de carros")
+        if len(carros) > BATCH_MAX_ITEMS:
+            raise codec.CodecError(f"no máximo {BATCH_MAX_ITEMS} carros por lote")
+
+        # Agrupa os índices por chave normalizada (modelo, ano)
+        grupos = {}
+        for indice, obj in enumerate(carros):
+            carro = codec.decodificar_objeto(catalogo_pb2.Carro, obj)
+            grupos.setdefault(chave_carro(carro), (carro, []))[1].append(indice)
+
+        semaforo = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        async def consultar(carro, indices):
+            async with semaforo:
+                try:
+                    return _linha_batch(indices, carro, conteudo=(await _catalogo(carro)).json)
+                except grpc.RpcError as e:
+                    return _linha_batch(indices, carro, erro=e.details())
+                except Exception as e:
+                    return _linha_batch(indices, carro, erro=str(e))
+
+        async def gerar():
+            tarefas = [asyncio.ensure_future(consultar(carro, indices)) for carro, indices in grupos.values()]
+            try:
+                for proxima in asyncio.as_completed(tarefas):
+                    yield await proxima
+                REQUEST_COUNT.labels(method='POST', endpoint='/get-pecas/batch', status='200').inc()
+            finally:
+                # Cliente desconectou no meio do stream: não deixa consultas órfãs
+                for tarefa in tarefas:
+                    tarefa.cancel()
+
+        # Daqui em diante, latência e requisições ativas são contabilizadas pela resposta
+        resposta = _StreamingComEncerramento(gerar(), encerrar, media_type="application/x-ndjson")
+        return resposta
+    except codec.CodecError as e:
+        REQUEST_COUNT.labels(method='POST', endpoint='/get-pecas/batch', status='422').inc()
+        raise HTTPException(status_code=422, detail=str(e))
+    finally:
+        if resposta is None:
+            encerrar()
+
 
 @app.post("/calcular")
-def calcular(body: dict):
+async def calcular(request: Request):
     ACTIVE_REQUESTS.inc()
     start_time = time.time()
     
     try:
-        req = pricing_pb2.OrcamentoRequest()
-        json_format.ParseDict(body, req)
-        resp = stub_b.Calcular(req)
+        req = _ler(request, pricing_pb2.OrcamentoRequest, await request.body())
+        resp = await lote_calcular.calcular(req)
         
         REQUEST_COUNT.labels(method='POST', endpoint='/calcular', status='200').inc()
-        GRPC_CALLS.labels(service='server-b', status='success').inc()
         
-        return json_format.MessageToDict(resp)
+        return _resposta(request, resp)
     
+    except codec.CodecError as e:
+        REQUEST_COUNT.labels(method='POST', endpoint='/calcular', status='422').inc()
+        raise HTTPException(status_code=422, detail=str(e))
+    except CircuitoAberto as e:
+        raise _indisponivel('/calcular', e)
     except Exception as e:
         REQUEST_COUNT.labels(method='POST', endpoint='/calcular', status='500').inc()
-        GRPC_CALLS.labels(service='server-b', status='error').inc()
+        log_calcular.error("erro ao calcular orçamento", exc_info=True)
         raise
     
     finally:
-        REQUEST_LATENCY.labels(method='POST', endpoint='/calcular').observe(time.time() - start_time)
+        _observar_latencia('POST', '/calcular', time.time() - start_time)
         ACTIVE_REQUESTS.dec()
 
 
+# Recusas do registro de Idempotency-Key do Server B
+_STATUS_IDEMPOTENCIA = {
+    grpc.StatusCode.FAILED_PRECONDITION: 422,
+    grpc.StatusCode.ABORTED: 409,
+}
+
+
+async def _realizar_compra_idempotente(req, chave):
+    """RealizarCompra com a chave no metadata; retorna (resposta, repetida pelo Server B)"""
+    resp = await backends.server_b.chamar("RealizarCompra", req, metadata=(("idempotency-key", chave),))
+    repetida = resp.repetida
+    # O cliente vê a repetição no header Idempotent-Replayed, não no corpo
+    resp.ClearField("repetida")
+    return resp, repetida
+
+
 @app.post("/pagar")
-def pagar(body: dict):
+async def pagar(request: Request):
     ACTIVE_REQUESTS.inc()
     start_time = time.time()
     
     try:
-        print(f"[P-API] Recebida requisição de compra: {body}")
+        body = await request.body()
+        if log_pagar.habilitado(logging.DEBUG):
+            log_pagar.debug("compra recebida", corpo=body.decode('utf-8', 'replace'))
         
         # Criar request de compra
-        req = pricing_pb2.CompraRequest()
-        json_format.ParseDict(body, req)
+        req = _ler(request, pricing_pb2.CompraRequest, body)
         
-        # Chamar Server B para processar compra
-        resp = stub_b.RealizarCompra(req)
+        # Chamar Server B para processar compra; com Idempotency-Key, repetições
+        # aguardam ou reaproveitam a compra original (neste worker ou, pelo
+        # registro do Server B, em qualquer outro)
+        chave = request.headers.get("idempotency-key")
+        repetida = False
+        if chave is None:
+            resp = await backends.server_b.chamar("RealizarCompra", req)
+        else:
+            (resp, repetida_server_b), repetida = await idempotencia.executar(
+                chave, req.SerializeToString(deterministic=True),
+                lambda: _realizar_compra_idempotente(req, chave),
+            )
+            repetida = repetida or repetida_server_b
         
-        # Converter resposta para dict
-        result = json_format.MessageToDict(resp)
-        
-        print(f"[P-API] Compra processada com sucesso. Pedido ID: {result.get('pedidoId', 'N/A')}")
+        log_pagar.info("compra processada", pedido_id=resp.pedido_id or None, valor_total=resp.valor_total,
+                       repetida=repetida)
         
         REQUEST_COUNT.labels(method='POST', endpoint='/pagar', status='200').inc()
-        GRPC_CALLS.labels(service='server-b', status='success').inc()
         
-        return result
+        resposta = _resposta(request, resp)
+        if repetida:
+            resposta.headers["Idempotent-Replayed"] = "true"
+        return resposta
         
+    except (codec.CodecError, ChaveIdempotenciaInvalida) as e:
+        log_pagar.warning("compra inválida", erro=str(e))
+        REQUEST_COUNT.labels(method='POST', endpoint='/pagar', status='422').inc()
+        raise HTTPException(status_code=422, detail=str(e))
+    except CircuitoAberto as e:
+        raise _indisponivel('/pagar', e)
     except grpc.RpcError as e:
-        print(f"[P-API] Erro gRPC ao processar compra: {e.details()}")
+        status = _STATUS_IDEMPOTENCIA.get(e.code())
+        if status is not None:
+            # Chave com outro corpo (422) ou compra da chave em andamento em outro worker/pod (409)
+            log_pagar.warning("compra recusada pela Idempotency-Key", grpc_status=e.code().name, erro=e.details())
+            REQUEST_COUNT.labels(method='POST', endpoint='/pagar', status=str(status)).inc()
+            raise HTTPException(status_code=status, detail=e.details())
+        log_pagar.warning("compra recusada pelo server-b", grpc_status=e.code().name, erro=e.details())
         REQUEST_COUNT.labels(method='POST', endpoint='/pagar', status='400').inc()
-        GRPC_CALLS.labels(service='server-b', status='error').inc()
         raise HTTPException(status_code=400, detail=f"Erro ao processar compra: {e.details()}")
     except Exception as e:
-        print(f"[P-API] Erro interno ao processar compra: {str(e)}")
+        log_pagar.error("erro interno ao processar compra", exc_info=True)
         REQUEST_COUNT.labels(method='POST', endpoint='/pagar', status='500').inc()
-        GRPC_CALLS.labels(service='server-b', status='error').inc()
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
     
     finally:
-        REQUEST_LATENCY.labels(method='POST', endpoint='/pagar').observe(time.time() - start_time)
+        _observar_latencia('POST', '/pagar', time.time() - start_time)
+        ACTIVE_REQUESTS.dec()
+
+
+def _ler_checkout(dados):
+    """Valida o corpo do /checkout: {"carro": {...}, "itens": [{"id", "quantidade"}], "valor_total"?}"""
+    try:
+        body = json.loads(dados)
+    except ValueError as e:
+        raise codec.CodecError(f"JSON inválido: {e}") from None
+    if not isinstance(body, dict) or "carro" not in body:
+        raise codec.CodecError("campo 'carro' é obrigatório")
+    carro = codec.decodificar_objeto(catalogo_pb2.Carro, body["carro"])
+
+    itens = body.get("itens")
+    if not isinstance(itens, list) or not itens:
+        raise codec.CodecError("campo 'itens' deve ser uma lista não vazia")
+    quantidades = {}
+    for item in itens:
+        if not isinstance(item, dict) or not isinstance(item.get("id"), str):
+            raise codec.CodecError("cada item precisa de um 'id' (string)")
+        quantidade = item.get("quantidade", 1)
+        if isinstance(quantidade, bool) or not isinstance(quantidade, int) or quantidade < 1:
+            raise codec.CodecError(f"quantidade inválida para a peça {item['id']}")
+        quantidades[item["id"]] = quantidades.get(item["id"], 0) + quantidade
+
+    valor_total = body.get("valor_total", body.get("valorTotal"))
+    if valor_total is not None and (isinstance(valor_total, bool) or not isinstance(valor_total, (int, float))):
+        raise codec.CodecError("campo 'valor_total' deve ser numérico")
+    return carro, quantidades, valor_total
+
+
+# Tolerância do Server B ao conferir o valor_total no RealizarCompra
+TOLERANCIA_VALOR_TOTAL = 0.01
+
+
+def _preco_mudou(resp, preco, valor_total):
+    """True se o RealizarCompra recusou o valor_total e o orçamento novo de fato difere dele"""
+    return (
+        isinstance(resp, grpc.RpcError)
+        and resp.code() == grpc.StatusCode.INVALID_ARGUMENT
+        and isinstance(preco, pricing_pb2.Preco)
+        and abs(preco.total - valor_total) > TOLERANCIA_VALOR_TOTAL
+    )
+
+
+@app.post("/checkout")
+async def checkout(request: Request):
+    """
+    Fluxo de compra completo em uma requisição: resolve as peças do carro
+    (cache ou Server A), calcula o orçamento e confirma a compra no Server B,
+    substituindo a sequência /get-pecas -> /calcular -> /pagar do cliente.
+
+    Se o cliente enviar o `valor_total` que já exibiu, Calcular e
+    RealizarCompra rodam em paralelo (o Server B revalida o preço); se o valor
+    não conferir, a resposta 409 traz o orçamento atualizado.
+    """
+    ACTIVE_REQUESTS.inc()
+    start_time = time.time()
+    
+    try:
+        carro, quantidades, valor_total = _ler_checkout(await request.body())
+
+        etapa_inicio = time.time()
+        catalogo = catalogo_pb2.PecasResponse.FromString((await _catalogo(carro)).protobuf)
+        CHECKOUT_LATENCY.labels(stage='catalogo').observe(time.time() - etapa_inicio)
+
+        pecas_por_id = {peca.id: peca for peca in catalogo.pecas}
+        faltando = [peca_id for peca_id in quantidades if peca_id not in pecas_por_id]
+        if faltando:
+            REQUEST_COUNT.labels(method='POST', endpoint='/checkout', status='422').inc()
+            raise HTTPException(
+                status_code=422,
+                detail=f"Peças não encontradas para {carro.modelo}: {', '.join(faltando)}",
+            )
+        itens = [
+            pricing_pb2.Item(peca=pecas_por_id[peca_id], quantidade=quantidade)
+            for peca_id, quantidade in quantidades.items()
+        ]
+
+        etapa_inicio = time.time()
+        if valor_total is None:
+            preco = await lote_calcular.calcular(pricing_pb2.OrcamentoRequest(itens=itens))
+            CHECKOUT_LATENCY.labels(stage='orcamento').observe(time.time() - etapa_inicio)
+            etapa_inicio = time.time()
+            resp = await backends.server_b.chamar(
+                "RealizarCompra",
+                pricing_pb2.CompraRequest(itens=itens, valor_total=preco.total),
+            )
+        else:
+            preco, resp = await asyncio.gather(
+                lote_calcular.calcular(pricing_pb2.OrcamentoRequest(itens=itens)),
+                backends.server_b.chamar(
+                    "RealizarCompra",
+                    pricing_pb2.CompraRequest(itens=itens, valor_total=valor_total),
+                ),
+                return_exceptions=True,
+            )
+            if _preco_mudou(resp, preco, valor_total):
+                CHECKOUT_LATENCY.labels(stage='compra').observe(time.time() - etapa_inicio)
+                REQUEST_COUNT.labels(method='POST', endpoint='/checkout', status='409').inc()
+                return JSONResponse(
+                    status_code=409,
+                    content={
+                        "detail": f"Erro ao processar compra: {resp.details()}",
+                        "orcamento": json.loads(codec.codificar(preco)),
+                    },
+                )
+            # Falhas de infraestrutura seguem os caminhos 503/400 do fluxo sequencial
+            if isinstance(resp, BaseException):
+                raise resp
+        CHECKOUT_LATENCY.labels(stage='compra').observe(time.time() - etapa_inicio)
+
+        REQUEST_COUNT.labels(method='POST', endpoint='/checkout', status='200').inc()
+        log_checkout.info("compra processada", pedido_id=resp.pedido_id or None, valor_total=resp.valor_total)
+        return _json_response(codec.codificar(resp))
+
+    except HTTPException:
+        raise
+    except codec.CodecError as e:
+        REQUEST_COUNT.labels(method='POST', endpoint='/checkout', status='422').inc()
+        raise HTTPException(status_code=422, detail=str(e))
+    except CircuitoAberto as e:
+        raise _indisponivel('/checkout', e)
+    except grpc.RpcError as e:
+        REQUEST_COUNT.labels(method='POST', endpoint='/checkout', status='400').inc()
+        log_checkout.warning("compra recusada pelo server-b", grpc_status=e.code().name, erro=e.details())
+        raise HTTPException(status_code=400, detail=f"Erro ao processar compra: {e.details()}")
+    except Exception as e:
+        REQUEST_COUNT.labels(method='POST', endpoint='/checkout', status='500').inc()
+        log_checkout.error("erro interno no checkout", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+    finally:
+        elapsed = time.time() - start_time
+        CHECKOUT_LATENCY.labels(stage='total').observe(elapsed)
+        _observar_latencia('POST', '/checkout', elapsed)
         ACTIVE_REQUESTS.dec()
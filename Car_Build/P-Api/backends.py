@@ -0,0 +1,412 @@
+"""
+Clientes gRPC da P-API para os microserviços A (catálogo) e B (pricing).
+
+O modo de execução é escolhido pela variável de ambiente P_API_GRPC_MODE:
+
+- "sync" (padrão): canais bloqueantes (grpc.insecure_channel). Cada chamada
+  ocupa uma thread do threadpool do Starlette, como na versão original.
+- "async": canais e stubs grpc.aio, aguardados direto no event loop. A
+  concorrência passa a ser limitada pelo loop e não pelo número de threads.
+
+Os handlers do app.py são sempre `async def` e chamam `Backend.chamar`, então
+os dois modos podem ser comparados (A/B) com o mesmo cenário do Locust.
+
+Balanceamento no cliente: cada Backend resolve o hostname configurado para
+todos os IPs (com um Service headless do Kubernetes, um IP por pod), mantém
+um canal por endpoint e distribui os RPCs entre eles. Sem isso, a
+multiplexação HTTP/2 prende cada réplica da P-API a um único pod. A
+resolução é refeita periodicamente para acompanhar pods que entram e saem.
+
+- P_API_LB_POLICY: "round_robin" (padrão) ou "least_outstanding"
+- P_API_RESOLVE_INTERVAL: intervalo em segundos entre re-resoluções de DNS
+
+Resiliência: toda chamada tem deadline explícito (P_API_DEADLINE_<METODO> ou
+P_API_GRPC_DEADLINE) e passa pelo circuit breaker do microserviço
+(resilience.py). Com P_API_HEDGE=1, os RPCs idempotentes (GetPecas,
+GetVersao, Calcular e CalcularLote) ganham uma segunda tentativa, em outro
+endpoint quando o pool tem mais de um, se a primeira não responder dentro do
+p95 recente; vale a resposta que chegar primeiro. Com o pool vazio (antes da
+primeira resolução ou no desligamento), as chamadas falham com SemEndpoints,
+um CircuitoAberto: o handler responde 503 como em qualquer indisponibilidade.
+
+Compressão: com P_API_GRPC_COMPRESSION=gzip|deflate, requisições a partir de
+P_API_GRPC_COMPRESSION_MIN_SIZE bytes (serializadas) são enviadas
+comprimidas; as menores seguem sem compressão. Os bytes economizados e a CPU
+gasta são estimados comprimindo em Python 1 a cada
+P_API_GRPC_COMPRESSION_SAMPLE requisições comprimidas, já que a compressão
+de verdade acontece dentro do grpc.
+
+Métricas por RPC (latência, status, bytes, uso do deadline, espera pelo canal
+ficar pronto) são registradas pelos interceptors de cliente de cada canal
+(interceptors.py). No modo sync, a espera por uma thread livre vai para
+p_api_threadpool_wait_seconds (saturation.py).
+"""
+import asyncio
+import os
+import socket
+import time
+import zlib
+
+import grpc
+
+import generated.catalogo_pb2_grpc as catalogo_pb2_grpc
+import generated.pricing_pb2_grpc as pricing_pb2_grpc
+import logs
+import tracing
+from saturation import run_in_threadpool
+from interceptors import EstadoCanal, InterceptorAsync, InterceptorSync, observar_async, observar_sync
+from metrics import (
+    BACKEND_ENDPOINTS,
+    BACKEND_INFLIGHT,
+    HEDGE_REQUESTS,
+    HEDGE_WINS,
+    GRPC_COMPRESSED_MESSAGES,
+    GRPC_COMPRESSION_SAVED_BYTES,
+    GRPC_COMPRESSION_CPU_SECONDS,
+    remover_serie,
+)
+from resilience import CircuitBreaker, JanelaLatencia, SemEndpoints, falha_de_infraestrutura
+
+
+log = logs.obter("backends")
+
+GRPC_MODE = os.getenv("P_API_GRPC_MODE", "sync").lower()
+if GRPC_MODE not in ("sync", "async"):
+    raise ValueError(f"P_API_GRPC_MODE inválido: {GRPC_MODE!r} (use 'sync' ou 'async')")
+
+LB_POLICY = os.getenv("P_API_LB_POLICY", "round_robin").lower()
+if LB_POLICY not in ("round_robin", "least_outstanding"):
+    raise ValueError(
+        f"P_API_LB_POLICY inválido: {LB_POLICY!r} (use 'round_robin' ou 'least_outstanding')"
+    )
+
+RESOLVE_INTERVAL = float(os.getenv("P_API_RESOLVE_INTERVAL", "10"))
+
+# Deadlines por RPC, em segundos
+GRPC_DEADLINE = float(os.getenv("P_API_GRPC_DEADLINE", "2"))
+DEADLINES = {
+    "GetPecas": float(os.getenv("P_API_DEADLINE_GET_PECAS", "1")),
+    "GetVersao": float(os.getenv("P_API_DEADLINE_GET_VERSAO", "0.5")),
+    "Calcular": float(os.getenv("P_API_DEADLINE_CALCULAR", "1")),
+    "RealizarCompra": float(os.getenv("P_API_DEADLINE_REALIZAR_COMPRA", "3")),
+    "CalcularLote": float(os.getenv("P_API_DEADLINE_CALCULAR_LOTE", "1")),
+}
+
+HEDGE_ENABLED = os.getenv("P_API_HEDGE", "0") == "1"
+HEDGE_PERCENTILE = float(os.getenv("P_API_HEDGE_PERCENTILE", "0.95"))
+HEDGE_MIN_DELAY = float(os.getenv("P_API_HEDGE_MIN_DELAY", "0.005"))
+
+_ALGORITMOS = {
+    "none": grpc.Compression.NoCompression,
+    "gzip": grpc.Compression.Gzip,
+    "deflate": grpc.Compression.Deflate,
+}
+_WBITS = {"gzip": 31, "deflate": 15}  # formatos gzip e zlib, como no grpc
+GRPC_COMPRESSION = os.getenv("P_API_GRPC_COMPRESSION", "none").lower()
+if GRPC_COMPRESSION not in _ALGORITMOS:
+    raise ValueError(f"P_API_GRPC_COMPRESSION inválido: {GRPC_COMPRESSION!r} (use 'none', 'gzip' ou 'deflate')")
+GRPC_COMPRESSION_MIN_SIZE = int(os.getenv("P_API_GRPC_COMPRESSION_MIN_SIZE", "1024"))
+GRPC_COMPRESSION_SAMPLE = int(os.getenv("P_API_GRPC_COMPRESSION_SAMPLE", "100"))
+
+# Usar variáveis de ambiente para hostnames dos containers
+# Intervalo entre as conferências do estado do canal no aquecimento (modo sync)
+_INTERVALO_PRONTO = 0.05
+
+SERVER_A_HOST = os.getenv("SERVER_A_HOST", "localhost")
+SERVER_B_HOST = os.getenv("SERVER_B_HOST", "localhost")
+
+
+class Endpoint:
+    """Canal + stub para um único pod/endereço de um microserviço."""
+
+    def __init__(self, endereco, channel, stub, parar_observacao=None, estado=None):
+        self.endereco = endereco
+        self.channel = channel
+        self.stub = stub
+        self.estado = estado  # interceptors.EstadoCanal
+        self.parar_observacao = parar_observacao
+        self.em_andamento = 0
+        self.ativo = True
+
+    def fechar(self):
+        """Para de acompanhar a conectividade e fecha o canal (no async, retorna o awaitable)."""
+        if self.parar_observacao is not None:
+            self.parar_observacao()
+        return self.channel.close()
+
+
+class Backend:
+    """Pool de canais para todos os endpoints de um microserviço."""
+
+    def __init__(self, nome, host, porta, stub_cls, idempotentes=()):
+        self.nome = nome
+        self.host = host
+        self.porta = porta
+        self.stub_cls = stub_cls
+        self.idempotentes = frozenset(idempotentes)
+        self.endpoints = []
+        self._proximo = 0
+        self.breaker = CircuitBreaker(nome)
+        self.latencias = {}  # metodo -> JanelaLatencia
+        self._comprimidas = 0
+
+    @property
+    def target(self):
+        return f"{self.host}:{self.porta}"
+
+    async def conectar(self):
+        # Canais grpc.aio precisam ser criados com o event loop já rodando,
+        # por isso a conexão acontece no lifespan e não no import do módulo.
+        await self.resolver()
+
+    async def resolver(self):
+        """Resolve o hostname e sincroniza o pool de canais com os IPs atuais."""
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(
+                self.host, self.porta, type=socket.SOCK_STREAM
+            )
+            # "localhost" costuma resolver para 127.0.0.1 e ::1, mas os servidores
+            # escutam em 0.0.0.0; com IPv4 disponível, ignora os endereços IPv6
+            if any(info[0] == socket.AF_INET for info in infos):
+                infos = [info for info in infos if info[0] == socket.AF_INET]
+            enderecos = sorted({_formatar_endereco(info[4]) for info in infos})
+        except OSError as e:
+            if self.endpoints:
+                log.warning("falha ao re-resolver, mantendo endpoints atuais", target=self.target, erro=str(e))
+                return
+            # Sem DNS ainda: deixa o próprio gRPC resolver o hostname depois
+            enderecos = [self.target]
+        self._atualizar(enderecos)
+
+    async def aguardar_pronto(self, prazo):
+        """Conecta os canais de todos os endpoints; retorna quantos ficaram READY em `prazo` segundos."""
+        async def esperar(ep):
+            try:
+                if GRPC_MODE == "async":
+                    await asyncio.wait_for(ep.channel.channel_ready(), prazo)
+                else:
+                    # A conectividade chega pela assinatura do observar_sync, que já
+                    # pediu a conexão. Sem grpc.channel_ready_future, nenhuma thread
+                    # fica presa esperando e o cancelamento da tarefa basta no desligamento.
+                    limite = time.monotonic() + prazo
+                    while not ep.estado.pronto:
+                        if time.monotonic() >= limite:
+                            return False
+                        await asyncio.sleep(_INTERVALO_PRONTO)
+                return True
+            except asyncio.TimeoutError:
+                return False
+
+        return sum(await asyncio.gather(*(esperar(ep) for ep in self.endpoints)))
+
+    def _atualizar(self, enderecos):
+        atuais = {ep.endereco: ep for ep in self.endpoints}
+        novos = [atuais.pop(endereco, None) or self._criar_endpoint(endereco) for endereco in enderecos]
+        self.endpoints = novos
+        for ep in atuais.values():
+            # Endpoints que saíram da rotação são fechados quando terminarem os RPCs em andamento
+            ep.ativo = False
+            if ep.em_andamento == 0:
+                self._encerrar(ep)
+        BACKEND_ENDPOINTS.labels(service=self.nome).set(len(novos))
+
+    def _criar_endpoint(self, endereco):
+        estado = EstadoCanal(self.nome)
+        if GRPC_MODE == "async":
+            channel = grpc.aio.insecure_channel(endereco, interceptors=[InterceptorAsync(self.nome, estado)])
+            parar = observar_async(channel, estado)
+        else:
+            bruto = grpc.insecure_channel(endereco)
+            parar = observar_sync(bruto, estado)
+            channel = grpc.intercept_channel(bruto, InterceptorSync(self.nome, estado))
+        BACKEND_INFLIGHT.labels(service=self.nome, endpoint=endereco).set(0)
+        return Endpoint(endereco, channel, self.stub_cls(channel), parar, estado)
+
+    def _encerrar(self, ep):
+        if all(atual.endereco != ep.endereco for atual in self.endpoints):
+            remover_serie(BACKEND_INFLIGHT, self.nome, ep.endereco)
+        if GRPC_MODE == "async":
+            asyncio.ensure_future(ep.fechar())
+        else:
+            ep.fechar()
+
+    def _escolher(self, excluir=None):
+        """Endpoint da próxima chamada; `excluir` só é escolhido se for o único do pool."""
+        endpoints = self.endpoints
+        if excluir is not None and len(endpoints) > 1:
+            endpoints = [ep for ep in endpoints if ep is not excluir]
+        total = len(endpoints)
+        if total == 0:
+            raise SemEndpoints(self.nome)
+        inicio = self._proximo % total
+        self._proximo += 1
+        if LB_POLICY == "round_robin":
+            return endpoints[inicio]
+        # least_outstanding: menor número de RPCs em andamento, empate decidido em rodízio
+        candidatos = endpoints[inicio:] + endpoints[:inicio]
+        return min(candidatos, key=lambda ep: ep.em_andamento)
+
+    async def chamar(self, metodo, request, timeout=None, metadata=None):
+        """
+        Executa o RPC `metodo` e retorna a mensagem de resposta. Levanta
+        CircuitoAberto sem chamar o backend se o circuit breaker estiver aberto.
+        `metadata` ((chave, valor), ...) vai junto com a chamada.
+        """
+        if timeout is None:
+            timeout = DEADLINES.get(metodo, GRPC_DEADLINE)
+        with tracing.span("backend", service=self.nome, method=metodo):
+            teste = self.breaker.antes_da_chamada()
+            compressao = self._compressao(metodo, request)
+            sucesso = None
+            try:
+                if HEDGE_ENABLED and metodo in self.idempotentes:
+                    resp = await self._chamar_com_hedge(metodo, request, timeout, compressao, metadata)
+                else:
+                    resp = await self._tentativa(metodo, request, timeout, compressao, metadata)
+                sucesso = True
+                return resp
+            except grpc.RpcError as e:
+                if falha_de_infraestrutura(e):
+                    sucesso = False
+                raise
+            finally:
+                self.breaker.registrar(sucesso, teste)
+
+    async def _chamar_com_hedge(self, metodo, request, timeout, compressao, metadata=None):
+        inicio = time.monotonic()
+        primeiro = self._escolher()
+        tarefas = [asyncio.ensure_future(self._tentativa(metodo, request, timeout, compressao, metadata, primeiro))]
+        try:
+            atraso = self._janela(metodo).percentil(HEDGE_PERCENTILE)
+            if atraso is None:
+                return await tarefas[0]
+            feitas, _ = await asyncio.wait(tarefas, timeout=max(HEDGE_MIN_DELAY, atraso))
+            if feitas:
+                return tarefas[0].result()
+
+            # Primeira tentativa passou do p95: dispara a segunda com o que resta do deadline
+            HEDGE_REQUESTS.labels(service=self.nome, method=metodo).inc()
+            restante = max(0.0, timeout - (time.monotonic() - inicio))
+            segundo = self._escolher(excluir=primeiro)
+            tarefas.append(
+                asyncio.ensure_future(self._tentativa(metodo, request, restante, compressao, metadata, segundo))
+            )
+            pendentes = set(tarefas)
+            erro = None
+            while pendentes:
+                feitas, pendentes = await asyncio.wait(pendentes, return_when=asyncio.FIRST_COMPLETED)
+                for tarefa in feitas:
+                    if tarefa.exception() is None:
+                        vencedora = 'primary' if tarefa is tarefas[0] else 'hedge'
+                        HEDGE_WINS.labels(service=self.nome, method=metodo, winner=vencedora).inc()
+                        return tarefa.result()
+                    erro = tarefa.exception()
+            raise erro
+        finally:
+            for tarefa in tarefas:
+                if not tarefa.done():
+                    tarefa.cancel()
+
+    def _janela(self, metodo):
+        janela = self.latencias.get(metodo)
+        if janela is None:
+            janela = self.latencias[metodo] = JanelaLatencia()
+        return janela
+
+    def _compressao(self, metodo, request):
+        """Compressão da chamada: só para mensagens a partir de GRPC_COMPRESSION_MIN_SIZE."""
+        if GRPC_COMPRESSION == "none":
+            return None
+        if request.ByteSize() < GRPC_COMPRESSION_MIN_SIZE:
+            return grpc.Compression.NoCompression
+        GRPC_COMPRESSED_MESSAGES.labels(service=self.nome, method=metodo).inc()
+        self._comprimidas += 1
+        if self._comprimidas % GRPC_COMPRESSION_SAMPLE == 0:
+            # Comprime uma amostra aqui para estimar ganho e custo (o grpc não os expõe)
+            dados = request.SerializeToString()
+            inicio = time.thread_time()
+            compressor = zlib.compressobj(wbits=_WBITS[GRPC_COMPRESSION])
+            tamanho = len(compressor.compress(dados) + compressor.flush())
+            cpu = time.thread_time() - inicio
+            GRPC_COMPRESSION_SAVED_BYTES.labels(service=self.nome, method=metodo).inc(
+                (len(dados) - tamanho) * GRPC_COMPRESSION_SAMPLE
+            )
+            GRPC_COMPRESSION_CPU_SECONDS.labels(service=self.nome, method=metodo).inc(cpu * GRPC_COMPRESSION_SAMPLE)
+        return _ALGORITMOS[GRPC_COMPRESSION]
+
+    async def _tentativa(self, metodo, request, timeout, compressao=None, metadata=None, ep=None):
+        """Uma chamada em `ep` ou, sem ele (ou se saiu da rotação), em um endpoint escolhido pelo balanceador."""
+        if ep is None or not ep.ativo:
+            ep = self._escolher()
+        ep.em_andamento += 1
+        inflight = BACKEND_INFLIGHT.labels(service=self.nome, endpoint=ep.endereco)
+        inflight.inc()
+        inicio = time.monotonic()
+        try:
+            rpc = getattr(ep.stub, metodo)
+            if GRPC_MODE == "async":
+                resp = await rpc(request, timeout=timeout, compression=compressao, metadata=metadata)
+            else:
+                resp = await run_in_threadpool(rpc, request, timeout=timeout, compression=compressao, metadata=metadata)
+            self._janela(metodo).registrar(time.monotonic() - inicio)
+            return resp
+        finally:
+            ep.em_andamento -= 1
+            if ep.ativo:
+                inflight.dec()
+            elif ep.em_andamento == 0:
+                self._encerrar(ep)
+
+    async def fechar(self):
+        for ep in self.endpoints:
+            remover_serie(BACKEND_INFLIGHT, self.nome, ep.endereco)
+            if GRPC_MODE == "async":
+                await ep.fechar()
+            else:
+                ep.fechar()
+        self.endpoints = []
+
+
+def _formatar_endereco(sockaddr):
+    ip, porta = sockaddr[0], sockaddr[1]
+    if ":" in ip:
+        return f"[{ip}]:{porta}"
+    return f"{ip}:{porta}"
+
+
+server_a = Backend(
+    "server-a", SERVER_A_HOST, 50051, catalogo_pb2_grpc.CatalogoServiceStub,
+    idempotentes=("GetPecas", "GetVersao"),
+)
+server_b = Backend(
+    "server-b", SERVER_B_HOST, 50052, pricing_pb2_grpc.OrcamentoServiceStub,
+    idempotentes=("Calcular", "CalcularLote"),
+)
+
+BACKENDS = (server_a, server_b)
+
+_tarefa_resolucao = None
+
+
+async def _re_resolver_periodicamente():
+    while True:
+        await asyncio.sleep(RESOLVE_INTERVAL)
+        for backend in BACKENDS:
+            await backend.resolver()
+
+
+async def conectar():
+    global _tarefa_resolucao
+    for backend in BACKENDS:
+        await backend.conectar()
+    if RESOLVE_INTERVAL > 0:
+        _tarefa_resolucao = asyncio.create_task(_re_resolver_periodicamente())
+
+
+async def fechar():
+    global _tarefa_resolucao
+    if _tarefa_resolucao is not None:
+        _tarefa_resolucao.cancel()
+        _tarefa_resolucao = None
+    for backend in BACKENDS:
+        await backend.fechar()
@@ -0,0 +1,161 @@
+"""
+Micro-batching dos orçamentos (Calcular) enviados ao Server B.
+
+No pico, cada /calcular (e o orçamento do /checkout) vira um RPC Calcular
+separado. Aqui os pedidos que chegam juntos são agrupados:
+
+- sem nenhum lote em voo, o pedido sai na hora (lote de um): com carga baixa
+  não há com quem agrupar e a janela só somaria latência;
+- com um lote em voo, o pedido abre uma janela de P_API_CALC_BATCH_WINDOW
+  segundos; os que chegarem nela entram no mesmo lote, que sai no fim da
+  janela ou assim que juntar P_API_CALC_BATCH_MAX pedidos;
+- o lote vai em um único CalcularLote, e o custo por RPC (HTTP/2, metadados,
+  interceptors, circuit breaker) é pago uma vez por lote. Um lote de um
+  pedido só segue como Calcular normal;
+- cada pedido recebe o próprio resultado. O pedido recusado pelo Server B
+  levanta PedidoRecusado (um grpc.RpcError com INVALID_ARGUMENT, como o
+  Calcular faria) sem afetar os outros; uma falha do lote inteiro
+  (UNAVAILABLE, deadline, circuito aberto) vai para todos os pedidos dele,
+  cada um com a própria cópia da exceção (traceback e contexto separados).
+
+Se o Server B ainda não tiver o CalcularLote (UNIMPLEMENTED), o
+micro-batching se desliga sozinho e o lote é reenviado como Calcular
+individuais.
+
+O lote é enviado com o contexto do pedido que o abriu (ou completou): o
+span "grpc" e o compartimento (bulkhead.py) são os desse pedido. Os demais
+ganham só o span "lote", com a espera.
+
+p_api_batch_size e p_api_batch_queue_delay_seconds guardam o tamanho dos
+lotes e quanto cada pedido esperou pela saída do lote.
+"""
+import asyncio
+import os
+import time
+
+import grpc
+
+import generated.pricing_pb2 as pricing_pb2
+import logs
+import tracing
+from metrics import BATCH_SIZE, BATCH_QUEUE_DELAY
+
+
+CALC_BATCH_WINDOW = float(os.getenv("P_API_CALC_BATCH_WINDOW", "0.002"))
+CALC_BATCH_MAX = int(os.getenv("P_API_CALC_BATCH_MAX", "64"))
+
+log = logs.obter("batching")
+
+
+class PedidoRecusado(grpc.RpcError):
+    """Pedido de um lote recusado pelo Server B; equivale ao INVALID_ARGUMENT do Calcular."""
+
+    def __init__(self, detalhes):
+        super().__init__(detalhes)
+        self._detalhes = detalhes
+
+    def code(self):
+        return grpc.StatusCode.INVALID_ARGUMENT
+
+    def details(self):
+        return self._detalhes
+
+
+class LoteCalcular:
+    """Agrupa os Calcular simultâneos de um Backend em CalcularLote."""
+
+    def __init__(self, backend, janela=CALC_BATCH_WINDOW, maximo=CALC_BATCH_MAX):
+        self.backend = backend
+        self.janela = janela
+        self.maximo = maximo
+        self.habilitado = janela > 0 and maximo > 1
+        self._pendentes = []  # (request, futuro, enfileirado_em)
+        self._timer = None
+        self._enviando = set()  # referências às tarefas dos lotes em voo
+        self._tamanho = BATCH_SIZE.labels(method="Calcular")
+        self._espera = BATCH_QUEUE_DELAY.labels(method="Calcular")
+
+    async def calcular(self, request):
+        """Preco do `request`, calculado sozinho ou dentro de um lote."""
+        if not self.habilitado:
+            return await self.backend.chamar("Calcular", request)
+
+        futuro = asyncio.get_running_loop().create_future()
+        self._pendentes.append((request, futuro, time.monotonic()))
+        # Lote cheio ou nenhum lote em voo (sem concorrência, a janela só atrasaria o pedido)
+        if len(self._pendentes) >= self.maximo or not self._enviando:
+            self._enviar()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.janela, self._enviar)
+        with tracing.span("lote"):
+            return await futuro
+
+    def _enviar(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pendentes, self._pendentes = self._pendentes, []
+        if pendentes:
+            tarefa = asyncio.ensure_future(self._chamar(pendentes))
+            self._enviando.add(tarefa)
+            tarefa.add_done_callback(self._enviando.discard)
+
+    async def _chamar(self, pendentes):
+        agora = time.monotonic()
+        self._tamanho.observe(len(pendentes))
+        for _, _, enfileirado_em in pendentes:
+            self._espera.observe(agora - enfileirado_em)
+
+        try:
+            resultados = await self._resultados([request for request, _, _ in pendentes])
+        except asyncio.CancelledError:
+            # Lote cancelado (desligamento): ninguém fica esperando para sempre
+            for _, futuro, _ in pendentes:
+                futuro.cancel()
+            raise
+        except Exception as e:
+            resultados = [e] + [_copiar_excecao(e) for _ in pendentes[1:]]
+
+        for (_, futuro, _), resultado in zip(pendentes, resultados):
+            if futuro.done():
+                continue  # quem pediu desistiu (cancelado)
+            if isinstance(resultado, BaseException):
+                futuro.set_exception(resultado)
+            else:
+                futuro.set_result(resultado)
+
+    async def _resultados(self, requests):
+        """Um Preco ou uma exceção por request, na mesma ordem."""
+        if len(requests) == 1:
+            return [await self.backend.chamar("Calcular", requests[0])]
+        try:
+            resposta = await self.backend.chamar("CalcularLote", pricing_pb2.OrcamentoLoteRequest(pedidos=requests))
+        except grpc.RpcError as e:
+            if e.code() != grpc.StatusCode.UNIMPLEMENTED:
+                raise
+            log.warning("Server B sem CalcularLote, micro-batching desligado", service=self.backend.nome)
+            self.habilitado = False
+            return await asyncio.gather(
+                *(self.backend.chamar("Calcular", request) for request in requests), return_exceptions=True
+            )
+        if len(resposta.resultados) != len(requests):
+            raise RuntimeError(
+                f"CalcularLote devolveu {len(resposta.resultados)} resultados para {len(requests)} pedidos"
+            )
+        return [
+            resultado.preco if resultado.WhichOneof("resultado") == "preco" else PedidoRecusado(resultado.erro)
+            for resultado in resposta.resultados
+        ]
+
+
+def _copiar_excecao(e):
+    """
+    Cópia rasa de `e` (mesma classe e atributos, sem traceback): cada pedido
+    do lote relança a própria instância, e o __traceback__/__context__ de um
+    não aparece no log do outro.
+    """
+    copia = type(e).__new__(type(e), *e.args)
+    copia.args = e.args
+    copia.__dict__.update(vars(e))
+    copia.__cause__ = e.__cause__
+    return copia
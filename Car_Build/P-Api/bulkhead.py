@@ -0,0 +1,124 @@
+"""
+Compartimentos (bulkheads) por endpoint.
+
+Cada endpoint listado em P_API_BULKHEADS tem um compartimento próprio com
+`tamanho` vagas e uma fila de no máximo `fila` requisições:
+
+- no máximo `tamanho` requisições do endpoint rodam ao mesmo tempo; as
+  seguintes esperam na fila por até P_API_BULKHEAD_QUEUE_TIMEOUT segundos e,
+  com a fila cheia ou o tempo esgotado, recebem 503 com `Retry-After`;
+- no modo sync, as chamadas gRPC das requisições do compartimento rodam em
+  um limitador de threads próprio, também com `tamanho` threads
+  (saturation.run_in_threadpool), e não no threadpool padrão do anyio.
+
+Assim um pico de /pagar (RealizarCompra é o RPC mais lento) esgota só as
+vagas do /pagar. O threadpool padrão (P_API_THREADPOOL_SIZE) fica reservado
+para as rotas síncronas que não passam por nenhum compartimento: /health,
+/metrics e /debug/*, que respondem mesmo com todos os compartimentos cheios.
+
+Formato de P_API_BULKHEADS: "/pagar=20:40,/calcular=40:100" (endpoint=tamanho:fila).
+"""
+import contextvars
+import os
+
+import anyio
+
+from admission import rejeitar
+from metrics import (
+    REQUEST_COUNT,
+    BULKHEAD_SIZE,
+    BULKHEAD_IN_USE,
+    BULKHEAD_QUEUE,
+    BULKHEAD_REJECTED,
+)
+from slots import Vagas
+
+
+BULKHEAD_ENABLED = os.getenv("P_API_BULKHEAD", "1") != "0"
+BULKHEADS = os.getenv(
+    "P_API_BULKHEADS",
+    "/get-pecas=40:100,/get-pecas/batch=8:16,/calcular=40:100,/pagar=20:40,/checkout=10:20",
+)
+BULKHEAD_QUEUE_TIMEOUT = float(os.getenv("P_API_BULKHEAD_QUEUE_TIMEOUT", "1"))
+
+# Compartimento da requisição em andamento (lido por saturation.run_in_threadpool)
+_atual = contextvars.ContextVar("compartimento_atual", default=None)
+
+
+def ler_configuracao(valor):
+    """"/pagar=20:40,/calcular=40" -> {"/pagar": (20, 40), "/calcular": (40, 0)}"""
+    compartimentos = {}
+    for item in valor.split(","):
+        if not item.strip():
+            continue
+        endpoint, _, tamanhos = item.strip().partition("=")
+        tamanho, _, fila = tamanhos.partition(":")
+        compartimentos[endpoint] = (int(tamanho), int(fila or 0))
+    return compartimentos
+
+
+class Compartimento(Vagas):
+    """Vagas, fila e limitador de threads de um endpoint."""
+
+    def __init__(self, endpoint, tamanho, fila_max):
+        super().__init__(
+            tamanho, fila_max, BULKHEAD_QUEUE_TIMEOUT,
+            BULKHEAD_IN_USE.labels(pool=endpoint), BULKHEAD_QUEUE.labels(pool=endpoint),
+        )
+        self.endpoint = endpoint
+        self.threads = anyio.CapacityLimiter(tamanho)
+        BULKHEAD_SIZE.labels(pool=endpoint).set(tamanho)
+
+    def resumo(self):
+        estatisticas = self.threads.statistics()
+        return {
+            "tamanho": self.capacidade,
+            "em_uso": self.em_uso,
+            "fila": len(self.fila),
+            "fila_max": self.fila_max,
+            "threads_ocupadas": estatisticas.borrowed_tokens,
+            "threads_fila": estatisticas.tasks_waiting,
+        }
+
+
+compartimentos = {
+    endpoint: Compartimento(endpoint, tamanho, fila)
+    for endpoint, (tamanho, fila) in ler_configuracao(BULKHEADS).items()
+} if BULKHEAD_ENABLED else {}
+
+
+def limitador_threads():
+    """Limitador de threads do compartimento da requisição atual (None = threadpool padrão)."""
+    compartimento = _atual.get()
+    return compartimento.threads if compartimento is not None else None
+
+
+def resumo():
+    return {endpoint: compartimento.resumo() for endpoint, compartimento in compartimentos.items()}
+
+
+class BulkheadMiddleware:
+    """Passa cada requisição de um endpoint com compartimento pelas vagas dele."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        compartimento = compartimentos.get(scope["path"]) if scope["type"] == "http" else None
+        if compartimento is None:
+            await self.app(scope, receive, send)
+            return
+
+        motivo = await compartimento.adquirir()
+        if motivo is not None:
+            BULKHEAD_REJECTED.labels(pool=compartimento.endpoint, reason=motivo).inc()
+            REQUEST_COUNT.labels(method=scope["method"], endpoint=compartimento.endpoint, status='503').inc()
+            await rejeitar(scope, send)
+            return
+
+        token = _atual.set(compartimento)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _atual.reset(token)
+            compartimento.liberar()
@@ -0,0 +1,85 @@
+"""
+Cache em memória (TTL + LRU) para as respostas do catálogo de peças.
+
+O catálogo é pequeno e muda pouco, então a P-API guarda cada `PecasResponse`
+já serializado (JSON e protobuf), indexado por (modelo, ano) normalizado.
+Misses simultâneos para a mesma chave são agrupados (single-flight,
+singleflight.py): apenas a primeira requisição chama o Server A e as demais
+aguardam o mesmo resultado.
+Quando uma entrada expira, o valor antigo é passado para a carga, que pode
+revalidá-lo (GetVersao) em vez de buscar o catálogo de novo.
+
+Configuração via variáveis de ambiente:
+- P_API_CATALOG_CACHE_TTL: validade de cada entrada em segundos (0 desliga o cache)
+- P_API_CATALOG_CACHE_SIZE: número máximo de entradas
+"""
+import os
+
+from metrics import (
+    CATALOG_CACHE_HITS,
+    CATALOG_CACHE_MISSES,
+    CATALOG_CACHE_COALESCED,
+    CATALOG_CACHE_EVICTIONS,
+    CATALOG_CACHE_ENTRIES,
+)
+from singleflight import EntradasLRU, SingleFlight
+
+
+CACHE_TTL = float(os.getenv("P_API_CATALOG_CACHE_TTL", "30"))
+CACHE_SIZE = int(os.getenv("P_API_CATALOG_CACHE_SIZE", "256"))
+
+
+def chave_carro(carro):
+    """
+    Chave normalizada de um `Carro`, igual à comparação do Server A
+    (LOWER(modelo_fk) = LOWER($1)): só ignora a caixa. Espaços contam, porque
+    " civic" e "civic" são consultas diferentes no banco.
+    """
+    return (carro.modelo.lower(), carro.ano)
+
+
+class CatalogoCache:
+    def __init__(self, max_entradas=CACHE_SIZE, ttl=CACHE_TTL):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._entradas = EntradasLRU(
+            max_entradas, ttl, CATALOG_CACHE_ENTRIES,
+            lambda motivo: CATALOG_CACHE_EVICTIONS.labels(reason=motivo).inc(),
+        )
+        self._cargas = SingleFlight()
+
+    @property
+    def habilitado(self):
+        return self.ttl > 0 and self.max_entradas > 0
+
+    async def obter(self, chave, carregar):
+        """
+        Retorna o valor de `chave`, chamando `carregar(anterior)` (corrotina)
+        apenas quando não houver entrada válida nem carga em andamento para
+        ela. `anterior` é o valor expirado da chave, ou None.
+        """
+        if not self.habilitado:
+            CATALOG_CACHE_MISSES.inc()
+            return await carregar(None)
+
+        anterior, valido = self._entradas.buscar(chave)
+        if valido:
+            CATALOG_CACHE_HITS.inc()
+            return anterior
+
+        em_andamento = self._cargas.em_andamento(chave)
+        if em_andamento is not None:
+            CATALOG_CACHE_COALESCED.inc()
+            tarefa, _ = em_andamento
+        else:
+            CATALOG_CACHE_MISSES.inc()
+            tarefa = self._cargas.iniciar(chave, lambda: self._carregar(chave, carregar, anterior))
+        return await self._cargas.aguardar(tarefa)
+
+    async def _carregar(self, chave, carregar, anterior):
+        valor = await carregar(anterior)
+        self._entradas.guardar(chave, valor)
+        return valor
+
+    def limpar(self):
+        self._entradas.limpar()
@@ -0,0 +1,302 @@
+"""
+Conversão direta entre JSON (bytes) e mensagens protobuf no caminho quente.
+
+`json_format.ParseDict`/`MessageToDict` fazem reflexão campo a campo a cada
+requisição. Aqui os descritores das mensagens usadas pela P-API são
+compilados uma única vez, no import, em funções especializadas:
+
+- `decodificar(cls, dados)`: bytes JSON da requisição -> mensagem protobuf,
+  construída direto pelos kwargs (aceita o nome do campo ou o camelCase,
+  como o ParseDict);
+- `codificar(mensagem)`: mensagem protobuf -> bytes JSON, escritos sem montar
+  dicts intermediários, com a mesma saída do `MessageToDict` (nomes em
+  camelCase como `pedidoId`/`dataPedido`, campos com valor padrão omitidos).
+
+Clientes que já têm os .proto (Car_Build/protos) podem dispensar o JSON:
+`Content-Type: application/x-protobuf` envia a mensagem serializada e
+`Accept: application/x-protobuf` pede a resposta serializada
+(`ler`, `aceita_protobuf`). Sem esses headers, vale o JSON.
+
+Escalares suportados: string, bool, inteiros (int64 como string, como o
+MessageToDict), double e float (escrito com a menor representação que volta
+ao mesmo float32, também como o MessageToDict). Tipos não usados pelos .proto
+do projeto (enums, bytes, maps, oneofs) não são suportados e fazem a
+compilação falhar com TypeError.
+"""
+import json
+import math
+from functools import lru_cache
+from json.encoder import encode_basestring
+
+from google.protobuf import message_factory
+from google.protobuf.message import DecodeError
+from google.protobuf.descriptor import FieldDescriptor
+from google.protobuf.internal.type_checkers import ToShortestFloat
+
+import generated.catalogo_pb2 as catalogo_pb2
+import generated.pricing_pb2 as pricing_pb2
+from negociacao import ler_qvalues
+
+
+PROTOBUF = "application/x-protobuf"
+
+
+class CodecError(ValueError):
+    """Corpo (JSON ou protobuf) inválido para a mensagem esperada."""
+
+
+_INT32_TYPES = (FieldDescriptor.CPPTYPE_INT32, FieldDescriptor.CPPTYPE_UINT32)
+_INT64_TYPES = (FieldDescriptor.CPPTYPE_INT64, FieldDescriptor.CPPTYPE_UINT64)
+_FLOAT_TYPES = (FieldDescriptor.CPPTYPE_DOUBLE, FieldDescriptor.CPPTYPE_FLOAT)
+
+_decodificadores = {}  # full_name -> função(dict) -> mensagem
+_codificadores = {}  # full_name -> função(mensagem) -> str
+
+
+# ---------------------------------------------------------------------------
+# Decodificação (JSON -> protobuf)
+# ---------------------------------------------------------------------------
+
+def _ler_string(valor):
+    if not isinstance(valor, str):
+        raise CodecError(f"esperado string, recebido {valor!r}")
+    return valor
+
+
+def _ler_bool(valor):
+    if not isinstance(valor, bool):
+        raise CodecError(f"esperado booleano, recebido {valor!r}")
+    return valor
+
+
+def _ler_inteiro(valor):
+    # Como o ParseDict: aceita números inteiros, floats sem parte decimal e strings numéricas
+    if isinstance(valor, bool):
+        raise CodecError(f"esperado inteiro, recebido {valor!r}")
+    if isinstance(valor, int):
+        return valor
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    if isinstance(valor, str):
+        try:
+            return int(valor)
+        except ValueError:
+            pass
+    raise CodecError(f"esperado inteiro, recebido {valor!r}")
+
+
+def _ler_float(valor):
+    if isinstance(valor, bool):
+        raise CodecError(f"esperado número, recebido {valor!r}")
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    if isinstance(valor, str):
+        try:
+            return float(valor)
+        except ValueError:
+            pass
+    raise CodecError(f"esperado número, recebido {valor!r}")
+
+
+def _leitor_escalar(campo):
+    if campo.cpp_type == FieldDescriptor.CPPTYPE_STRING and campo.type != FieldDescriptor.TYPE_BYTES:
+        return _ler_string
+    if campo.cpp_type == FieldDescriptor.CPPTYPE_BOOL:
+        return _ler_bool
+    if campo.cpp_type in _INT32_TYPES or campo.cpp_type in _INT64_TYPES:
+        return _ler_inteiro
+    if campo.cpp_type in _FLOAT_TYPES:
+        return _ler_float
+    raise TypeError(f"campo {campo.full_name} tem tipo não suportado pelo codec")
+
+
+def _compilar_decodificador(descritor):
+    if descritor.full_name in _decodificadores:
+        return _decodificadores[descritor.full_name]
+
+    cls = message_factory.GetMessageClass(descritor)
+    leitores = {}  # chave JSON -> (nome do campo, leitor, repetido)
+
+    def decodificar_dict(obj):
+        if not isinstance(obj, dict):
+            raise CodecError(f"esperado objeto JSON para {descritor.name}")
+        kwargs = {}
+        for chave, valor in obj.items():
+            try:
+                nome, leitor, repetido = leitores[chave]
+            except KeyError:
+                raise CodecError(f"campo desconhecido {chave!r} em {descritor.name}") from None
+            if valor is None:
+                continue
+            if repetido:
+                if not isinstance(valor, list):
+                    raise CodecError(f"campo {chave!r} de {descritor.name} deve ser uma lista")
+                kwargs[nome] = [leitor(item) for item in valor]
+            else:
+                kwargs[nome] = leitor(valor)
+        try:
+            return cls(**kwargs)
+        except (TypeError, ValueError) as e:
+            raise CodecError(f"valor inválido para {descritor.name}: {e}") from None
+
+    # Registra antes de compilar os campos para suportar mensagens recursivas
+    _decodificadores[descritor.full_name] = decodificar_dict
+
+    for campo in descritor.fields:
+        if campo.containing_oneof is not None or (
+            campo.message_type is not None and campo.message_type.GetOptions().map_entry
+        ):
+            raise TypeError(f"campo {campo.full_name} não suportado pelo codec")
+        if campo.cpp_type == FieldDescriptor.CPPTYPE_MESSAGE:
+            leitor = _compilar_decodificador(campo.message_type)
+        else:
+            leitor = _leitor_escalar(campo)
+        entrada = (campo.name, leitor, campo.is_repeated)
+        leitores[campo.name] = entrada
+        leitores[campo.json_name] = entrada
+
+    return decodificar_dict
+
+
+def decodificar(cls, dados):
+    """Converte o corpo JSON (bytes ou str) em uma instância de `cls`."""
+    try:
+        obj = json.loads(dados)
+    except ValueError as e:
+        raise CodecError(f"JSON inválido: {e}") from None
+    return decodificar_objeto(cls, obj)
+
+
+def decodificar_objeto(cls, obj):
+    """Converte um objeto JSON já carregado (dict) em uma instância de `cls`."""
+    decodificador = _decodificadores.get(cls.DESCRIPTOR.full_name)
+    if decodificador is None:
+        decodificador = _compilar_decodificador(cls.DESCRIPTOR)
+    return decodificador(obj)
+
+
+# ---------------------------------------------------------------------------
+# Codificação (protobuf -> JSON)
+# ---------------------------------------------------------------------------
+
+def _escrever_float(valor):
+    if math.isnan(valor):
+        return '"NaN"'
+    if math.isinf(valor):
+        return '"-Infinity"' if valor < 0 else '"Infinity"'
+    return float.__repr__(valor)
+
+
+def _escrever_float32(valor):
+    # O campo float guarda um float32 já convertido para double: 0.1 vira 0.10000000149011612
+    if math.isnan(valor) or math.isinf(valor):
+        return _escrever_float(valor)
+    return float.__repr__(ToShortestFloat(valor))
+
+
+def _escrever_bool(valor):
+    return "true" if valor else "false"
+
+
+def _escrever_int64(valor):
+    return f'"{valor}"'
+
+
+def _escritor_escalar(campo):
+    if campo.cpp_type == FieldDescriptor.CPPTYPE_STRING and campo.type != FieldDescriptor.TYPE_BYTES:
+        return encode_basestring
+    if campo.cpp_type == FieldDescriptor.CPPTYPE_BOOL:
+        return _escrever_bool
+    if campo.cpp_type in _INT32_TYPES:
+        return int.__repr__
+    if campo.cpp_type in _INT64_TYPES:
+        return _escrever_int64
+    if campo.cpp_type == FieldDescriptor.CPPTYPE_DOUBLE:
+        return _escrever_float
+    if campo.cpp_type == FieldDescriptor.CPPTYPE_FLOAT:
+        return _escrever_float32
+    raise TypeError(f"campo {campo.full_name} tem tipo não suportado pelo codec")
+
+
+def _compilar_codificador(descritor):
+    if descritor.full_name in _codificadores:
+        return _codificadores[descritor.full_name]
+
+    escritores = {}  # número do campo -> (prefixo '"jsonName":', escritor, repetido)
+
+    def codificar_mensagem(mensagem):
+        partes = []
+        # ListFields devolve só os campos presentes, na ordem dos números (como o MessageToDict)
+        for campo, valor in mensagem.ListFields():
+            prefixo, escritor, repetido = escritores[campo.number]
+            if repetido:
+                partes.append(prefixo + "[" + ",".join([escritor(item) for item in valor]) + "]")
+            else:
+                partes.append(prefixo + escritor(valor))
+        return "{" + ",".join(partes) + "}"
+
+    _codificadores[descritor.full_name] = codificar_mensagem
+
+    for campo in descritor.fields:
+        if campo.containing_oneof is not None or (
+            campo.message_type is not None and campo.message_type.GetOptions().map_entry
+        ):
+            raise TypeError(f"campo {campo.full_name} não suportado pelo codec")
+        if campo.cpp_type == FieldDescriptor.CPPTYPE_MESSAGE:
+            escritor = _compilar_codificador(campo.message_type)
+        else:
+            escritor = _escritor_escalar(campo)
+        prefixo = encode_basestring(campo.json_name) + ":"
+        escritores[campo.number] = (prefixo, escritor, campo.is_repeated)
+
+    return codificar_mensagem
+
+
+def codificar(mensagem):
+    """Serializa `mensagem` em bytes JSON (UTF-8, sem espaços)."""
+    codificador = _codificadores.get(mensagem.DESCRIPTOR.full_name)
+    if codificador is None:
+        codificador = _compilar_codificador(mensagem.DESCRIPTOR)
+    return codificador(mensagem).encode("utf-8")
+
+
+# ---------------------------------------------------------------------------
+# Negociação JSON x protobuf
+# ---------------------------------------------------------------------------
+
+def corpo_protobuf(content_type):
+    """True se o Content-Type da requisição indica protobuf serializado."""
+    return content_type is not None and content_type.startswith(PROTOBUF)
+
+
+def ler(cls, dados, content_type=None):
+    """Decodifica o corpo como protobuf ou JSON, conforme o Content-Type."""
+    if corpo_protobuf(content_type):
+        try:
+            return cls.FromString(dados)
+        except DecodeError as e:
+            raise CodecError(f"protobuf inválido para {cls.DESCRIPTOR.name}: {e}") from None
+    return decodificar(cls, dados)
+
+
+@lru_cache(maxsize=128)
+def _prefere_protobuf(accept):
+    aceitos = ler_qvalues(accept)
+    q_protobuf = aceitos.get(PROTOBUF, 0.0)
+    q_json = max(aceitos.get(tipo, 0.0) for tipo in ("application/json", "application/*", "*/*"))
+    # Protobuf só quando pedido explicitamente e com prioridade >= à do JSON
+    return q_protobuf > 0 and q_protobuf >= q_json
+
+
+def aceita_protobuf(accept):
+    """True se o header Accept pede a resposta em protobuf (JSON é o padrão)."""
+    if not accept or PROTOBUF not in accept.lower():
+        return False
+    return _prefere_protobuf(accept)
+
+
+# Mensagens do caminho quente, compiladas no import
+for _cls in (catalogo_pb2.Carro, pricing_pb2.OrcamentoRequest, pricing_pb2.CompraRequest):
+    _compilar_decodificador(_cls.DESCRIPTOR)
+for _cls in (catalogo_pb2.PecasResponse, pricing_pb2.Preco, pricing_pb2.CompraResponse):
+    _compilar_codificador(_cls.DESCRIPTOR)
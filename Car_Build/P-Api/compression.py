@@ -0,0 +1,167 @@
+"""
+Compressão das respostas HTTP da P-API (gzip ou brotli), negociada pelo
+`Accept-Encoding` do cliente.
+
+- brotli tem preferência quando o cliente aceita e o módulo `brotli` está
+  instalado; senão, gzip;
+- respostas com corpo completo só são comprimidas a partir de
+  P_API_COMPRESSION_MIN_SIZE bytes: abaixo disso o ganho não paga a CPU e
+  o corpo já cabe em poucos pacotes;
+- respostas em streaming (NDJSON do /get-pecas/batch) são comprimidas por
+  chunk com flush, para cada linha continuar chegando assim que fica pronta;
+- só tipos que comprimem bem (JSON, NDJSON, texto, protobuf) entram.
+
+A CPU gasta comprimindo é medida com `time.thread_time()` (tempo de CPU da
+thread do event loop, não o tempo de parede) e vai para
+p_api_compression_cpu_seconds_total, junto com os bytes economizados.
+
+O middleware é ASGI puro, como o de admissão (admission.py).
+"""
+import os
+import time
+import zlib
+from functools import lru_cache
+
+from starlette.datastructures import MutableHeaders
+
+from metrics import COMPRESSED_RESPONSES, COMPRESSION_SAVED_BYTES, COMPRESSION_CPU_SECONDS
+from negociacao import ler_qvalues
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional: sem ele, só gzip
+    brotli = None
+
+
+COMPRESSION_ENABLED = os.getenv("P_API_COMPRESSION", "1") != "0"
+COMPRESSION_MIN_SIZE = int(os.getenv("P_API_COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("P_API_GZIP_LEVEL", "5"))
+BROTLI_QUALITY = int(os.getenv("P_API_BROTLI_QUALITY", "4"))
+
+_TIPOS_COMPRIMIVEIS = (
+    "application/json",
+    "application/x-ndjson",
+    "application/x-protobuf",
+    "text/",
+)
+
+
+@lru_cache(maxsize=128)
+def escolher_codificacao(accept_encoding):
+    """"br", "gzip" ou None a partir do header Accept-Encoding."""
+    aceitas = ler_qvalues(accept_encoding)
+    curinga = aceitas.get("*", 0.0)
+    if brotli is not None and aceitas.get("br", curinga) > 0:
+        return "br"
+    if aceitas.get("gzip", curinga) > 0:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    """Compressor incremental com a mesma interface para gzip e brotli."""
+
+    def __init__(self, codificacao):
+        self.codificacao = codificacao
+        if codificacao == "br":
+            self._c = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31 = formato gzip
+        self.entrada = 0
+        self.saida = 0
+        self.cpu = 0.0
+
+    def comprimir(self, dados, fim):
+        inicio = time.thread_time()
+        if self.codificacao == "br":
+            saida = self._c.process(dados) + (self._c.finish() if fim else self._c.flush())
+        else:
+            saida = self._c.compress(dados) + self._c.flush(zlib.Z_FINISH if fim else zlib.Z_SYNC_FLUSH)
+        self.cpu += time.thread_time() - inicio
+        self.entrada += len(dados)
+        self.saida += len(saida)
+        return saida
+
+    def registrar(self):
+        COMPRESSED_RESPONSES.labels(encoding=self.codificacao).inc()
+        COMPRESSION_SAVED_BYTES.labels(encoding=self.codificacao).inc(self.entrada - self.saida)
+        COMPRESSION_CPU_SECONDS.labels(encoding=self.codificacao).inc(self.cpu)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimo=COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimo = minimo
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        codificacao = None
+        for nome, valor in scope["headers"]:
+            if nome == b"accept-encoding":
+                codificacao = escolher_codificacao(valor.decode("latin-1"))
+                break
+        if codificacao is None:
+            await self.app(scope, receive, send)
+            return
+
+        inicio_resposta = None
+        compressor = None
+        repassar = False
+
+        async def send_comprimido(message):
+            nonlocal inicio_resposta, compressor, repassar
+            if repassar:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                tipo = headers.get("content-type", "")
+                if "content-encoding" in headers or not tipo.startswith(_TIPOS_COMPRIMIVEIS):
+                    repassar = True
+                    await send(message)
+                else:
+                    # Segura o início até saber o tamanho do corpo
+                    inicio_resposta = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            corpo = message.get("body", b"")
+            mais = message.get("more_body", False)
+            headers = MutableHeaders(scope=inicio_resposta)
+
+            if compressor is None:
+                headers.add_vary_header("Accept-Encoding")
+                if not mais and len(corpo) < self.minimo:
+                    repassar = True
+                    await send(inicio_resposta)
+                    await send(message)
+                    return
+                compressor = _Compressor(codificacao)
+                headers["Content-Encoding"] = codificacao
+                if mais:
+                    # Streaming: tamanho final desconhecido
+                    del headers["Content-Length"]
+                    await send(inicio_resposta)
+                else:
+                    comprimido = compressor.comprimir(corpo, fim=True)
+                    headers["Content-Length"] = str(len(comprimido))
+                    await send(inicio_resposta)
+                    await send({"type": "http.response.body", "body": comprimido})
+                    compressor.registrar()
+                    return
+
+            await send({
+                "type": "http.response.body",
+                "body": compressor.comprimir(corpo, fim=not mais),
+                "more_body": mais,
+            })
+            if not mais:
+                compressor.registrar()
+
+        await self.app(scope, receive, send_comprimido)
@@ -25,7 +25,7 @@ _sym_db = _symbol_database.Default()
 from . import common_pb2 as common__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0e\x63\x61talogo.proto\x12\x08\x63\x61talogo\x1a\x0c\x63ommon.proto\"$\n\x05\x43\x61rro\x12\x0e\n\x06modelo\x18\x01 \x01(\t\x12\x0b\n\x03\x61no\x18\x02 \x01(\x05\",\n\rPecasResponse\x12\x1b\n\x05pecas\x18\x01 \x03(\x0b\x32\x0c.common.Peca2G\n\x0f\x43\x61talogoService\x12\x34\n\x08GetPecas\x12\x0f.catalogo.Carro\x1a\x17.catalogo.PecasResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0e\x63\x61talogo.proto\x12\x08\x63\x61talogo\x1a\x0c\x63ommon.proto\"$\n\x05\x43\x61rro\x12\x0e\n\x06modelo\x18\x01 \x01(\t\x12\x0b\n\x03\x61no\x18\x02 \x01(\x05\"<\n\rPecasResponse\x12\x1b\n\x05pecas\x18\x01 \x03(\x0b\x32\x0c.common.Peca\x12\x0e\n\x06versao\x18\x02 \x01(\t\" \n\x0eVersaoCatalogo\x12\x0e\n\x06versao\x18\x01 \x01(\t2\x7f\n\x0f\x43\x61talogoService\x12\x34\n\x08GetPecas\x12\x0f.catalogo.Carro\x1a\x17.catalogo.PecasResponse\x12\x36\n\tGetVersao\x12\x0f.catalogo.Carro\x1a\x18.catalogo.VersaoCatalogob\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -35,7 +35,9 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_CARRO']._serialized_start=42
   _globals['_CARRO']._serialized_end=78
   _globals['_PECASRESPONSE']._serialized_start=80
-  _globals['_PECASRESPONSE']._serialized_end=124
-  _globals['_CATALOGOSERVICE']._serialized_start=126
-  _globals['_CATALOGOSERVICE']._serialized_end=197
+  _globals['_PECASRESPONSE']._serialized_end=140
+  _globals['_VERSAOCATALOGO']._serialized_start=142
+  _globals['_VERSAOCATALOGO']._serialized_end=174
+  _globals['_CATALOGOSERVICE']._serialized_start=176
+  _globals['_CATALOGOSERVICE']._serialized_end=303
 # @@protoc_insertion_point(module_scope)
@@ -39,6 +39,11 @@ class CatalogoServiceStub(object):
                 request_serializer=catalogo__pb2.Carro.SerializeToString,
                 response_deserializer=catalogo__pb2.PecasResponse.FromString,
                 _registered_method=True)
+        self.GetVersao = channel.unary_unary(
+                '/catalogo.CatalogoService/GetVersao',
+                request_serializer=catalogo__pb2.Carro.SerializeToString,
+                response_deserializer=catalogo__pb2.VersaoCatalogo.FromString,
+                _registered_method=True)
 
 
 class CatalogoServiceServicer(object):
@@ -51,6 +56,12 @@ class CatalogoServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def GetVersao(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_CatalogoServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -59,6 +70,11 @@ def add_CatalogoServiceServicer_to_server(servicer, server):
                     request_deserializer=catalogo__pb2.Carro.FromString,
                     response_serializer=catalogo__pb2.PecasResponse.SerializeToString,
             ),
+            'GetVersao': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetVersao,
+                    request_deserializer=catalogo__pb2.Carro.FromString,
+                    response_serializer=catalogo__pb2.VersaoCatalogo.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'catalogo.CatalogoService', rpc_method_handlers)
@@ -96,3 +112,30 @@ class CatalogoService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def GetVersao(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/catalogo.CatalogoService/GetVersao',
+            catalogo__pb2.Carro.SerializeToString,
+            catalogo__pb2.VersaoCatalogo.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
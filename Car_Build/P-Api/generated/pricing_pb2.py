@@ -25,7 +25,7 @@ _sym_db = _symbol_database.Default()
 from . import common_pb2 as common__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rpricing.proto\x12\x07pricing\x1a\x0c\x63ommon.proto\"6\n\x04Item\x12\x1a\n\x04peca\x18\x01 \x01(\x0b\x32\x0c.common.Peca\x12\x12\n\nquantidade\x18\x02 \x01(\x05\"4\n\x05Preco\x12\r\n\x05preco\x18\x01 \x01(\x01\x12\r\n\x05\x66rete\x18\x02 \x01(\x01\x12\r\n\x05total\x18\x03 \x01(\x01\"0\n\x10OrcamentoRequest\x12\x1c\n\x05itens\x18\x01 \x03(\x0b\x32\r.pricing.Item\"B\n\rCompraRequest\x12\x1c\n\x05itens\x18\x01 \x03(\x0b\x32\r.pricing.Item\x12\x13\n\x0bvalor_total\x18\x02 \x01(\x01\"\xa6\x01\n\x0e\x43ompraResponse\x12\x11\n\tpedido_id\x18\x01 \x01(\t\x12\x0e\n\x06status\x18\x02 \x01(\t\x12\x13\n\x0bvalor_total\x18\x03 \x01(\x01\x12\x13\n\x0b\x64\x61ta_pedido\x18\x04 \x01(\t\x12&\n\x0fitens_comprados\x18\x05 \x03(\x0b\x32\r.pricing.Item\x12\x10\n\x08subtotal\x18\x06 \x01(\x01\x12\r\n\x05\x66rete\x18\x07 \x01(\x01\x32\x8c\x01\n\x10OrcamentoService\x12\x35\n\x08\x43\x61lcular\x12\x19.pricing.OrcamentoRequest\x1a\x0e.pricing.Preco\x12\x41\n\x0eRealizarCompra\x12\x16.pricing.CompraRequest\x1a\x17.pricing.CompraResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rpricing.proto\x12\x07pricing\x1a\x0c\x63ommon.proto\"6\n\x04Item\x12\x1a\n\x04peca\x18\x01 \x01(\x0b\x32\x0c.common.Peca\x12\x12\n\nquantidade\x18\x02 \x01(\x05\"4\n\x05Preco\x12\r\n\x05preco\x18\x01 \x01(\x01\x12\r\n\x05\x66rete\x18\x02 \x01(\x01\x12\r\n\x05total\x18\x03 \x01(\x01\"0\n\x10OrcamentoRequest\x12\x1c\n\x05itens\x18\x01 \x03(\x0b\x32\r.pricing.Item\"B\n\rCompraRequest\x12\x1c\n\x05itens\x18\x01 \x03(\x0b\x32\r.pricing.Item\x12\x13\n\x0bvalor_total\x18\x02 \x01(\x01\"\xb8\x01\n\x0e\x43ompraResponse\x12\x11\n\tpedido_id\x18\x01 \x01(\t\x12\x0e\n\x06status\x18\x02 \x01(\t\x12\x13\n\x0bvalor_total\x18\x03 \x01(\x01\x12\x13\n\x0b\x64\x61ta_pedido\x18\x04 \x01(\t\x12&\n\x0fitens_comprados\x18\x05 \x03(\x0b\x32\r.pricing.Item\x12\x10\n\x08subtotal\x18\x06 \x01(\x01\x12\r\n\x05\x66rete\x18\x07 \x01(\x01\x12\x10\n\x08repetida\x18\x08 \x01(\x08\"B\n\x14OrcamentoLoteRequest\x12*\n\x07pedidos\x18\x01 \x03(\x0b\x32\x19.pricing.OrcamentoRequest\"R\n\x12OrcamentoResultado\x12\x1f\n\x05preco\x18\x01 \x01(\x0b\x32\x0e.pricing.PrecoH\x00\x12\x0e\n\x04\x65rro\x18\x02 \x01(\tH\x00\x42\x0b\n\tresultado\"H\n\x15OrcamentoLoteResponse\x12/\n\nresultados\x18\x01 \x03(\x0b\x32\x1b.pricing.OrcamentoResultado2\xdb\x01\n\x10OrcamentoService\x12\x35\n\x08\x43\x61lcular\x12\x19.pricing.OrcamentoRequest\x1a\x0e.pricing.Preco\x12\x41\n\x0eRealizarCompra\x12\x16.pricing.CompraRequest\x1a\x17.pricing.CompraResponse\x12M\n\x0c\x43\x61lcularLote\x12\x1d.pricing.OrcamentoLoteRequest\x1a\x1e.pricing.OrcamentoLoteResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -41,7 +41,13 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_COMPRAREQUEST']._serialized_start=200
   _globals['_COMPRAREQUEST']._serialized_end=266
   _globals['_COMPRARESPONSE']._serialized_start=269
-  _globals['_COMPRARESPONSE']._serialized_end=435
-  _globals['_ORCAMENTOSERVICE']._serialized_start=438
-  _globals['_ORCAMENTOSERVICE']._serialized_end=578
+  _globals['_COMPRARESPONSE']._serialized_end=453
+  _globals['_ORCAMENTOLOTEREQUEST']._serialized_start=455
+  _globals['_ORCAMENTOLOTEREQUEST']._serialized_end=521
+  _globals['_ORCAMENTORESULTADO']._serialized_start=523
+  _globals['_ORCAMENTORESULTADO']._serialized_end=605
+  _globals['_ORCAMENTOLOTERESPONSE']._serialized_start=607
+  _globals['_ORCAMENTOLOTERESPONSE']._serialized_end=679
+  _globals['_ORCAMENTOSERVICE']._serialized_start=682
+  _globals['_ORCAMENTOSERVICE']._serialized_end=901
 # @@protoc_insertion_point(module_scope)
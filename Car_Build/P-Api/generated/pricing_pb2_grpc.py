@@ -44,6 +44,11 @@ class OrcamentoServiceStub(object):
                 request_serializer=pricing__pb2.CompraRequest.SerializeToString,
                 response_deserializer=pricing__pb2.CompraResponse.FromString,
                 _registered_method=True)
+        self.CalcularLote = channel.unary_unary(
+                '/pricing.OrcamentoService/CalcularLote',
+                request_serializer=pricing__pb2.OrcamentoLoteRequest.SerializeToString,
+                response_deserializer=pricing__pb2.OrcamentoLoteResponse.FromString,
+                _registered_method=True)
 
 
 class OrcamentoServiceServicer(object):
@@ -63,6 +68,13 @@ class OrcamentoServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def CalcularLote(self, request, context):
+        """Vários orçamentos de uma vez; um pedido inválido não derruba os demais
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_OrcamentoServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -76,6 +88,11 @@ def add_OrcamentoServiceServicer_to_server(servicer, server):
                     request_deserializer=pricing__pb2.CompraRequest.FromString,
                     response_serializer=pricing__pb2.CompraResponse.SerializeToString,
             ),
+            'CalcularLote': grpc.unary_unary_rpc_method_handler(
+                    servicer.CalcularLote,
+                    request_deserializer=pricing__pb2.OrcamentoLoteRequest.FromString,
+                    response_serializer=pricing__pb2.OrcamentoLoteResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'pricing.OrcamentoService', rpc_method_handlers)
@@ -140,3 +157,30 @@ class OrcamentoService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def CalcularLote(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/pricing.OrcamentoService/CalcularLote',
+            pricing__pb2.OrcamentoLoteRequest.SerializeToString,
+            pricing__pb2.OrcamentoLoteResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
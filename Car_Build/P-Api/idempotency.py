@@ -0,0 +1,86 @@
+"""
+Chaves de idempotência (header `Idempotency-Key`) do /pagar.
+
+Clientes e balanceadores repetem o /pagar quando a P-API demora, e cada
+repetição faria outro RealizarCompra (outro pedido PED-...). Com o header:
+
+- a primeira requisição de uma chave chama o Server B;
+- repetições simultâneas aguardam essa mesma chamada (single-flight,
+  singleflight.py) em vez de fazer outra;
+- repetições depois da resposta recebem a resposta guardada, com o header
+  `Idempotent-Replayed: true`, por P_API_IDEMPOTENCY_TTL segundos.
+
+Só compras concluídas são guardadas: se a chamada falhar, quem estava
+aguardando recebe o mesmo erro e a próxima repetição tenta de novo. A chave
+reaproveitada com outro corpo é recusada (ChaveIdempotenciaInvalida).
+
+Este registro é de cada worker, em memória, limitado a P_API_IDEMPOTENCY_SIZE
+chaves (LRU): poupa o RPC das repetições que caem no mesmo worker. A
+deduplicação entre workers e pods fica no Server B, que recebe a chave no
+metadata `idempotency-key` do RealizarCompra e a registra no PostgreSQL
+(tabela compras_idempotentes); a resposta repetida vem com `repetida=true`.
+"""
+import os
+
+from metrics import IDEMPOTENCY_REQUESTS, IDEMPOTENCY_ENTRIES
+from singleflight import EntradasLRU, SingleFlight
+
+
+IDEMPOTENCY_TTL = float(os.getenv("P_API_IDEMPOTENCY_TTL", "3600"))
+IDEMPOTENCY_SIZE = int(os.getenv("P_API_IDEMPOTENCY_SIZE", "10000"))
+IDEMPOTENCY_KEY_MAX = 255
+
+
+class ChaveIdempotenciaInvalida(ValueError):
+    """Chave vazia, longa demais, fora do ASCII ou reaproveitada com outro corpo."""
+
+
+class RegistroIdempotencia:
+    def __init__(self, max_entradas=IDEMPOTENCY_SIZE, ttl=IDEMPOTENCY_TTL):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._concluidas = EntradasLRU(max_entradas, ttl, IDEMPOTENCY_ENTRIES)  # chave -> (impressao, valor)
+        self._compras = SingleFlight()  # dados: impressao
+
+    async def executar(self, chave, impressao, chamar):
+        """
+        (valor, repetida): resultado de `chamar()` (corrotina) para `chave`,
+        executado uma única vez. `impressao` identifica o corpo da requisição;
+        `repetida` indica que o valor veio de outra requisição com a chave.
+        """
+        if not chave or len(chave) > IDEMPOTENCY_KEY_MAX:
+            raise ChaveIdempotenciaInvalida(f"Idempotency-Key deve ter de 1 a {IDEMPOTENCY_KEY_MAX} caracteres")
+        # A chave segue como metadata gRPC, que só aceita ASCII visível
+        if not (chave.isascii() and chave.isprintable()):
+            raise ChaveIdempotenciaInvalida("Idempotency-Key deve conter apenas caracteres ASCII visíveis")
+
+        concluida, valida = self._concluidas.buscar(chave)
+        if valida:
+            impressao_original, valor = concluida
+            self._conferir(impressao, impressao_original)
+            IDEMPOTENCY_REQUESTS.labels(result='replayed').inc()
+            return valor, True
+
+        em_andamento = self._compras.em_andamento(chave)
+        if em_andamento is not None:
+            tarefa, impressao_original = em_andamento
+            self._conferir(impressao, impressao_original)
+            IDEMPOTENCY_REQUESTS.labels(result='coalesced').inc()
+            return await self._compras.aguardar(tarefa), True
+
+        IDEMPOTENCY_REQUESTS.labels(result='new').inc()
+        # Se o cliente da primeira requisição desistir, a compra segue e fica
+        # guardada para a repetição (SingleFlight.aguardar)
+        tarefa = self._compras.iniciar(chave, lambda: self._executar(chave, impressao, chamar), impressao)
+        return await self._compras.aguardar(tarefa), False
+
+    @staticmethod
+    def _conferir(impressao, impressao_original):
+        if impressao != impressao_original:
+            IDEMPOTENCY_REQUESTS.labels(result='conflict').inc()
+            raise ChaveIdempotenciaInvalida("Idempotency-Key já usada com outro corpo de requisição")
+
+    async def _executar(self, chave, impressao, chamar):
+        valor = await chamar()
+        self._concluidas.guardar(chave, (impressao, valor))
+        return valor
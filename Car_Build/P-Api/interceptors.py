@@ -0,0 +1,212 @@
+"""
+Interceptors de cliente gRPC da P-API: métricas por RPC registradas no canal
+de cada endpoint (backends.py), fora dos handlers.
+
+Para cada chamada unária, por microserviço e método:
+
+- p_api_grpc_client_duration_seconds: latência da tentativa;
+- p_api_grpc_client_calls_total: status gRPC (OK, UNAVAILABLE,
+  DEADLINE_EXCEEDED, ...); p_api_grpc_calls_total continua com
+  success/error/cancelled por microserviço;
+- p_api_grpc_client_request_bytes / _response_bytes: tamanho serializado;
+- p_api_grpc_client_deadline_usage_ratio: fração do deadline consumida
+  (perto de 1 = a chamada quase estourou o prazo);
+- p_api_grpc_client_not_ready_calls_total: chamadas que começaram com o canal
+  ainda conectando, e que por isso pagam a conexão na latência.
+
+O estado de conectividade de cada canal é acompanhado (subscribe no modo
+sync, wait_for_state_change no async) e o tempo entre começar a conectar e
+ficar READY vai para p_api_grpc_channel_ready_wait_seconds.
+
+Com hedging, cada tentativa é medida separadamente; a que perde é cancelada
+e conta como CANCELLED.
+
+Os mesmos interceptors propagam o trace da requisição (tracing.py): cada
+tentativa vira um span "grpc" e segue para o backend no metadado
+`traceparent`.
+"""
+import asyncio
+import time
+
+import grpc
+
+import tracing
+from metrics import (
+    GRPC_CALLS,
+    GRPC_CLIENT_LATENCY,
+    GRPC_CLIENT_STATUS,
+    GRPC_CLIENT_REQUEST_BYTES,
+    GRPC_CLIENT_RESPONSE_BYTES,
+    GRPC_CLIENT_DEADLINE_USAGE,
+    GRPC_CLIENT_NOT_READY,
+    GRPC_CHANNEL_READY_WAIT,
+)
+
+
+_PRONTO = grpc.ChannelConnectivity.READY
+_CONECTANDO = (grpc.ChannelConnectivity.CONNECTING, grpc.ChannelConnectivity.TRANSIENT_FAILURE)
+
+# Status do p_api_grpc_calls_total; os demais códigos contam como 'error'
+_RESULTADO = {grpc.StatusCode.OK: 'success', grpc.StatusCode.CANCELLED: 'cancelled'}
+
+
+class EstadoCanal:
+    """Conectividade de um canal e há quanto tempo ele tenta ficar READY."""
+
+    __slots__ = ("servico", "pronto", "_conectando_desde")
+
+    def __init__(self, servico):
+        self.servico = servico
+        self.pronto = False
+        self._conectando_desde = None
+
+    def atualizar(self, conectividade):
+        self.pronto = conectividade == _PRONTO
+        if conectividade in _CONECTANDO:
+            if self._conectando_desde is None:
+                self._conectando_desde = time.monotonic()
+        elif self._conectando_desde is not None:
+            if self.pronto:
+                GRPC_CHANNEL_READY_WAIT.labels(service=self.servico).observe(
+                    time.monotonic() - self._conectando_desde
+                )
+            self._conectando_desde = None
+
+
+class _MetricasMetodo:
+    """Séries de um (microserviço, método), resolvidas uma vez e reaproveitadas."""
+
+    __slots__ = ("servico", "metodo", "latencia", "bytes_req", "bytes_resp", "deadline", "nao_pronto", "status")
+
+    def __init__(self, servico, metodo):
+        self.servico = servico
+        self.metodo = metodo
+        self.latencia = GRPC_CLIENT_LATENCY.labels(service=servico, method=metodo)
+        self.bytes_req = GRPC_CLIENT_REQUEST_BYTES.labels(service=servico, method=metodo)
+        self.bytes_resp = GRPC_CLIENT_RESPONSE_BYTES.labels(service=servico, method=metodo)
+        self.deadline = GRPC_CLIENT_DEADLINE_USAGE.labels(service=servico, method=metodo)
+        self.nao_pronto = GRPC_CLIENT_NOT_READY.labels(service=servico, method=metodo)
+        self.status = {}
+
+    def registrar(self, codigo, duracao, timeout, bytes_req, bytes_resp, pronto):
+        contadores = self.status.get(codigo)
+        if contadores is None:
+            contadores = self.status[codigo] = (
+                GRPC_CLIENT_STATUS.labels(service=self.servico, method=self.metodo, code=codigo.name),
+                GRPC_CALLS.labels(service=self.servico, status=_RESULTADO.get(codigo, 'error')),
+            )
+        for contador in contadores:
+            contador.inc()
+        self.latencia.observe(duracao)
+        self.bytes_req.observe(bytes_req)
+        if bytes_resp is not None:
+            self.bytes_resp.observe(bytes_resp)
+        if timeout:
+            self.deadline.observe(min(duracao / timeout, 1.0))
+        if not pronto:
+            self.nao_pronto.inc()
+
+
+def _com_traceparent(client_call_details, valor):
+    """Cópia dos detalhes da chamada com o traceparent no metadado."""
+    metadata = client_call_details.metadata
+    if isinstance(metadata, grpc.aio.Metadata):
+        metadata = grpc.aio.Metadata(*metadata, ("traceparent", valor))
+    else:
+        metadata = (*(metadata or ()), ("traceparent", valor))
+    return client_call_details._replace(metadata=metadata)
+
+
+def _abrir_span(metricas, client_call_details):
+    span = tracing.abrir("grpc", service=metricas.servico, method=metricas.metodo)
+    valor = tracing.traceparent(span)
+    if valor is not None:
+        client_call_details = _com_traceparent(client_call_details, valor)
+    return span, client_call_details
+
+
+class _Medidor:
+    def __init__(self, servico, estado):
+        self.servico = servico
+        self.estado = estado
+        self._metodos = {}
+
+    def metodo(self, caminho):
+        """Métricas do método a partir do caminho do RPC (/pacote.Servico/Metodo)."""
+        metricas = self._metodos.get(caminho)
+        if metricas is None:
+            nome = caminho.decode() if isinstance(caminho, bytes) else caminho
+            metricas = self._metodos[caminho] = _MetricasMetodo(self.servico, nome.rsplit("/", 1)[-1])
+        return metricas
+
+
+class InterceptorSync(_Medidor, grpc.UnaryUnaryClientInterceptor):
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        metricas = self.metodo(client_call_details.method)
+        span, client_call_details = _abrir_span(metricas, client_call_details)
+        pronto = self.estado.pronto
+        inicio = time.perf_counter()
+        resposta = continuation(client_call_details, request)
+        duracao = time.perf_counter() - inicio
+        codigo = resposta.code()
+        metricas.registrar(
+            codigo, duracao, client_call_details.timeout, request.ByteSize(),
+            resposta.result().ByteSize() if codigo is grpc.StatusCode.OK else None, pronto,
+        )
+        if span is not None:
+            span.encerrar(code=codigo.name)
+        return resposta
+
+
+class InterceptorAsync(_Medidor, grpc.aio.UnaryUnaryClientInterceptor):
+    async def intercept_unary_unary(self, continuation, client_call_details, request):
+        metricas = self.metodo(client_call_details.method)
+        span, client_call_details = _abrir_span(metricas, client_call_details)
+        pronto = self.estado.pronto
+        inicio = time.perf_counter()
+        call = None
+        bytes_resp = None
+        codigo = grpc.StatusCode.UNKNOWN
+        try:
+            call = await continuation(client_call_details, request)
+            bytes_resp = (await call).ByteSize()
+            codigo = grpc.StatusCode.OK
+        except grpc.RpcError as e:
+            codigo = e.code()
+            if call is None:
+                raise
+        except asyncio.CancelledError:
+            codigo = grpc.StatusCode.CANCELLED
+            raise
+        finally:
+            metricas.registrar(
+                codigo, time.perf_counter() - inicio, client_call_details.timeout,
+                request.ByteSize(), bytes_resp, pronto,
+            )
+            if span is not None:
+                span.encerrar(code=codigo.name)
+        # Aguardar a call de novo devolve a resposta ou levanta o mesmo erro
+        return call
+
+
+def observar_sync(channel, estado):
+    """Acompanha a conectividade do canal e já começa a conectar; retorna a função que para de acompanhar."""
+    # A conexão é pedida aqui, na primeira assinatura do canal, e não por um
+    # channel_ready_future: assinando depois, ele deixa try_to_connect ligado
+    # no estado do canal e a thread de polling do grpc chama
+    # check_connectivity_state no canal já fechado ("Channel closed!").
+    channel.subscribe(estado.atualizar, try_to_connect=True)
+    return lambda: channel.unsubscribe(estado.atualizar)
+
+
+async def _observar(channel, estado):
+    conectividade = channel.get_state(try_to_connect=False)
+    while True:
+        estado.atualizar(conectividade)
+        await channel.wait_for_state_change(conectividade)
+        conectividade = channel.get_state(try_to_connect=False)
+
+
+def observar_async(channel, estado):
+    """Versão grpc.aio do observar_sync: uma tarefa no event loop por canal."""
+    return asyncio.ensure_future(_observar(channel, estado)).cancel
@@ -0,0 +1,97 @@
+"""
+Inicializador da P-API com múltiplos workers uvicorn.
+
+Um único processo `uvicorn app:app` usa no máximo um núcleo. Este launcher:
+
+- sobe P_API_WORKERS workers (padrão 1, como o `uvicorn app:app`). Com
+  P_API_WORKERS=auto, o número vem da cota de CPU do cgroup do container
+  (cpu.max no cgroup v2, cpu.cfs_quota_us no v1), limitado pelos núcleos
+  disponíveis: sem cota, é um worker por núcleo do nó;
+- com mais de um worker, liga o modo multiprocesso do prometheus_client
+  (PROMETHEUS_MULTIPROC_DIR, limpo a cada início) para o /metrics agregar
+  todos os processos;
+- não importa o app nem o grpc aqui: o uvicorn sobe cada worker em um
+  processo novo (spawn) e os canais gRPC são criados no lifespan de cada um,
+  já que o grpc não é seguro para fork.
+
+Cada worker tem o próprio cache do catálogo, registro de idempotência,
+circuit breakers e limite de admissão: com N workers, esse estado se divide
+em N cópias independentes.
+
+Uso:
+    python launcher.py                    # 1 worker
+    P_API_WORKERS=4 python launcher.py
+    P_API_WORKERS=auto python launcher.py # workers pela cota de CPU
+"""
+import math
+import os
+import shutil
+import tempfile
+
+import uvicorn
+
+
+HOST = os.getenv("P_API_HOST", "0.0.0.0")
+PORT = int(os.getenv("P_API_PORT", "8000"))
+
+
+def cpus_do_cgroup():
+    """Cota de CPU do container em núcleos, ou None se não houver limite."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, periodo = f.read().split()
+        if quota != "max":
+            return int(quota) / int(periodo)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            periodo = int(f.read())
+        if quota > 0:
+            return quota / periodo
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def numero_de_workers():
+    valor = os.getenv("P_API_WORKERS", "").strip().lower() or "1"
+    if valor != "auto":
+        return max(1, int(valor))
+    if hasattr(os, "sched_getaffinity"):
+        nucleos = len(os.sched_getaffinity(0))
+    else:
+        nucleos = os.cpu_count() or 1
+    cota = cpus_do_cgroup()
+    if cota is None:
+        return nucleos
+    # Arredonda para baixo: um worker a mais que a cota só gera throttling do CFS
+    return max(1, min(nucleos, math.floor(cota)))
+
+
+def preparar_metricas_multiprocesso():
+    diretorio = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if diretorio is None:
+        diretorio = os.path.join(tempfile.gettempdir(), "p-api-metrics")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = diretorio
+    # Arquivos de uma execução anterior somariam contadores antigos
+    shutil.rmtree(diretorio, ignore_errors=True)
+    os.makedirs(diretorio)
+    return diretorio
+
+
+def main():
+    workers = numero_de_workers()
+    if workers > 1:
+        diretorio = preparar_metricas_multiprocesso()
+        print(f"[P-API] Iniciando {workers} workers (métricas agregadas em {diretorio})")
+    else:
+        print("[P-API] Iniciando 1 worker")
+    uvicorn.run("app:app", host=HOST, port=PORT, workers=workers)
+
+
+if __name__ == "__main__":
+    main()
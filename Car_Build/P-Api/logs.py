@@ -0,0 +1,262 @@
+"""
+Logs estruturados da P-API: uma linha JSON por evento, escrita fora do
+caminho da requisição.
+
+- o handler do logger só coloca o LogRecord em uma fila limitada; a
+  formatação em JSON e a escrita no stdout ficam na thread de um
+  QueueListener. Com a fila cheia o evento é descartado (contado em
+  p_api_log_dropped_total) em vez de bloquear o event loop;
+- eventos debug/info de um endpoint passam por uma taxa de amostragem
+  (P_API_LOG_SAMPLE, ex.: "/get-pecas=0.01,/pagar=1"); warning e error
+  sempre saem. O teste de nível e o sorteio acontecem antes de criar o
+  LogRecord, então um evento descartado custa só essas duas comparações;
+- o nível e as taxas podem ser trocados em execução (`definir_nivel`,
+  `definir_amostragem`, expostos em PUT /debug/logs com P_API_LOG_ADMIN=1).
+  Com vários workers, `publicar()` grava a configuração em um arquivo
+  compartilhado (P_API_LOG_CONFIG_FILE, por padrão logs.json no
+  PROMETHEUS_MULTIPROC_DIR) que cada worker confere a cada
+  P_API_LOG_CONFIG_INTERVAL segundos, então a troca vale para todos.
+
+Uso:
+    log = logs.obter("pagar", endpoint="/pagar")
+    log.info("compra processada", pedido_id=resp.pedido_id)
+"""
+import asyncio
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+from metrics import LOG_DROPPED
+
+
+LOG_LEVEL = os.getenv("P_API_LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE = os.getenv("P_API_LOG_SAMPLE", "")
+LOG_SAMPLE_DEFAULT = float(os.getenv("P_API_LOG_SAMPLE_DEFAULT", "1"))
+LOG_QUEUE_SIZE = int(os.getenv("P_API_LOG_QUEUE_SIZE", "10000"))
+# PUT /debug/logs não tem autenticação e em DEBUG o corpo do /pagar vai para o log
+LOG_ADMIN = os.getenv("P_API_LOG_ADMIN", "0") == "1"
+# Vazio sem PROMETHEUS_MULTIPROC_DIR: com um worker só, não há o que compartilhar
+LOG_CONFIG_FILE = os.getenv("P_API_LOG_CONFIG_FILE") or (
+    os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], "logs.json")
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR") else ""
+)
+LOG_CONFIG_INTERVAL = float(os.getenv("P_API_LOG_CONFIG_INTERVAL", "1"))
+
+# Campos que o LogRecord calcularia a cada evento e que os logs não usam
+logging.logThreads = False
+logging.logMultiprocessing = False
+
+
+def _ler_taxas(texto):
+    """"/get-pecas=0.01,/pagar=1" -> {"/get-pecas": 0.01, "/pagar": 1.0}"""
+    taxas = {}
+    for item in texto.split(","):
+        if not item.strip():
+            continue
+        endpoint, _, taxa = item.partition("=")
+        taxa = float(taxa)
+        if not 0 <= taxa <= 1:
+            raise ValueError(f"taxa de amostragem fora de [0, 1] para {endpoint.strip()}: {taxa}")
+        taxas[endpoint.strip()] = taxa
+    return taxas
+
+
+_taxas = _ler_taxas(LOG_SAMPLE)
+_taxa_padrao = LOG_SAMPLE_DEFAULT
+
+
+class FormatadorJSON(logging.Formatter):
+    """Uma linha JSON: ts, level, logger, msg, pid e os campos do evento."""
+
+    def format(self, record):
+        evento = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "pid": record.process,
+        }
+        campos = getattr(record, "campos", None)
+        if campos:
+            evento.update(campos)
+        if record.exc_info:
+            evento["exc"] = self.formatException(record.exc_info)
+        return json.dumps(evento, ensure_ascii=False, default=str, separators=(",", ":"))
+
+
+class _HandlerFila(logging.handlers.QueueHandler):
+    """Enfileira o LogRecord sem formatar; com a fila cheia, descarta e conta."""
+
+    def prepare(self, record):
+        # O QueueHandler padrão formata aqui, na thread de quem loga
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_DROPPED.inc()
+
+
+_raiz = logging.getLogger("p_api")
+_raiz.setLevel(LOG_LEVEL)
+_raiz.propagate = False
+
+_saida = logging.StreamHandler(sys.stdout)
+_saida.setFormatter(FormatadorJSON())
+_fila = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+_raiz.addHandler(_HandlerFila(_fila))
+_listener = logging.handlers.QueueListener(_fila, _saida)
+_listener.start()
+
+
+class Logger:
+    """Logger de um componente; com `endpoint`, debug/info são amostrados."""
+
+    __slots__ = ("logger", "endpoint")
+
+    def __init__(self, nome, endpoint=None):
+        self.logger = _raiz.getChild(nome)
+        self.endpoint = endpoint
+
+    def habilitado(self, nivel):
+        """Para evitar montar campos caros (ex.: o corpo da requisição) à toa."""
+        return self.logger.isEnabledFor(nivel)
+
+    def debug(self, msg, **campos):
+        self._log(logging.DEBUG, msg, campos)
+
+    def info(self, msg, **campos):
+        self._log(logging.INFO, msg, campos)
+
+    def warning(self, msg, **campos):
+        self._log(logging.WARNING, msg, campos)
+
+    def error(self, msg, exc_info=False, **campos):
+        self._log(logging.ERROR, msg, campos, exc_info)
+
+    def _log(self, nivel, msg, campos, exc_info=False):
+        if not self.logger.isEnabledFor(nivel):
+            return
+        if self.endpoint is not None:
+            campos["endpoint"] = self.endpoint
+            if nivel < logging.WARNING:
+                taxa = _taxas.get(self.endpoint, _taxa_padrao)
+                if taxa < 1:
+                    if random.random() >= taxa:
+                        return
+                    # Quem agrega os logs multiplica por 1/taxa para estimar o total
+                    campos["sample_rate"] = taxa
+        if exc_info:
+            exc_info = sys.exc_info()
+        # makeRecord direto: Logger.log procuraria arquivo/linha de quem chamou na pilha
+        record = self.logger.makeRecord(
+            self.logger.name, nivel, "", 0, msg, (), exc_info or None, extra={"campos": campos}
+        )
+        self.logger.handle(record)
+
+
+def obter(nome, endpoint=None):
+    return Logger(nome, endpoint)
+
+
+def definir_nivel(nivel):
+    """Troca o nível de todos os loggers da P-API (ex.: "DEBUG")."""
+    _raiz.setLevel(nivel.upper())
+
+
+def definir_amostragem(taxas, padrao=None):
+    """Substitui as taxas por endpoint (dict ou "endpoint=taxa,...") e, opcionalmente, a padrão."""
+    global _taxas, _taxa_padrao
+    if padrao is not None:
+        if not 0 <= padrao <= 1:
+            raise ValueError(f"taxa de amostragem padrão fora de [0, 1]: {padrao}")
+        _taxa_padrao = float(padrao)
+    if isinstance(taxas, str):
+        taxas = _ler_taxas(taxas)
+    else:
+        taxas = _ler_taxas(",".join(f"{endpoint}={taxa}" for endpoint, taxa in taxas.items()))
+    _taxas = taxas
+
+
+def configuracao():
+    return {
+        "nivel": logging.getLevelName(_raiz.getEffectiveLevel()),
+        "amostragem": dict(_taxas),
+        "amostragem_padrao": _taxa_padrao,
+    }
+
+
+def publicar():
+    """Grava a configuração atual no arquivo compartilhado, para os outros workers."""
+    if not LOG_CONFIG_FILE:
+        return
+    temporario = f"{LOG_CONFIG_FILE}.{os.getpid()}.tmp"
+    with open(temporario, "w") as f:
+        json.dump(configuracao(), f)
+    # os.replace é atômico: quem ler o arquivo vê a versão antiga ou a nova inteira
+    os.replace(temporario, LOG_CONFIG_FILE)
+
+
+def _aplicar(config):
+    definir_nivel(config["nivel"])
+    definir_amostragem(config["amostragem"], config["amostragem_padrao"])
+
+
+_lido = None  # st_mtime_ns do arquivo compartilhado já aplicado
+_tarefa = None
+
+
+def _sincronizar():
+    global _lido
+    try:
+        modificado = os.stat(LOG_CONFIG_FILE).st_mtime_ns
+    except OSError:
+        return  # ainda ninguém publicou
+    if modificado == _lido:
+        return
+    _lido = modificado
+    try:
+        with open(LOG_CONFIG_FILE) as f:
+            _aplicar(json.load(f))
+    except (OSError, ValueError, KeyError, TypeError):
+        obter("logs").error("configuração de logs compartilhada inválida", exc_info=True)
+
+
+async def _acompanhar():
+    while True:
+        await asyncio.sleep(LOG_CONFIG_INTERVAL)
+        _sincronizar()
+
+
+def iniciar():
+    """Aplica e passa a acompanhar o arquivo compartilhado (no lifespan, com o loop ativo)."""
+    global _tarefa
+    if LOG_CONFIG_FILE and LOG_CONFIG_INTERVAL > 0:
+        # Worker reiniciado pelo uvicorn volta com a configuração em vigor
+        _sincronizar()
+        _tarefa = asyncio.create_task(_acompanhar())
+
+
+def parar():
+    global _tarefa
+    if _tarefa is not None:
+        _tarefa.cancel()
+        _tarefa = None
+
+
+def encerrar():
+    """Escreve os eventos ainda na fila e para a thread do listener."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(encerrar)
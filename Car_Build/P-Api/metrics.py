@@ -0,0 +1,374 @@
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, Counter, Histogram, Gauge, CollectorRegistry, REGISTRY, generate_latest, multiprocess,
+)
+from prometheus_client.openmetrics import exposition as openmetrics_exposition
+
+# Com vários workers (launcher.py), cada processo escreve suas métricas em
+# PROMETHEUS_MULTIPROC_DIR e o /metrics agrega todos. O multiprocess_mode dos
+# Gauges define a agregação: "livesum" soma os workers vivos, "livemax" pega
+# o maior valor (ex.: o pior estado de circuit breaker entre os workers).
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+
+def gerar_metricas(openmetrics=False):
+    """
+    (texto de exposição, content-type), agregado entre workers no modo
+    multiprocesso. Com `openmetrics`, no formato OpenMetrics, o único que
+    leva exemplars (que o modo multiprocesso não guarda).
+    """
+    registry = REGISTRY
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    if openmetrics:
+        return openmetrics_exposition.generate_latest(registry), openmetrics_exposition.CONTENT_TYPE_LATEST
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def encerrar_processo():
+    """Remove os Gauges "live*" do worker que está saindo"""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def remover_serie(gauge, *labels):
+    """
+    Tira a série `labels` do Gauge. No modo multiprocesso, remove() não é
+    suportado (só esquece a série no processo, e o último valor segue no
+    arquivo mmap e no /metrics): a série é zerada e fica.
+    """
+    if MULTIPROCESS:
+        gauge.labels(*labels).set(0)
+    else:
+        gauge.remove(*labels)
+
+
+# Métricas customizadas para monitoramento
+REQUEST_COUNT = Counter(
+    'p_api_requests_total', 
+    'Total de requisições recebidas pela P-API',
+    ['method', 'endpoint', 'status']
+)
+
+REQUEST_LATENCY = Histogram(
+    'p_api_request_duration_seconds',
+    'Latência das requisições em segundos',
+    ['method', 'endpoint']
+)
+
+GRPC_CALLS = Counter(
+    'p_api_grpc_calls_total',
+    'Total de chamadas gRPC para microserviços (success, error ou cancelled)',
+    ['service', 'status']
+)
+
+# Métricas por RPC dos clientes gRPC (interceptors.py)
+GRPC_CLIENT_LATENCY = Histogram(
+    'p_api_grpc_client_duration_seconds',
+    'Latência de cada chamada gRPC aos microserviços, por método',
+    ['service', 'method']
+)
+
+GRPC_CLIENT_STATUS = Counter(
+    'p_api_grpc_client_calls_total',
+    'Chamadas gRPC aos microserviços por método e status gRPC',
+    ['service', 'method', 'code']
+)
+
+_BUCKETS_BYTES = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+GRPC_CLIENT_REQUEST_BYTES = Histogram(
+    'p_api_grpc_client_request_bytes',
+    'Tamanho serializado das requisições gRPC enviadas',
+    ['service', 'method'],
+    buckets=_BUCKETS_BYTES
+)
+
+GRPC_CLIENT_RESPONSE_BYTES = Histogram(
+    'p_api_grpc_client_response_bytes',
+    'Tamanho serializado das respostas gRPC recebidas',
+    ['service', 'method'],
+    buckets=_BUCKETS_BYTES
+)
+
+GRPC_CLIENT_DEADLINE_USAGE = Histogram(
+    'p_api_grpc_client_deadline_usage_ratio',
+    'Fração do deadline consumida por chamada gRPC (1 = estourou)',
+    ['service', 'method'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0)
+)
+
+GRPC_CLIENT_NOT_READY = Counter(
+    'p_api_grpc_client_not_ready_calls_total',
+    'Chamadas gRPC iniciadas com o canal ainda conectando',
+    ['service', 'method']
+)
+
+GRPC_CHANNEL_READY_WAIT = Histogram(
+    'p_api_grpc_channel_ready_wait_seconds',
+    'Tempo de um canal gRPC entre começar a conectar e ficar READY',
+    ['service'],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30)
+)
+
+ACTIVE_REQUESTS = Gauge(
+    'p_api_active_requests',
+    'Número de requisições ativas no momento',
+    multiprocess_mode='livesum'
+)
+
+# Métricas do cache de catálogo (/get-pecas)
+CATALOG_CACHE_HITS = Counter(
+    'p_api_catalog_cache_hits_total',
+    'Consultas ao catálogo respondidas pelo cache local'
+)
+
+CATALOG_CACHE_MISSES = Counter(
+    'p_api_catalog_cache_misses_total',
+    'Consultas ao catálogo que precisaram chamar o Server A'
+)
+
+CATALOG_CACHE_COALESCED = Counter(
+    'p_api_catalog_cache_coalesced_total',
+    'Consultas que aguardaram uma chamada ao Server A já em andamento'
+)
+
+CATALOG_CACHE_EVICTIONS = Counter(
+    'p_api_catalog_cache_evictions_total',
+    'Entradas removidas do cache de catálogo',
+    ['reason']
+)
+
+CATALOG_CACHE_REVALIDATIONS = Counter(
+    'p_api_catalog_cache_revalidations_total',
+    'Entradas expiradas revalidadas pela versão do catálogo (unchanged = sem GetPecas)',
+    ['result']
+)
+
+CATALOG_CACHE_ENTRIES = Gauge(
+    'p_api_catalog_cache_entries',
+    'Número de entradas no cache de catálogo',
+    multiprocess_mode='livesum'
+)
+
+# Métricas do balanceamento entre pods dos microserviços
+BACKEND_ENDPOINTS = Gauge(
+    'p_api_backend_endpoints',
+    'Número de endpoints (pods) resolvidos para cada microserviço',
+    ['service'],
+    multiprocess_mode='livemax'
+)
+
+BACKEND_INFLIGHT = Gauge(
+    'p_api_backend_inflight_requests',
+    'Chamadas gRPC em andamento por endpoint',
+    ['service', 'endpoint'],
+    multiprocess_mode='livesum'
+)
+
+# Latência do /checkout por etapa (catalogo, orcamento, compra) e total
+CHECKOUT_LATENCY = Histogram(
+    'p_api_checkout_duration_seconds',
+    'Latência do fluxo de compra em uma requisição (/checkout), por etapa',
+    ['stage']
+)
+
+# Métricas do controle de admissão (limite adaptativo por endpoint)
+ADMISSION_LIMIT = Gauge(
+    'p_api_admission_limit',
+    'Limite atual de requisições simultâneas por endpoint',
+    ['endpoint'],
+    multiprocess_mode='livesum'
+)
+
+ADMISSION_INFLIGHT = Gauge(
+    'p_api_admission_inflight',
+    'Requisições admitidas em andamento por endpoint',
+    ['endpoint'],
+    multiprocess_mode='livesum'
+)
+
+ADMISSION_QUEUE = Gauge(
+    'p_api_admission_queue_depth',
+    'Requisições aguardando vaga na fila de admissão',
+    ['endpoint'],
+    multiprocess_mode='livesum'
+)
+
+ADMISSION_REJECTED = Counter(
+    'p_api_admission_rejected_total',
+    'Requisições rejeitadas com 503 pelo controle de admissão',
+    ['endpoint']
+)
+
+# Micro-batching dos orçamentos (batching.py)
+BATCH_SIZE = Histogram(
+    'p_api_batch_size',
+    'Pedidos por lote enviado ao microserviço',
+    ['method'],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+
+BATCH_QUEUE_DELAY = Histogram(
+    'p_api_batch_queue_delay_seconds',
+    'Espera de cada pedido até a saída do seu lote',
+    ['method'],
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1)
+)
+
+# Chaves de idempotência do /pagar (idempotency.py)
+IDEMPOTENCY_REQUESTS = Counter(
+    'p_api_idempotency_requests_total',
+    'Requisições com Idempotency-Key por resultado (new, coalesced, replayed, conflict)',
+    ['result']
+)
+
+IDEMPOTENCY_ENTRIES = Gauge(
+    'p_api_idempotency_entries',
+    'Respostas guardadas no registro de idempotência',
+    multiprocess_mode='livesum'
+)
+
+# Compartimentos (bulkheads) por endpoint (bulkhead.py)
+BULKHEAD_SIZE = Gauge(
+    'p_api_bulkhead_size',
+    'Vagas (requisições simultâneas e threads) de cada compartimento',
+    ['pool'],
+    multiprocess_mode='livesum'
+)
+
+BULKHEAD_IN_USE = Gauge(
+    'p_api_bulkhead_in_use',
+    'Vagas ocupadas em cada compartimento',
+    ['pool'],
+    multiprocess_mode='livesum'
+)
+
+BULKHEAD_QUEUE = Gauge(
+    'p_api_bulkhead_queue_depth',
+    'Requisições aguardando vaga em cada compartimento',
+    ['pool'],
+    multiprocess_mode='livesum'
+)
+
+BULKHEAD_REJECTED = Counter(
+    'p_api_bulkhead_rejected_total',
+    'Requisições rejeitadas com 503 por compartimento cheio (queue_full ou timeout)',
+    ['pool', 'reason']
+)
+
+# Métricas de resiliência das chamadas gRPC (circuit breaker e hedging)
+BREAKER_STATE = Gauge(
+    'p_api_circuit_breaker_state',
+    'Estado do circuit breaker por microserviço (0=closed, 1=half_open, 2=open)',
+    ['service'],
+    multiprocess_mode='livemax'
+)
+
+BREAKER_TRANSITIONS = Counter(
+    'p_api_circuit_breaker_transitions_total',
+    'Mudanças de estado do circuit breaker',
+    ['service', 'state']
+)
+
+HEDGE_REQUESTS = Counter(
+    'p_api_hedged_requests_total',
+    'Segundas tentativas (hedge) disparadas para RPCs idempotentes',
+    ['service', 'method']
+)
+
+HEDGE_WINS = Counter(
+    'p_api_hedge_wins_total',
+    'Chamadas com hedge por tentativa vencedora (primary ou hedge)',
+    ['service', 'method', 'winner']
+)
+
+# Compressão das respostas HTTP (compression.py) e das mensagens gRPC
+COMPRESSED_RESPONSES = Counter(
+    'p_api_compressed_responses_total',
+    'Respostas HTTP comprimidas por codificação',
+    ['encoding']
+)
+
+COMPRESSION_SAVED_BYTES = Counter(
+    'p_api_compression_saved_bytes_total',
+    'Bytes economizados pela compressão das respostas HTTP',
+    ['encoding']
+)
+
+COMPRESSION_CPU_SECONDS = Counter(
+    'p_api_compression_cpu_seconds_total',
+    'Tempo de CPU gasto comprimindo respostas HTTP',
+    ['encoding']
+)
+
+GRPC_COMPRESSED_MESSAGES = Counter(
+    'p_api_grpc_compressed_messages_total',
+    'Requisições gRPC enviadas com compressão',
+    ['service', 'method']
+)
+
+GRPC_COMPRESSION_SAVED_BYTES = Counter(
+    'p_api_grpc_compression_saved_bytes_total',
+    'Bytes economizados pela compressão das requisições gRPC (estimativa por amostragem)',
+    ['service', 'method']
+)
+
+GRPC_COMPRESSION_CPU_SECONDS = Counter(
+    'p_api_grpc_compression_cpu_seconds_total',
+    'Tempo de CPU gasto comprimindo requisições gRPC (estimativa por amostragem)',
+    ['service', 'method']
+)
+
+# Logs estruturados (logs.py)
+LOG_DROPPED = Counter(
+    'p_api_log_dropped_total',
+    'Eventos de log descartados porque a fila do logger estava cheia'
+)
+
+# Startup e readiness (warmup.py)
+STARTUP_DURATION = Gauge(
+    'p_api_startup_duration_seconds',
+    'Duração de cada etapa do startup (channels, warmup, total)',
+    ['stage'],
+    multiprocess_mode='livemax'
+)
+
+READY = Gauge(
+    'p_api_ready',
+    'Worker pronto para receber tráfego (1) ou aquecendo/desligando (0)',
+    multiprocess_mode='livemin'
+)
+
+# Saturação do threadpool do anyio e do event loop (saturation.py)
+THREADPOOL_SIZE = Gauge(
+    'p_api_threadpool_size',
+    'Threads do threadpool padrão (rotas síncronas e chamadas fora dos compartimentos)',
+    multiprocess_mode='livesum'
+)
+
+THREADPOOL_BUSY = Gauge(
+    'p_api_threadpool_busy_threads',
+    'Threads do threadpool ocupadas na última amostra',
+    multiprocess_mode='livesum'
+)
+
+THREADPOOL_QUEUED = Gauge(
+    'p_api_threadpool_queued',
+    'Chamadas esperando uma thread livre na última amostra',
+    multiprocess_mode='livesum'
+)
+
+THREADPOOL_WAIT = Histogram(
+    'p_api_threadpool_wait_seconds',
+    'Tempo entre pedir e conseguir uma thread do threadpool',
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+EVENT_LOOP_LAG = Histogram(
+    'p_api_event_loop_lag_seconds',
+    'Atraso do event loop em acordar a tarefa de amostragem',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
@@ -0,0 +1,33 @@
+"""
+Leitura dos headers de negociação com q-values (RFC 9110, seção 12.4.2).
+
+Usado pelo `Accept` (codec.py, JSON ou protobuf) e pelo `Accept-Encoding`
+(compression.py, gzip ou brotli).
+"""
+import math
+
+
+def ler_qvalues(header):
+    """
+    "application/json;q=0.5, */*" -> {"application/json": 0.5, "*/*": 1.0}.
+    Nomes em minúsculas; q inválido vale 0 (não aceito) e, com o mesmo nome
+    repetido, vale o maior q.
+    """
+    aceitos = {}
+    for item in header.lower().split(","):
+        nome, *parametros = item.split(";")
+        nome = nome.strip()
+        if not nome:
+            continue
+        q = 1.0
+        for parametro in parametros:
+            chave, _, valor = parametro.partition("=")
+            if chave.strip() == "q":
+                try:
+                    q = float(valor.strip())
+                except ValueError:
+                    q = 0.0
+                if not math.isfinite(q):
+                    q = 0.0
+        aceitos[nome] = max(aceitos.get(nome, 0.0), q)
+    return aceitos
@@ -0,0 +1,149 @@
+"""
+Circuit breaker e janela de latência usados pelos Backends (backends.py).
+
+Circuit breaker por microserviço:
+
+- closed: as chamadas passam; P_API_BREAKER_FAILURES falhas de infraestrutura
+  seguidas abrem o circuito;
+- open: as chamadas falham na hora (CircuitoAberto) por
+  P_API_BREAKER_OPEN_SECONDS, sem ocupar threads nem conexões;
+- half_open: passado esse tempo, até P_API_BREAKER_HALF_OPEN_CALLS chamadas de
+  teste são liberadas; sucesso fecha o circuito, falha reabre.
+
+Só contam como falha os status que indicam backend lento ou fora do ar
+(UNAVAILABLE, DEADLINE_EXCEEDED...). Erros de negócio, como o
+INVALID_ARGUMENT do Server B para um valor total que não confere, não abrem
+o circuito.
+"""
+import math
+import os
+import time
+from collections import deque
+
+import grpc
+
+import logs
+from metrics import BREAKER_STATE, BREAKER_TRANSITIONS
+
+
+log = logs.obter("resilience")
+
+BREAKER_FAILURES = int(os.getenv("P_API_BREAKER_FAILURES", "5"))
+BREAKER_OPEN_SECONDS = float(os.getenv("P_API_BREAKER_OPEN_SECONDS", "5"))
+BREAKER_HALF_OPEN_CALLS = int(os.getenv("P_API_BREAKER_HALF_OPEN_CALLS", "1"))
+
+FECHADO = "closed"
+SEMIABERTO = "half_open"
+ABERTO = "open"
+_VALOR_ESTADO = {FECHADO: 0, SEMIABERTO: 1, ABERTO: 2}
+
+_STATUS_DE_FALHA = {
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+    grpc.StatusCode.INTERNAL,
+    grpc.StatusCode.UNKNOWN,
+}
+
+
+def falha_de_infraestrutura(erro):
+    """True se o erro gRPC indica backend indisponível/lento (e não erro de negócio)."""
+    return isinstance(erro, grpc.RpcError) and erro.code() in _STATUS_DE_FALHA
+
+
+class CircuitoAberto(Exception):
+    """Chamada recusada sem contato com o backend porque o circuito está aberto."""
+
+    def __init__(self, servico, retry_after):
+        super().__init__(f"{servico} indisponível (circuit breaker aberto)")
+        self.servico = servico
+        self.retry_after = retry_after
+
+
+class SemEndpoints(CircuitoAberto):
+    """Nenhum endpoint no pool do microserviço (antes da primeira resolução ou no desligamento)."""
+
+    def __init__(self, servico, retry_after=1):
+        super().__init__(servico, retry_after)
+        self.args = (f"{servico} indisponível (nenhum endpoint no pool)",)
+
+
+class CircuitBreaker:
+    def __init__(self, servico):
+        self.servico = servico
+        self.estado = FECHADO
+        self.falhas = 0
+        self.testes = 0
+        self.aberto_em = 0.0
+        BREAKER_STATE.labels(service=servico).set(_VALOR_ESTADO[FECHADO])
+
+    def antes_da_chamada(self):
+        """
+        Libera ou recusa (CircuitoAberto) uma chamada. Retorna True se ela é uma
+        chamada de teste do estado half_open, valor a repassar para `registrar`.
+        """
+        if self.estado == ABERTO:
+            restante = self.aberto_em + BREAKER_OPEN_SECONDS - time.monotonic()
+            if restante > 0:
+                raise CircuitoAberto(self.servico, max(1, math.ceil(restante)))
+            self._mudar(SEMIABERTO)
+        if self.estado == SEMIABERTO:
+            if self.testes >= BREAKER_HALF_OPEN_CALLS:
+                raise CircuitoAberto(self.servico, max(1, math.ceil(BREAKER_OPEN_SECONDS)))
+            self.testes += 1
+            return True
+        return False
+
+    def registrar(self, sucesso, teste):
+        """`sucesso` None = resultado neutro (cancelamento, erro de negócio)."""
+        if teste:
+            self.testes -= 1
+        if sucesso is None:
+            return
+        if sucesso:
+            if self.estado == SEMIABERTO and teste:
+                self._mudar(FECHADO)
+            if self.estado == FECHADO:
+                self.falhas = 0
+        elif self.estado == SEMIABERTO and teste:
+            self._mudar(ABERTO)
+        elif self.estado == FECHADO:
+            self.falhas += 1
+            if self.falhas >= BREAKER_FAILURES:
+                self._mudar(ABERTO)
+
+    def _mudar(self, estado):
+        self.estado = estado
+        if estado == ABERTO:
+            self.aberto_em = time.monotonic()
+        self.falhas = 0
+        BREAKER_STATE.labels(service=self.servico).set(_VALOR_ESTADO[estado])
+        BREAKER_TRANSITIONS.labels(service=self.servico, state=estado).inc()
+        log.warning("circuit breaker mudou de estado", service=self.servico, state=estado)
+
+
+class JanelaLatencia:
+    """Últimas `tamanho` latências de um RPC, para estimar percentis (atraso do hedge)."""
+
+    def __init__(self, tamanho=200, minimo=20):
+        self.amostras = deque(maxlen=tamanho)
+        self.minimo = minimo
+        self._novas = 0
+        self._cache = {}
+
+    def registrar(self, latencia):
+        self.amostras.append(latencia)
+        self._novas += 1
+        # Recalcula os percentis só a cada 10 amostras novas
+        if self._novas >= 10:
+            self._cache.clear()
+            self._novas = 0
+
+    def percentil(self, p):
+        """Percentil `p` (0-1) das amostras, ou None enquanto houver poucas."""
+        if len(self.amostras) < self.minimo:
+            return None
+        if p not in self._cache:
+            ordenadas = sorted(self.amostras)
+            self._cache[p] = ordenadas[min(len(ordenadas) - 1, int(p * len(ordenadas)))]
+        return self._cache[p]
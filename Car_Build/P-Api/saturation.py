@@ -0,0 +1,142 @@
+"""
+Saturação do threadpool e do event loop da P-API.
+
+No modo sync (P_API_GRPC_MODE=sync) cada chamada gRPC ocupa uma thread: do
+limitador do compartimento do endpoint (bulkhead.py) ou, fora deles, do
+threadpool padrão do anyio (o mesmo das rotas `def` do FastAPI, 40 threads
+por padrão). Com o pool cheio as requisições esperam por uma thread sem
+gastar CPU, e nem a CPU nem o p_api_active_requests mostram isso. Uma
+tarefa leve no event loop amostra a cada P_API_SATURATION_INTERVAL segundos:
+
+- p_api_threadpool_size / _busy_threads / _queued: tamanho do threadpool
+  padrão, threads ocupadas e chamadas esperando uma thread (a ocupação dos
+  compartimentos está nas métricas p_api_bulkhead_*);
+- p_api_event_loop_lag_seconds: atraso do event loop em acordar a tarefa
+  (loop ocupado com CPU ou bloqueado por código síncrono).
+
+As chamadas feitas por `run_in_threadpool` deste módulo (as do backends.py)
+medem também o tempo entre pedir e conseguir uma thread
+(p_api_threadpool_wait_seconds).
+
+`resumo()` (GET /debug/saturation) junta os últimos P_API_SATURATION_WINDOW
+segundos de amostras deste worker: ocupação, picos e percentis da espera e
+do atraso, além do estado atual de cada compartimento.
+"""
+import asyncio
+import collections
+import os
+import time
+
+import anyio.to_thread
+
+import bulkhead
+from metrics import (
+    THREADPOOL_SIZE,
+    THREADPOOL_BUSY,
+    THREADPOOL_QUEUED,
+    THREADPOOL_WAIT,
+    EVENT_LOOP_LAG,
+)
+
+
+SATURATION_INTERVAL = float(os.getenv("P_API_SATURATION_INTERVAL", "0.5"))
+SATURATION_WINDOW = float(os.getenv("P_API_SATURATION_WINDOW", "60"))
+# Vazio = padrão do anyio (40 threads)
+THREADPOOL_SIZE_CONFIG = os.getenv("P_API_THREADPOOL_SIZE", "")
+
+# (instante, threads ocupadas, fila, atraso do loop) das últimas amostras
+_amostras = collections.deque(maxlen=int(SATURATION_WINDOW / SATURATION_INTERVAL) + 1 if SATURATION_INTERVAL > 0 else 1)
+# (instante, espera) das últimas chamadas ao threadpool; append é atômico entre threads
+_esperas = collections.deque(maxlen=10000)
+
+_tarefa = None
+
+
+async def run_in_threadpool(func, *args, **kwargs):
+    """
+    run_in_threadpool do Starlette, registrando a espera por uma thread livre.
+    Roda no limitador do compartimento da requisição, se houver (bulkhead.py).
+    """
+    pedido = time.perf_counter()
+
+    def medir():
+        espera = time.perf_counter() - pedido
+        THREADPOOL_WAIT.observe(espera)
+        _esperas.append((time.monotonic(), espera))
+        return func(*args, **kwargs)
+
+    return await anyio.to_thread.run_sync(medir, limiter=bulkhead.limitador_threads())
+
+
+def _amostrar(atraso):
+    estatisticas = anyio.to_thread.current_default_thread_limiter().statistics()
+    THREADPOOL_SIZE.set(estatisticas.total_tokens)
+    THREADPOOL_BUSY.set(estatisticas.borrowed_tokens)
+    THREADPOOL_QUEUED.set(estatisticas.tasks_waiting)
+    EVENT_LOOP_LAG.observe(atraso)
+    _amostras.append((time.monotonic(), estatisticas.borrowed_tokens, estatisticas.tasks_waiting, atraso))
+
+
+async def _amostrar_periodicamente():
+    loop = asyncio.get_running_loop()
+    while True:
+        previsto = loop.time() + SATURATION_INTERVAL
+        await asyncio.sleep(SATURATION_INTERVAL)
+        _amostrar(max(0.0, loop.time() - previsto))
+
+
+def iniciar():
+    """Aplica P_API_THREADPOOL_SIZE e sobe a amostragem (no lifespan, com o loop ativo)."""
+    global _tarefa
+    limitador = anyio.to_thread.current_default_thread_limiter()
+    if THREADPOOL_SIZE_CONFIG:
+        limitador.total_tokens = int(THREADPOOL_SIZE_CONFIG)
+    THREADPOOL_SIZE.set(limitador.total_tokens)
+    if SATURATION_INTERVAL > 0:
+        _tarefa = asyncio.create_task(_amostrar_periodicamente())
+
+
+def parar():
+    global _tarefa
+    if _tarefa is not None:
+        _tarefa.cancel()
+        _tarefa = None
+
+
+def _percentis(valores):
+    if not valores:
+        return None
+    valores = sorted(valores)
+    ultimo = len(valores) - 1
+    percentis = {f"p{int(p * 100)}": round(valores[round(p * ultimo)] * 1000, 3) for p in (0.5, 0.95, 0.99)}
+    percentis["max"] = round(valores[-1] * 1000, 3)
+    return percentis
+
+
+def resumo():
+    """Saturação deste worker nos últimos P_API_SATURATION_WINDOW segundos."""
+    estatisticas = anyio.to_thread.current_default_thread_limiter().statistics()
+    desde = time.monotonic() - SATURATION_WINDOW
+    amostras = [a for a in _amostras if a[0] >= desde]
+    esperas = [espera for instante, espera in list(_esperas) if instante >= desde]
+    return {
+        "pid": os.getpid(),
+        "janela_s": SATURATION_WINDOW,
+        "threadpool": {
+            "tamanho": estatisticas.total_tokens,
+            "ocupadas": estatisticas.borrowed_tokens,
+            "fila": estatisticas.tasks_waiting,
+            "ocupacao_media": round(
+                sum(a[1] for a in amostras) / len(amostras) / estatisticas.total_tokens, 3
+            ) if amostras else None,
+            "pico_ocupadas": max((a[1] for a in amostras), default=None),
+            "pico_fila": max((a[2] for a in amostras), default=None),
+            "chamadas": len(esperas),
+            "espera_ms": _percentis(esperas),
+        },
+        "compartimentos": bulkhead.resumo(),
+        "event_loop": {
+            "amostras": len(amostras),
+            "atraso_ms": _percentis([a[3] for a in amostras]),
+        },
+    }
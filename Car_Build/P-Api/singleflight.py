@@ -0,0 +1,94 @@
+"""
+Execução única por chave (single-flight) e valores com validade em LRU.
+
+Base do cache do catálogo (catalog_cache.py) e do registro de chaves de
+idempotência do /pagar (idempotency.py):
+
+- SingleFlight: a primeira chamada de uma chave vira uma tarefa e as
+  chamadas simultâneas para a mesma chave aguardam essa tarefa em vez de
+  repetir o trabalho. A espera é protegida por `asyncio.shield`: se quem
+  iniciou desistir (cancelado), a tarefa segue para os demais;
+- EntradasLRU: valores válidos por `ttl` segundos, no máximo `max_entradas`
+  (sai o usado há mais tempo).
+"""
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class SingleFlight:
+    def __init__(self):
+        self._em_andamento = {}  # chave -> (asyncio.Task, dados)
+
+    def em_andamento(self, chave):
+        """(tarefa, dados) da execução em andamento para `chave`, ou None."""
+        return self._em_andamento.get(chave)
+
+    def iniciar(self, chave, chamar, dados=None):
+        """Executa `chamar()` (corrotina) em uma tarefa registrada para `chave` até terminar."""
+        tarefa = asyncio.ensure_future(self._executar(chave, chamar))
+        tarefa.add_done_callback(_descartar_excecao)
+        self._em_andamento[chave] = (tarefa, dados)
+        return tarefa
+
+    async def _executar(self, chave, chamar):
+        try:
+            return await chamar()
+        finally:
+            self._em_andamento.pop(chave, None)
+
+    @staticmethod
+    async def aguardar(tarefa):
+        # shield: o cancelamento de quem aguarda não cancela a tarefa dos demais
+        return await asyncio.shield(tarefa)
+
+
+class EntradasLRU:
+    def __init__(self, max_entradas, ttl, entradas_gauge, ao_descartar=None):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._entradas = OrderedDict()  # chave -> (expira_em, valor)
+        self._entradas_gauge = entradas_gauge
+        self._ao_descartar = ao_descartar  # ao_descartar(motivo): 'expired' ou 'capacity'
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def buscar(self, chave):
+        """
+        (valor, valido) de `chave`; (None, False) se não houver. Uma entrada
+        vencida é removida e devolvida com valido=False.
+        """
+        entrada = self._entradas.get(chave)
+        if entrada is None:
+            return None, False
+        expira_em, valor = entrada
+        if expira_em > time.monotonic():
+            self._entradas.move_to_end(chave)
+            return valor, True
+        del self._entradas[chave]
+        self._descartou('expired')
+        return valor, False
+
+    def guardar(self, chave, valor):
+        self._entradas[chave] = (time.monotonic() + self.ttl, valor)
+        self._entradas.move_to_end(chave)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+            self._descartou('capacity')
+        self._entradas_gauge.set(len(self._entradas))
+
+    def limpar(self):
+        self._entradas.clear()
+        self._entradas_gauge.set(0)
+
+    def _descartou(self, motivo):
+        if self._ao_descartar is not None:
+            self._ao_descartar(motivo)
+        self._entradas_gauge.set(len(self._entradas))
+
+
+def _descartar_excecao(tarefa):
+    # Evita o aviso "exception was never retrieved" quando ninguém mais aguarda a tarefa
+    if not tarefa.cancelled():
+        tarefa.exception()
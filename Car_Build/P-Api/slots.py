@@ -0,0 +1,68 @@
+"""
+Vagas de concorrência com fila de espera limitada.
+
+Base do limite adaptativo do controle de admissão (admission.py) e dos
+compartimentos por endpoint (bulkhead.py):
+
+- até `capacidade` donos de vaga ao mesmo tempo;
+- acima disso, no máximo `fila_max` esperam, em ordem de chegada, por até
+  `prazo` segundos; a vaga liberada passa direto para o primeiro da fila;
+- quem desiste (cancelado) depois de já ter recebido a vaga a devolve.
+
+`capacidade` pode mudar em execução (o limite AIMD muda a cada amostra);
+a nova capacidade vale a partir do próximo `adquirir`/`liberar`.
+"""
+import asyncio
+from collections import deque
+
+
+class Vagas:
+    def __init__(self, capacidade, fila_max, prazo, uso_gauge, fila_gauge):
+        self.capacidade = capacidade
+        self.fila_max = fila_max
+        self.prazo = prazo
+        self.em_uso = 0
+        self.fila = deque()
+        self._uso_gauge = uso_gauge
+        self._fila_gauge = fila_gauge
+
+    async def adquirir(self):
+        """Reserva uma vaga; retorna o motivo da recusa ("queue_full" ou "timeout") ou None."""
+        if self.em_uso < self.capacidade:
+            self._entrar()
+            return None
+        if len(self.fila) >= self.fila_max:
+            return "queue_full"
+
+        vaga = asyncio.get_running_loop().create_future()
+        self.fila.append(vaga)
+        self._fila_gauge.set(len(self.fila))
+        try:
+            await asyncio.wait_for(vaga, self.prazo)
+            return None
+        except asyncio.TimeoutError:
+            return "timeout"
+        except asyncio.CancelledError:
+            # Cliente desistiu depois de já ter recebido a vaga: devolve-a
+            if vaga.done() and not vaga.cancelled():
+                self.liberar()
+            raise
+        finally:
+            if vaga in self.fila:
+                self.fila.remove(vaga)
+            self._fila_gauge.set(len(self.fila))
+
+    def _entrar(self):
+        self.em_uso += 1
+        self._uso_gauge.set(self.em_uso)
+
+    def liberar(self):
+        """Devolve a vaga e passa as vagas livres para quem está esperando na fila."""
+        self.em_uso -= 1
+        while self.fila and self.em_uso < self.capacidade:
+            vaga = self.fila.popleft()
+            if not vaga.done():
+                self._entrar()
+                vaga.set_result(None)
+        self._fila_gauge.set(len(self.fila))
+        self._uso_gauge.set(self.em_uso)
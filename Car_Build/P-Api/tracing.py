@@ -0,0 +1,226 @@
+"""
+Tracing distribuído da P-API no formato W3C Trace Context, sem SDK externo.
+
+- o header `traceparent` da requisição é aceito (o trace continua o do
+  cliente); sem ele, um trace novo é criado. O mesmo trace segue para o
+  Server A/B no metadado gRPC `traceparent` de cada chamada
+  (interceptors.py), com o span da tentativa como pai;
+- spans: a requisição inteira (TracingMiddleware), as etapas da P-API
+  (decodificar, catalogo, backend, codificar) e cada tentativa gRPC. O span
+  "backend" inclui circuit breaker, fila do threadpool e hedge; a diferença
+  para o span "grpc" é o custo do gateway;
+- amostragem na cabeça: P_API_TRACE_SAMPLE dos traces novos (padrão 1%) ou
+  a decisão do cliente (flag sampled do traceparent);
+- amostragem na cauda (opcional): com P_API_TRACE_SLOW > 0, os spans de
+  todas as requisições são guardados em memória e o trace é exportado
+  também quando a requisição passa desse tempo (segundos) ou termina com
+  status >= 500. O padrão (0) deixa só a amostragem na cabeça: nenhum span
+  é criado para os traces não amostrados, e o custo fica nos 1%;
+- exportação: um evento de log "trace" (logs.py) com todos os spans, e os
+  últimos P_API_TRACE_BUFFER traces ficam em /debug/traces;
+- os traces exportados viram exemplars (trace_id) do
+  p_api_request_duration_seconds, visíveis no /metrics em OpenMetrics.
+"""
+import collections
+import contextvars
+import os
+import random
+import time
+from contextlib import contextmanager
+
+import logs
+
+
+TRACE_ENABLED = os.getenv("P_API_TRACE", "1") != "0"
+TRACE_SAMPLE = float(os.getenv("P_API_TRACE_SAMPLE", "0.01"))
+TRACE_SLOW = float(os.getenv("P_API_TRACE_SLOW", "0"))
+TRACE_BUFFER = int(os.getenv("P_API_TRACE_BUFFER", "100"))
+TRACE_EXCLUDE = frozenset(
+    caminho.strip() for caminho in os.getenv("P_API_TRACE_EXCLUDE", "/metrics,/health,/ready").split(",") if caminho.strip()
+)
+
+log = logs.obter("tracing")
+
+_traco_atual = contextvars.ContextVar("traco_atual", default=None)
+_span_atual = contextvars.ContextVar("span_atual", default=None)
+
+# Últimos traces exportados, para /debug/traces
+recentes = collections.deque(maxlen=TRACE_BUFFER)
+
+
+def _novo_id(bits):
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+def ler_traceparent(valor):
+    """(trace_id, span_id_pai, amostrado) do header, ou None se ausente/inválido."""
+    if not valor:
+        return None
+    partes = valor.strip().lower().split("-")
+    if len(partes) < 4 or len(partes[0]) != 2 or partes[0] == "ff":
+        return None
+    versao, trace_id, pai, flags = partes[:4]
+    # Versão 00 tem exatamente quatro campos; versões futuras podem ter mais
+    if versao == "00" and len(partes) != 4:
+        return None
+    if len(trace_id) != 32 or len(pai) != 16 or len(flags) != 2:
+        return None
+    try:
+        if int(trace_id, 16) == 0 or int(pai, 16) == 0:
+            return None
+        amostrado = bool(int(flags, 16) & 1)
+    except ValueError:
+        return None
+    return trace_id, pai, amostrado
+
+
+class Span:
+    __slots__ = ("nome", "span_id", "pai", "inicio", "fim", "atributos")
+
+    def __init__(self, nome, pai, atributos):
+        self.nome = nome
+        self.span_id = _novo_id(64)
+        self.pai = pai
+        self.inicio = time.time()
+        self.fim = None
+        self.atributos = atributos
+
+    def encerrar(self, **atributos):
+        self.fim = time.time()
+        if atributos:
+            self.atributos.update(atributos)
+
+    def exportar(self):
+        return {
+            "nome": self.nome,
+            "span_id": self.span_id,
+            "pai": self.pai,
+            "inicio": round(self.inicio, 6),
+            "duracao_ms": round(((self.fim or time.time()) - self.inicio) * 1000, 3),
+            **({"atributos": self.atributos} if self.atributos else {}),
+        }
+
+
+class Traco:
+    """Trace de uma requisição: ids, decisão da cabeça e spans gravados."""
+
+    __slots__ = ("trace_id", "pai_remoto", "amostrado", "gravando", "spans")
+
+    def __init__(self, trace_id, pai_remoto, amostrado):
+        self.trace_id = trace_id
+        self.pai_remoto = pai_remoto
+        self.amostrado = amostrado
+        # Sem amostragem na cauda, só os traces amostrados na cabeça gravam spans
+        self.gravando = amostrado or TRACE_SLOW > 0
+        self.spans = []
+
+    def abrir(self, nome, pai, atributos):
+        span = Span(nome, pai, atributos)
+        self.spans.append(span)
+        return span
+
+
+def traceparent(span=None):
+    """Valor do traceparent para propagar ao backend, ou None fora de uma requisição."""
+    traco = _traco_atual.get()
+    if traco is None:
+        return None
+    if span is None:
+        span = _span_atual.get()
+    pai = span.span_id if span is not None else traco.pai_remoto or _novo_id(64)
+    return f"00-{traco.trace_id}-{pai}-{'01' if traco.amostrado else '00'}"
+
+
+def abrir(nome, **atributos):
+    """Span filho do span atual (sem torná-lo o atual); None se o trace não grava."""
+    traco = _traco_atual.get()
+    if traco is None or not traco.gravando:
+        return None
+    pai = _span_atual.get()
+    return traco.abrir(nome, pai.span_id if pai is not None else traco.pai_remoto, atributos)
+
+
+@contextmanager
+def span(nome, **atributos):
+    """Span de uma etapa; os spans abertos dentro dele (mesma tarefa) viram filhos."""
+    s = abrir(nome, **atributos)
+    if s is None:
+        yield None
+        return
+    token = _span_atual.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.atributos["erro"] = type(e).__name__
+        raise
+    finally:
+        _span_atual.reset(token)
+        s.encerrar()
+
+
+def exemplar(duracao):
+    """Exemplar com o trace_id, só para requisições cujo trace será exportado."""
+    traco = _traco_atual.get()
+    if traco is not None and (traco.amostrado or 0 < TRACE_SLOW <= duracao):
+        return {"trace_id": traco.trace_id}
+    return None
+
+
+def _exportar(traco, motivo, raiz):
+    evento = {
+        "trace_id": traco.trace_id,
+        "motivo": motivo,
+        "duracao_ms": round((raiz.fim - raiz.inicio) * 1000, 3),
+        "spans": [s.exportar() for s in traco.spans],
+    }
+    recentes.append(evento)
+    log.info("trace", **evento)
+
+
+class TracingMiddleware:
+    """Abre o trace da requisição e decide, no fim, se ele é exportado."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not TRACE_ENABLED or scope["path"] in TRACE_EXCLUDE:
+            await self.app(scope, receive, send)
+            return
+
+        remoto = None
+        for nome, valor in scope["headers"]:
+            if nome == b"traceparent":
+                remoto = ler_traceparent(valor.decode("latin-1"))
+                break
+        if remoto is not None:
+            traco = Traco(*remoto)
+        else:
+            traco = Traco(_novo_id(128), None, random.random() < TRACE_SAMPLE)
+
+        raiz = None
+        if traco.gravando:
+            raiz = traco.abrir(f"{scope['method']} {scope['path']}", traco.pai_remoto, {})
+        status = 500
+
+        async def send_com_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        token_traco = _traco_atual.set(traco)
+        token_span = _span_atual.set(raiz)
+        try:
+            await self.app(scope, receive, send_com_status)
+        finally:
+            _span_atual.reset(token_span)
+            _traco_atual.reset(token_traco)
+            if raiz is not None:
+                raiz.encerrar(status=status)
+                if traco.amostrado:
+                    _exportar(traco, "cabeca", raiz)
+                elif status >= 500:
+                    _exportar(traco, "erro", raiz)
+                elif raiz.fim - raiz.inicio >= TRACE_SLOW:
+                    _exportar(traco, "lento", raiz)
@@ -0,0 +1,138 @@
+"""
+Aquecimento no startup e readiness da P-API.
+
+Os canais gRPC só conectam na primeira chamada e o cache do catálogo começa
+vazio: sem aquecimento, um pod novo recebe tráfego e as primeiras
+requisições pagam a conexão HTTP/2 e os misses. Logo depois do startup, uma
+tarefa em segundo plano:
+
+1. conecta todos os canais de cada microserviço e espera ficarem READY, por
+   até P_API_STARTUP_TIMEOUT segundos;
+2. faz uma chamada por canal do Server B (Calcular sem itens, sem efeito) e
+   carrega no cache o catálogo dos carros de P_API_WARMUP_CARS, o que também
+   passa pelos canais do Server A. Um microserviço sem nenhum canal pronto
+   não é chamado.
+
+Liveness e readiness ficam separados: GET /health responde assim que o
+processo sobe (liveness) e GET /ready responde 503 até o aquecimento
+terminar e volta a 503 no desligamento (readiness). Se os microserviços
+não ficarem prontos dentro do prazo, o pod fica pronto assim mesmo, com um
+aviso no log: com o Server A/B fora do ar, todas as réplicas presas em
+"não pronto" tirariam a P-API inteira do Service.
+
+p_api_startup_duration_seconds{stage} guarda quanto cada etapa levou
+(channels, warmup e total, contado desde a importação do app) e p_api_ready
+indica se o worker está pronto.
+"""
+import asyncio
+import os
+import time
+
+import grpc
+
+import backends
+import generated.catalogo_pb2 as catalogo_pb2
+import generated.pricing_pb2 as pricing_pb2
+import logs
+from metrics import READY, STARTUP_DURATION
+
+
+# Importação junto com o app.py: base do tempo total do startup
+_INICIO = time.monotonic()
+
+WARMUP_ENABLED = os.getenv("P_API_WARMUP", "1") != "0"
+STARTUP_TIMEOUT = float(os.getenv("P_API_STARTUP_TIMEOUT", "20"))
+# Carros do init.sql, no formato "modelo:ano,modelo:ano"
+WARMUP_CARS = os.getenv("P_API_WARMUP_CARS", "civic:2023,corolla:2020,fusca:2014")
+
+log = logs.obter("warmup")
+
+pronto = False
+_etapas = {}
+_tarefa = None
+
+
+def ler_carros(valor):
+    """"civic:2023,fusca:2014" -> [Carro, ...]"""
+    carros = []
+    for item in valor.split(","):
+        if item.strip():
+            modelo, _, ano = item.strip().partition(":")
+            carros.append(catalogo_pb2.Carro(modelo=modelo, ano=int(ano or 0)))
+    return carros
+
+
+def _marcar_pronto(valor):
+    global pronto
+    pronto = valor
+    READY.set(1 if valor else 0)
+
+
+def _registrar_etapa(etapa, inicio):
+    _etapas[etapa] = round(time.monotonic() - inicio, 3)
+    STARTUP_DURATION.labels(stage=etapa).set(_etapas[etapa])
+
+
+async def _aguardar_canais():
+    """Espera os canais de todos os microserviços; retorna {servico: (prontos, total)}."""
+    resultados = await asyncio.gather(*(b.aguardar_pronto(STARTUP_TIMEOUT) for b in backends.BACKENDS))
+    return {b.nome: (prontos, len(b.endpoints)) for b, prontos in zip(backends.BACKENDS, resultados)}
+
+
+async def _aquecer(carregar_catalogo):
+    inicio = time.monotonic()
+    canais = await _aguardar_canais()
+    _registrar_etapa("channels", inicio)
+    for servico, (prontos, total) in canais.items():
+        if prontos < total:
+            log.warning("canais não ficaram prontos no prazo", service=servico, prontos=prontos, total=total,
+                        prazo=STARTUP_TIMEOUT)
+
+    # Sem nenhum canal pronto, as chamadas só falhariam e abririam o circuit breaker
+    inicio = time.monotonic()
+    chamadas = []
+    if canais[backends.server_b.nome][0]:
+        chamadas += [
+            backends.server_b.chamar("Calcular", pricing_pb2.OrcamentoRequest())
+            for _ in backends.server_b.endpoints
+        ]
+    if canais[backends.server_a.nome][0]:
+        chamadas += [carregar_catalogo(carro) for carro in ler_carros(WARMUP_CARS)]
+    falhas = [r for r in await asyncio.gather(*chamadas, return_exceptions=True) if isinstance(r, Exception)]
+    _registrar_etapa("warmup", inicio)
+    if falhas:
+        erro = falhas[0]
+        log.warning("chamadas do aquecimento falharam", falhas=len(falhas), total=len(chamadas),
+                    erro=erro.code().name if isinstance(erro, grpc.RpcError) else str(erro))
+
+
+async def _iniciar(carregar_catalogo):
+    if WARMUP_ENABLED:
+        try:
+            await _aquecer(carregar_catalogo)
+        except Exception:
+            # Aquecimento é otimização: um erro aqui não deve deixar o pod fora da rotação
+            log.error("erro no aquecimento", exc_info=True)
+    _registrar_etapa("total", _INICIO)
+    _marcar_pronto(True)
+    log.info("pronto para receber tráfego", **_etapas)
+
+
+def iniciar(carregar_catalogo):
+    """Sobe o aquecimento em segundo plano; `carregar_catalogo(carro)` enche o cache."""
+    global _tarefa
+    _marcar_pronto(False)
+    _tarefa = asyncio.create_task(_iniciar(carregar_catalogo))
+
+
+def parar():
+    """Tira o worker da rotação (desligamento) e cancela o aquecimento, se ainda roda."""
+    global _tarefa
+    _marcar_pronto(False)
+    if _tarefa is not None:
+        _tarefa.cancel()
+        _tarefa = None
+
+
+def estado():
+    return {"pronto": pronto, "startup_s": dict(_etapas)}
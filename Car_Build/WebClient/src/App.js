@@ -53,9 +53,9 @@ function App() {
     setError(null);
 
     try {
-      const response = await axios.post(`${API_URL}/get-pecas`, {
-        modelo: car.modelo,
-        ano: car.ano,
+      // GET para o navegador reaproveitar o catálogo já baixado (ETag/304)
+      const response = await axios.get(`${API_URL}/get-pecas`, {
+        params: { modelo: car.modelo, ano: car.ano },
       });
 
       setParts(response.data.pecas || []);
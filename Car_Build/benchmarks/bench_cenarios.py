@@ -0,0 +1,235 @@
+"""
+Cenários de carga do relatório (README, seção 6) como código, rodados com o
+locustfile.py em modo headless e comparados contra uma baseline.
+
+Cada cenário fixa usuários, spawn rate, duração, classes de usuário e pesos
+das tarefas. Os cenários 2 e 3 do relatório mudam o cluster (réplicas e
+distribuição dos pods), não a carga: suba a configuração desejada e rode o
+mesmo cenário de carga com um `--rotulo` diferente.
+
+Com `--workers N`, o Locust roda distribuído na máquina local: um master e
+N workers (`--workers 0` = um por núcleo). Os avisos de CPU do Locust (do
+master ou de qualquer worker) vão para o resumo: se aparecerem, o gerador de
+carga foi o gargalo e os números não medem a P-API.
+
+Cada execução grava em `--saida` (padrão benchmarks/resultados/):
+    <rotulo>_<cenario>_<data>/locust_stats.csv, locust_stats_history.csv,
+    locust_failures.csv, locust_exceptions.csv, locust_*.log e resumo.json
+
+Com `--salvar-baseline`, o resumo vira a baseline do cenário
+(benchmarks/baselines/<rotulo>_<cenario>.json). Sem ele, se a baseline
+existir, a execução é comparada: RPS abaixo de (1 - tolerância) da baseline
+ou p50/p95/p99 acima de (1 + tolerância) encerram com código 1.
+
+Uso (a partir de Car_Build/):
+    python benchmarks/bench_cenarios.py --listar
+    python benchmarks/bench_cenarios.py carga_2500 --salvar-baseline
+    python benchmarks/bench_cenarios.py carga_2500 --tolerancia 0.1
+    python benchmarks/bench_cenarios.py carga_5000 --rotulo cenario2 --host http://<ip-do-cluster>:30000
+    python benchmarks/bench_cenarios.py carga_7500_fast --workers 0
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from collections import namedtuple
+
+from locust_csv import ler_agregado
+from registro import baseline_para_comparar, commit_atual, salvar_json
+
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+CAR_BUILD = os.path.join(BENCHMARKS, "..")
+# Locustfile de cada classe de usuário. Cada cenário carrega só os arquivos das
+# suas classes: o locustfile_grpc.py chama grpc_gevent.init_gevent() ao ser
+# importado, o que muda o runtime do gRPC do gerador de carga nos cenários HTTP.
+LOCUSTFILES = {
+    "CarBuildUser": "locustfile.py",
+    "CarBuildFastUser": "locustfile_fast.py",
+    "CarBuildGrpcUser": "locustfile_grpc.py",
+}
+
+# Mensagens que o Locust registra quando a CPU do gerador passa de 90%
+AVISOS_CPU = ("CPU usage above", "exceeded cpu threshold")
+
+Cenario = namedtuple("Cenario", ["usuarios", "spawn_rate", "duracao", "pesos", "usuario", "descricao"])
+
+# Mix do locustfile.py: as quatro tarefas com peso 1
+MIX_PADRAO = "health_check=1,get_pecas=1,calcular=1,pagar=1,checkout=0"
+
+CENARIOS = {
+    "caso_base": Cenario(1, 1, "3m", MIX_PADRAO, "CarBuildUser", "Caso base: 1 usuário"),
+    "carga_2500": Cenario(2500, 100, "3m", MIX_PADRAO, "CarBuildUser", "Caso de teste 1: 2500 usuários"),
+    "carga_5000": Cenario(5000, 100, "3m", MIX_PADRAO, "CarBuildUser", "Caso de teste 2: 5000 usuários"),
+    "carga_7500": Cenario(7500, 100, "3m", MIX_PADRAO, "CarBuildUser", "Caso de teste 3: 7500 usuários"),
+    "checkout_2500": Cenario(
+        2500, 100, "3m", "health_check=1,get_pecas=1,calcular=1,pagar=0,checkout=1", "CarBuildUser",
+        "Carga 1 com o /pagar trocado pelo /checkout",
+    ),
+    "carga_7500_fast": Cenario(
+        7500, 100, "3m", MIX_PADRAO, "CarBuildFastUser",
+        "Caso de teste 3 com o FastHttpUser (use com --workers)",
+    ),
+    "gateway_500": Cenario(
+        500, 50, "3m", MIX_PADRAO, "CarBuildUser CarBuildGrpcUser",
+        "HTTP pela P-API e gRPC direto nos backends lado a lado (custo do gateway)",
+    ),
+    "smoke": Cenario(20, 20, "20s", MIX_PADRAO, "CarBuildUser", "Verificação rápida do runner"),
+}
+
+# Métricas comparadas com a baseline: (chave, maior é melhor)
+METRICAS = [("rps", True), ("p50", False), ("p95", False), ("p99", False)]
+
+
+def _locustfiles(cenario):
+    """Valor do `-f` do Locust: os locustfiles das classes de usuário do cenário."""
+    arquivos = dict.fromkeys(LOCUSTFILES[usuario] for usuario in cenario.usuario.split())
+    return ",".join(os.path.join(CAR_BUILD, arquivo) for arquivo in arquivos)
+
+
+def _executar_locust(nome, cenario, args, diretorio, env):
+    """Roda o Locust (um processo, ou master + workers) e retorna os arquivos de log."""
+    prefixo = os.path.join(diretorio, "locust")
+    locustfiles = _locustfiles(cenario)
+    comando = [
+        "locust", "-f", locustfiles, *cenario.usuario.split(),
+        "--headless", "--only-summary",
+        "--host", args.host,
+        "--users", str(cenario.usuarios),
+        "--spawn-rate", str(cenario.spawn_rate),
+        "--run-time", cenario.duracao,
+        "--csv", prefixo, "--csv-full-history",
+        # Falhas de requisição entram na comparação; não devem abortar o runner
+        "--exit-code-on-error", "0",
+    ]
+    if args.workers is None:
+        log = prefixo + ".log"
+        print(f"[{nome}] {cenario.descricao}: {' '.join(comando)}")
+        subprocess.run(comando + ["--logfile", log], env=env, check=True)
+        return [log]
+
+    quantidade = args.workers or os.cpu_count() or 1
+    logs = [prefixo + "_master.log"]
+    comando += ["--master", "--expect-workers", str(quantidade), "--logfile", logs[0]]
+    print(f"[{nome}] {cenario.descricao}, {quantidade} workers: {' '.join(comando)}")
+    master = subprocess.Popen(comando, env=env)
+    workers = []
+    try:
+        for i in range(quantidade):
+            logs.append(f"{prefixo}_worker{i}.log")
+            workers.append(subprocess.Popen(
+                ["locust", "-f", locustfiles, *cenario.usuario.split(), "--worker",
+                 "--master-host", "127.0.0.1", "--logfile", logs[-1]],
+                env=env,
+            ))
+        if master.wait() != 0:
+            raise subprocess.CalledProcessError(master.returncode, comando)
+    finally:
+        # O master manda os workers encerrarem no fim do teste; isso é só para erros
+        for processo in workers + [master]:
+            try:
+                processo.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                processo.terminate()
+                processo.wait()
+    return logs
+
+
+def _avisos_cpu(logs):
+    avisos = []
+    for log in logs:
+        if not os.path.exists(log):
+            continue
+        with open(log, errors="replace") as f:
+            avisos += [linha.strip() for linha in f if any(aviso in linha for aviso in AVISOS_CPU)]
+    return avisos
+
+
+def rodar(nome, cenario, args):
+    diretorio = os.path.join(args.saida, f"{args.rotulo}_{nome}_{time.strftime('%Y%m%d-%H%M%S')}")
+    os.makedirs(diretorio)
+    env = dict(os.environ, LOCUST_TASK_WEIGHTS=cenario.pesos, LOCUST_SEED=str(args.seed))
+    logs = _executar_locust(nome, cenario, args, diretorio, env)
+    avisos = _avisos_cpu(logs)
+    for aviso in avisos:
+        print(f"[{nome}] AVISO DE CPU DO LOCUST: {aviso}")
+    if avisos:
+        print(f"[{nome}] o gerador de carga saturou a CPU: os números podem estar limitados pelo Locust, "
+              "não pela P-API (use --workers ou o FastHttpUser)")
+
+    resumo = {
+        "cenario": nome,
+        "rotulo": args.rotulo,
+        "configuracao": cenario._asdict(),
+        "host": args.host,
+        "seed": args.seed,
+        "workers": args.workers,
+        "avisos_cpu": avisos,
+        "commit": commit_atual(),
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "resultado": ler_agregado(os.path.join(diretorio, "locust")),
+    }
+    salvar_json(os.path.join(diretorio, "resumo.json"), resumo)
+    print(f"[{nome}] resultados em {diretorio}")
+    return resumo
+
+
+def comparar(atual, baseline, tolerancia):
+    """Imprime a comparação e retorna a lista de métricas que regrediram."""
+    regressoes = []
+    print(f"\n{'métrica':<10}{'baseline':>12}{'atual':>12}{'variação':>11}")
+    for chave, maior_melhor in METRICAS:
+        antes = baseline["resultado"][chave]
+        depois = atual["resultado"][chave]
+        variacao = (depois - antes) / antes if antes else 0.0
+        piorou = variacao < -tolerancia if maior_melhor else variacao > tolerancia
+        marca = "  REGRESSÃO" if piorou else ""
+        print(f"{chave:<10}{antes:>12.1f}{depois:>12.1f}{variacao:>+10.1%}{marca}")
+        if piorou:
+            regressoes.append(chave)
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cenarios", nargs="*", help="cenários a rodar (veja --listar)")
+    parser.add_argument("--listar", action="store_true")
+    parser.add_argument("--host", default="http://localhost:8000")
+    parser.add_argument("--rotulo", default="local", help="identifica o ambiente (ex.: base, cenario2, cenario3)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="roda master + N workers locais (0 = um por núcleo); sem a opção, um processo")
+    parser.add_argument("--tolerancia", type=float, default=0.10, help="variação aceita (0.10 = 10%%)")
+    parser.add_argument("--salvar-baseline", action="store_true")
+    parser.add_argument("--saida", default=os.path.join(BENCHMARKS, "resultados"))
+    parser.add_argument("--baselines", default=os.path.join(BENCHMARKS, "baselines"))
+    args = parser.parse_args()
+
+    if args.listar or not args.cenarios:
+        for nome, cenario in CENARIOS.items():
+            print(f"{nome:<15}{cenario.usuarios:>6} usuários  spawn {cenario.spawn_rate:<4} {cenario.duracao:<5} {cenario.descricao}")
+        return 0
+
+    desconhecidos = [nome for nome in args.cenarios if nome not in CENARIOS]
+    if desconhecidos:
+        parser.error(f"cenários desconhecidos: {', '.join(desconhecidos)}")
+
+    os.makedirs(args.saida, exist_ok=True)
+    regrediu = False
+    for nome in args.cenarios:
+        atual = rodar(nome, CENARIOS[nome], args)
+        caminho = os.path.join(args.baselines, f"{args.rotulo}_{nome}.json")
+        baseline = baseline_para_comparar(caminho, atual, args.salvar_baseline, f"[{nome}] ")
+        if baseline is not None:
+            if baseline.get("avisos_cpu"):
+                print(f"[{nome}] atenção: a baseline também teve avisos de CPU do Locust")
+            regressoes = comparar(atual, baseline, args.tolerancia)
+            if regressoes:
+                print(f"[{nome}] regressão em: {', '.join(regressoes)}")
+                regrediu = True
+    return 1 if regrediu else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
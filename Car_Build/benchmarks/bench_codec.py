@@ -0,0 +1,117 @@
+"""
+Benchmark do codec JSON <-> protobuf da P-API contra o google.protobuf.json_format.
+
+Para cada mensagem do caminho quente, verifica primeiro que as duas
+implementações produzem o mesmo resultado (mesma mensagem na entrada, mesmo
+JSON na saída, incluindo os nomes em camelCase esperados pelo WebClient) e
+depois mede o tempo médio por operação.
+
+Uso (a partir de Car_Build/):
+    python benchmarks/bench_codec.py [--iteracoes 20000]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "P-Api"))
+
+from google.protobuf import json_format  # noqa: E402
+
+import codec  # noqa: E402
+import generated.catalogo_pb2 as catalogo_pb2  # noqa: E402
+import generated.common_pb2 as common_pb2  # noqa: E402
+import generated.pricing_pb2 as pricing_pb2  # noqa: E402
+
+
+# Peças do Civic em database/init.sql
+PECAS = [
+    common_pb2.Peca(id=str(i), nome=nome, valor=valor)
+    for i, (nome, valor) in enumerate([
+        ("Chassi", 8000.00),
+        ("Motor 2.0 VTEC", 6500.00),
+        ("Rodas Aro 16", 1200.00),
+        ("Farol LED", 350.00),
+        ("Parachoque Esportivo", 450.00),
+        ("Capô Esportivo", 600.00),
+        ("Spoiler", 300.00),
+    ], start=1)
+]
+ITENS = [pricing_pb2.Item(peca=peca, quantidade=1) for peca in PECAS[:3]]
+ITENS_JSON = [json_format.MessageToDict(item) for item in ITENS]
+
+# Corpos de requisição como o WebClient/locustfile enviam
+REQUISICOES = [
+    (catalogo_pb2.Carro, {"modelo": "Civic", "ano": 2023}),
+    (pricing_pb2.OrcamentoRequest, {"itens": ITENS_JSON}),
+    (pricing_pb2.CompraRequest, {"itens": ITENS_JSON, "valor_total": 9745.0}),
+]
+
+RESPOSTAS = [
+    catalogo_pb2.PecasResponse(pecas=PECAS),
+    pricing_pb2.Preco(preco=9700.0, frete=45.0, total=9745.0),
+    pricing_pb2.CompraResponse(
+        pedido_id="PED-1733500000000-ABC123XYZ",
+        status="CONFIRMADO",
+        valor_total=9745.0,
+        data_pedido="2025-12-06T12:00:00.000Z",
+        itens_comprados=ITENS,
+        subtotal=9700.0,
+        frete=45.0,
+    ),
+]
+
+
+def _json_format_decode(cls, dados):
+    mensagem = cls()
+    json_format.ParseDict(json.loads(dados), mensagem)
+    return mensagem
+
+
+def _json_format_encode(mensagem):
+    # Mesmo caminho da versão anterior: MessageToDict + JSONResponse do FastAPI
+    return json.dumps(
+        json_format.MessageToDict(mensagem), ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def verificar_equivalencia():
+    for cls, corpo in REQUISICOES:
+        dados = json.dumps(corpo).encode("utf-8")
+        assert codec.decodificar(cls, dados) == _json_format_decode(cls, dados), cls.__name__
+    for mensagem in RESPOSTAS:
+        assert codec.codificar(mensagem) == _json_format_encode(mensagem), type(mensagem).__name__
+
+    compra = json.loads(codec.codificar(RESPOSTAS[2]))
+    for campo in ("pedidoId", "dataPedido", "valorTotal", "itensComprados"):
+        assert campo in compra, campo
+    print("Saídas equivalentes ao json_format (incluindo pedidoId/dataPedido em camelCase)\n")
+
+
+def _medir(funcao, iteracoes):
+    return min(timeit.repeat(funcao, number=iteracoes, repeat=3)) / iteracoes * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iteracoes", type=int, default=20000)
+    args = parser.parse_args()
+
+    verificar_equivalencia()
+
+    print(f"{'operação':<34}{'json_format (µs)':>18}{'codec (µs)':>14}{'ganho':>9}")
+    for cls, corpo in REQUISICOES:
+        dados = json.dumps(corpo).encode("utf-8")
+        antes = _medir(lambda: _json_format_decode(cls, dados), args.iteracoes)
+        depois = _medir(lambda: codec.decodificar(cls, dados), args.iteracoes)
+        print(f"{'decodificar ' + cls.__name__:<34}{antes:>18.2f}{depois:>14.2f}{antes / depois:>8.1f}x")
+    for mensagem in RESPOSTAS:
+        antes = _medir(lambda: _json_format_encode(mensagem), args.iteracoes)
+        depois = _medir(lambda: codec.codificar(mensagem), args.iteracoes)
+        nome = type(mensagem).__name__
+        print(f"{'codificar ' + nome:<34}{antes:>18.2f}{depois:>14.2f}{antes / depois:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Compara JSON e protobuf (`application/x-protobuf`) nos endpoints da P-API.
+
+1. Sem `--url`: custo da conversão na P-API por mensagem (decodificar a
+   requisição + codificar a resposta) e tamanho do corpo em cada formato.
+2. Com `--url`: carga HTTP em malha fechada (`--concorrencia` clientes
+   fazendo requisições seguidas por `--duracao` segundos) contra uma P-API
+   rodando, uma rodada por endpoint e formato, com RPS e p50/p95/p99.
+
+Uso (a partir de Car_Build/):
+    python benchmarks/bench_encodings.py
+    python benchmarks/bench_encodings.py --url http://localhost:8000 --concorrencia 50 --duracao 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "P-Api"))
+
+import codec  # noqa: E402
+import generated.catalogo_pb2 as catalogo_pb2  # noqa: E402
+import generated.pricing_pb2 as pricing_pb2  # noqa: E402
+
+from bench_codec import ITENS, RESPOSTAS  # noqa: E402
+
+
+CARRO = catalogo_pb2.Carro(modelo="Civic", ano=2023)
+ORCAMENTO = pricing_pb2.OrcamentoRequest(itens=ITENS)
+COMPRA = pricing_pb2.CompraRequest(itens=ITENS, valor_total=9745.0)
+
+# endpoint -> requisição; no modo --url o valor_total do /pagar é trocado
+# pelo total retornado pelo /calcular
+ENDPOINTS = {"/get-pecas": CARRO, "/calcular": ORCAMENTO, "/pagar": COMPRA}
+
+CABECALHOS = {
+    "json": {"Content-Type": "application/json", "Accept": "application/json"},
+    "protobuf": {"Content-Type": codec.PROTOBUF, "Accept": codec.PROTOBUF},
+}
+
+
+def _corpo(mensagem, formato):
+    return codec.codificar(mensagem) if formato == "json" else mensagem.SerializeToString()
+
+
+def _medir(funcao, iteracoes):
+    return min(timeit.repeat(funcao, number=iteracoes, repeat=3)) / iteracoes * 1e6
+
+
+def conversao(iteracoes):
+    print(f"{'endpoint':<12}{'formato':<10}{'req (B)':>9}{'resp (B)':>10}{'conversão (µs)':>16}")
+    respostas = dict(zip(ENDPOINTS, RESPOSTAS))
+    for endpoint, requisicao in ENDPOINTS.items():
+        resposta = respostas[endpoint]
+        for formato, cabecalhos in CABECALHOS.items():
+            corpo = _corpo(requisicao, formato)
+            tipo = cabecalhos["Content-Type"]
+
+            def ida_e_volta():
+                codec.ler(type(requisicao), corpo, tipo)
+                _corpo(resposta, formato)
+
+            tempo = _medir(ida_e_volta, iteracoes)
+            print(f"{endpoint:<12}{formato:<10}{len(corpo):>9}{len(_corpo(resposta, formato)):>10}{tempo:>16.2f}")
+
+
+def _percentil(ordenadas, p):
+    return ordenadas[min(len(ordenadas) - 1, int(p * len(ordenadas)))] * 1000
+
+
+async def _rodada(cliente, url, corpo, cabecalhos, concorrencia, duracao):
+    latencias = []
+    falhas = 0
+    fim = time.perf_counter() + duracao
+
+    async def usuario():
+        nonlocal falhas
+        while time.perf_counter() < fim:
+            inicio = time.perf_counter()
+            resp = await cliente.post(url, content=corpo, headers=cabecalhos)
+            latencias.append(time.perf_counter() - inicio)
+            if resp.status_code != 200:
+                falhas += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(usuario() for _ in range(concorrencia)))
+    decorrido = time.perf_counter() - inicio
+    latencias.sort()
+    return len(latencias) / decorrido, latencias, falhas
+
+
+async def carga(args):
+    import httpx
+
+    limites = httpx.Limits(max_connections=args.concorrencia, max_keepalive_connections=args.concorrencia)
+    async with httpx.AsyncClient(base_url=args.url, limits=limites, timeout=30) as cliente:
+        # Orçamento real do Server B para o /pagar não ser recusado
+        resp = await cliente.post("/calcular", content=codec.codificar(ORCAMENTO), headers=CABECALHOS["json"])
+        resp.raise_for_status()
+        compra = pricing_pb2.CompraRequest(itens=ITENS, valor_total=json.loads(resp.content)["total"])
+
+        print(f"\n{args.concorrencia} clientes, {args.duracao}s por rodada\n")
+        print(f"{'endpoint':<12}{'formato':<10}{'RPS':>9}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}{'falhas':>8}")
+        for endpoint, requisicao in ENDPOINTS.items():
+            if endpoint == "/pagar":
+                requisicao = compra
+            for formato, cabecalhos in CABECALHOS.items():
+                rps, latencias, falhas = await _rodada(
+                    cliente, endpoint, _corpo(requisicao, formato), cabecalhos, args.concorrencia, args.duracao
+                )
+                print(
+                    f"{endpoint:<12}{formato:<10}{rps:>9.1f}{_percentil(latencias, 0.5):>10.1f}"
+                    f"{_percentil(latencias, 0.95):>10.1f}{_percentil(latencias, 0.99):>10.1f}{falhas:>8}"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iteracoes", type=int, default=20000)
+    parser.add_argument("--url", help="P-API rodando; sem ele, mede só a conversão em processo")
+    parser.add_argument("--concorrencia", type=int, default=50)
+    parser.add_argument("--duracao", type=float, default=20)
+    args = parser.parse_args()
+
+    conversao(args.iteracoes)
+    if args.url:
+        asyncio.run(carga(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+Custo fixo por requisição da P-API, medido em processo, sem rede e sem
+backends de verdade.
+
+O app ASGI é chamado direto (scope/receive/send montados aqui, com a pilha
+completa de middlewares) e os canais gRPC do Server A/B são trocados por
+stubs que respondem com os servicers do mock_backends.py. O cliente dos
+backends (circuit breaker, deadline, threadpool no modo sync) continua no
+caminho; saem a rede, o servidor gRPC e o canal com seus interceptors, cujas
+métricas são medidas à parte.
+
+Etapas medidas, cada uma isolada:
+    roteamento         encontrar a rota de /calcular no router do Starlette
+    decodificar        corpo JSON do /calcular -> OrcamentoRequest (codec.ler)
+    metricas           as atualizações de um handler: ACTIVE_REQUESTS inc/dec,
+                       REQUEST_COUNT e REQUEST_LATENCY
+    metricas_grpc      o registro de uma chamada pelo interceptor gRPC
+    codificar          Preco -> JSON (codec.codificar)
+    backend            backends.server_b.chamar("Calcular") com o stub
+    GET /health, POST /get-pecas (cache quente), POST /calcular, POST /pagar
+                       requisição completa pelo app
+
+Para cada etapa: ns por operação (menor média entre as repetições, como o
+timeit) e o pico de memória alocada durante uma operação (tracemalloc,
+mediana de várias). A soma das etapas contra a requisição completa mostra o
+quanto fica no framework e nos middlewares.
+
+Os resultados vão para benchmarks/resultados/overhead_<rotulo>_<data>.json.
+Com `--salvar-baseline`, viram a baseline (benchmarks/baselines/overhead_<rotulo>.json);
+sem ele, a execução é comparada com ela e termina com código 1 se alguma
+etapa ficar mais lenta que a tolerância.
+
+Uso (a partir de Car_Build/):
+    python benchmarks/bench_overhead.py --salvar-baseline
+    python benchmarks/bench_overhead.py --tolerancia 0.15
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+CAR_BUILD = os.path.join(BENCHMARKS, "..")
+sys.path.insert(0, os.path.join(CAR_BUILD, "P-Api"))
+
+# As linhas de log no stdout se misturariam com a tabela; P_API_LOG_LEVEL=INFO
+# inclui o custo dos logs do /pagar na medição
+os.environ.setdefault("P_API_LOG_LEVEL", "WARNING")
+# Requisições em sequência nunca formam lote: a janela do micro-batching do
+# /calcular seria só espera somada ao custo medido
+os.environ.setdefault("P_API_CALC_BATCH_WINDOW", "0")
+
+import grpc  # noqa: E402
+from starlette.routing import Match  # noqa: E402
+
+import app as p_api  # noqa: E402
+import backends  # noqa: E402
+import codec  # noqa: E402
+import generated.pricing_pb2 as pricing_pb2  # noqa: E402
+from interceptors import _MetricasMetodo  # noqa: E402
+from metrics import ACTIVE_REQUESTS, REQUEST_COUNT, REQUEST_LATENCY  # noqa: E402
+
+from mock_backends import CatalogoMock, Falhas, OrcamentoMock, _calcular, carregar_catalogo  # noqa: E402
+from registro import baseline_para_comparar, commit_atual, salvar_json  # noqa: E402
+
+
+class _Contexto:
+    """O que os mocks usam do grpc.ServicerContext: o metadata da chamada."""
+
+    def __init__(self, metadata):
+        self._metadata = tuple(metadata or ())
+
+    def invocation_metadata(self):
+        return self._metadata
+
+
+class _StubGrpc:
+    """Faz o papel do stub gRPC de um endpoint chamando o servicer em processo."""
+
+    def __init__(self, servicer):
+        self._servicer = servicer
+
+    def __getattr__(self, metodo):
+        handler = getattr(self._servicer, metodo)
+
+        def chamar(request, timeout=None, compression=None, metadata=None):
+            return handler(request, _Contexto(metadata))
+
+        if backends.GRPC_MODE != "async":
+            return chamar
+
+        async def chamar_async(request, timeout=None, compression=None, metadata=None):
+            return chamar(request, metadata=metadata)
+
+        return chamar_async
+
+
+def instalar_stubs():
+    falhas = Falhas()
+    backends.server_a.endpoints = [
+        backends.Endpoint("stub", None, _StubGrpc(CatalogoMock(carregar_catalogo(), falhas)))
+    ]
+    backends.server_b.endpoints = [backends.Endpoint("stub", None, _StubGrpc(OrcamentoMock(falhas)))]
+
+
+def _scope(metodo, caminho, corpo):
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": metodo,
+        "scheme": "http",
+        "path": caminho,
+        "raw_path": caminho.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"bench"),
+            (b"content-type", b"application/json"),
+            (b"accept", b"application/json"),
+            (b"accept-encoding", b"gzip, br"),
+            (b"content-length", str(len(corpo)).encode()),
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+
+
+async def requisicao(metodo, caminho, corpo=b""):
+    """Uma requisição pelo app inteiro; retorna o status."""
+    status = None
+
+    async def receive():
+        return {"type": "http.request", "body": corpo, "more_body": False}
+
+    async def send(mensagem):
+        nonlocal status
+        if mensagem["type"] == "http.response.start":
+            status = mensagem["status"]
+
+    await p_api.app(_scope(metodo, caminho, corpo), receive, send)
+    return status
+
+
+def _corpos():
+    catalogo = carregar_catalogo()["civic"]
+    itens = [pricing_pb2.Item(peca=peca, quantidade=1) for peca in catalogo.pecas[:3]]
+    orcamento = pricing_pb2.OrcamentoRequest(itens=itens)
+    _, _, total = _calcular(itens)
+    compra = pricing_pb2.CompraRequest(itens=itens, valor_total=total)
+    return orcamento, codec.codificar(orcamento), codec.codificar(compra)
+
+
+def etapas():
+    """{nome: (função, é_async)}"""
+    orcamento, corpo_orcamento, corpo_compra = _corpos()
+    preco = pricing_pb2.Preco(preco=15500.0, frete=0.0, total=15500.0)
+    metricas_calcular = _MetricasMetodo("server-b", "Calcular")
+    scope_calcular = _scope("POST", "/calcular", corpo_orcamento)
+    rotas = p_api.app.router.routes
+
+    def roteamento():
+        for rota in rotas:
+            if rota.matches(scope_calcular)[0] == Match.FULL:
+                return rota
+
+    def metricas():
+        ACTIVE_REQUESTS.inc()
+        inicio = time.time()
+        REQUEST_COUNT.labels(method='POST', endpoint='/calcular', status='200').inc()
+        REQUEST_LATENCY.labels(method='POST', endpoint='/calcular').observe(time.time() - inicio)
+        ACTIVE_REQUESTS.dec()
+
+    return {
+        "roteamento": (roteamento, False),
+        "decodificar": (lambda: codec.ler(pricing_pb2.OrcamentoRequest, corpo_orcamento, "application/json"), False),
+        "metricas": (metricas, False),
+        "metricas_grpc": (
+            lambda: metricas_calcular.registrar(
+                grpc.StatusCode.OK, 0.002, 1.0, orcamento.ByteSize(), preco.ByteSize(), True
+            ),
+            False,
+        ),
+        "codificar": (lambda: codec.codificar(preco), False),
+        "backend": (lambda: backends.server_b.chamar("Calcular", orcamento), True),
+        "GET /health": (lambda: requisicao("GET", "/health"), True),
+        "POST /get-pecas": (lambda: requisicao("POST", "/get-pecas", b'{"modelo":"Civic","ano":2023}'), True),
+        "POST /calcular": (lambda: requisicao("POST", "/calcular", corpo_orcamento), True),
+        "POST /pagar": (lambda: requisicao("POST", "/pagar", corpo_compra), True),
+    }
+
+
+def medir_tempo(loop, funcao, assincrona, iteracoes, repeticoes):
+    """Menor média em ns/op entre as repetições."""
+    if assincrona:
+        async def lote():
+            for _ in range(iteracoes):
+                await funcao()
+
+        def rodar():
+            loop.run_until_complete(lote())
+    else:
+        def rodar():
+            for _ in range(iteracoes):
+                funcao()
+
+    melhores = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter_ns()
+        rodar()
+        melhores.append((time.perf_counter_ns() - inicio) / iteracoes)
+    return min(melhores)
+
+
+def medir_alocacao(loop, funcao, assincrona, amostras=50):
+    """Mediana do pico de memória alocada (bytes) durante uma operação."""
+    picos = []
+    tracemalloc.start()
+    try:
+        for _ in range(amostras):
+            antes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            if assincrona:
+                loop.run_until_complete(funcao())
+            else:
+                funcao()
+            picos.append(tracemalloc.get_traced_memory()[1] - antes)
+    finally:
+        tracemalloc.stop()
+    return statistics.median(picos)
+
+
+def comparar(atual, baseline, tolerancia):
+    """Imprime a comparação e retorna as etapas que ficaram mais lentas."""
+    regressoes = []
+    print(f"\n{'etapa':<18}{'baseline (ns)':>15}{'atual (ns)':>13}{'variação':>11}")
+    for nome, resultado in atual["etapas"].items():
+        anterior = baseline["etapas"].get(nome)
+        if anterior is None:
+            continue
+        antes, depois = anterior["ns_op"], resultado["ns_op"]
+        variacao = (depois - antes) / antes if antes else 0.0
+        piorou = variacao > tolerancia
+        print(f"{nome:<18}{antes:>15.0f}{depois:>13.0f}{variacao:>+10.1%}{'  REGRESSÃO' if piorou else ''}")
+        if piorou:
+            regressoes.append(nome)
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iteracoes", type=int, default=2000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--rotulo", default="local", help="identifica a máquina/configuração da baseline")
+    parser.add_argument("--tolerancia", type=float, default=0.15, help="variação aceita (0.15 = 15%%)")
+    parser.add_argument("--salvar-baseline", action="store_true")
+    parser.add_argument("--saida", default=os.path.join(BENCHMARKS, "resultados"))
+    parser.add_argument("--baselines", default=os.path.join(BENCHMARKS, "baselines"))
+    args = parser.parse_args()
+
+    instalar_stubs()
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    medidas = etapas()
+
+    # Confere o caminho feliz e aquece o cache do catálogo antes de medir
+    for nome, (funcao, assincrona) in medidas.items():
+        if assincrona and " /" in nome:
+            status = loop.run_until_complete(funcao())
+            if status != 200:
+                sys.exit(f"{nome} respondeu {status}; o benchmark precisa do caminho feliz")
+
+    print(f"{'etapa':<18}{'ns/op':>12}{'pico alocado (B)':>19}")
+    resultados = {}
+    for nome, (funcao, assincrona) in medidas.items():
+        ns_op = medir_tempo(loop, funcao, assincrona, args.iteracoes, args.repeticoes)
+        pico = medir_alocacao(loop, funcao, assincrona)
+        resultados[nome] = {"ns_op": round(ns_op, 1), "pico_bytes": pico}
+        print(f"{nome:<18}{ns_op:>12.0f}{pico:>19.0f}")
+    loop.close()
+
+    resumo = {
+        "rotulo": args.rotulo,
+        "commit": commit_atual(),
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "grpc_mode": backends.GRPC_MODE,
+        "iteracoes": args.iteracoes,
+        "etapas": resultados,
+    }
+    caminho = os.path.join(args.saida, f"overhead_{args.rotulo}_{time.strftime('%Y%m%d-%H%M%S')}.json")
+    salvar_json(caminho, resumo)
+    print(f"\nresultados em {caminho}")
+
+    anterior = baseline_para_comparar(
+        os.path.join(args.baselines, f"overhead_{args.rotulo}.json"), resumo, args.salvar_baseline
+    )
+    if anterior is not None:
+        if anterior.get("grpc_mode") != resumo["grpc_mode"]:
+            print(f"atenção: baseline medida com P_API_GRPC_MODE={anterior.get('grpc_mode')}")
+        if comparar(resumo, anterior, args.tolerancia):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
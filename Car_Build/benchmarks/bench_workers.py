@@ -0,0 +1,109 @@
+"""
+Compara a P-API com 1 worker contra N workers usando o locustfile.py.
+
+Para cada quantidade de workers, sobe a P-API pelo launcher.py em uma porta
+local, espera o /ready (fim do aquecimento), roda o Locust em modo headless com o
+mesmo número de usuários e imprime RPS, latências e falhas lado a lado.
+Server A, Server B e o PostgreSQL precisam estar rodando (docker compose),
+ou, com `--mock`, os backends falsos do mock_backends.py sobem junto (os
+argumentos entre aspas vão para ele) e o resultado mede só a P-API.
+
+Uso (a partir de Car_Build/):
+    python benchmarks/bench_workers.py --workers 1 4 --usuarios 2500 --duracao 2m
+    python benchmarks/bench_workers.py --mock="--latencia GetPecas=fixa:0.005"
+"""
+import argparse
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from locust_csv import ler_agregado
+
+
+CAR_BUILD = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+P_API = os.path.join(CAR_BUILD, "P-Api")
+MOCK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_backends.py")
+
+
+def esperar_pronto(url, timeout=30):
+    limite = time.time() + timeout
+    while time.time() < limite:
+        try:
+            # 503 (ainda aquecendo) chega como HTTPError, que também é OSError
+            with urllib.request.urlopen(f"{url}/ready", timeout=1) as resp:
+                if resp.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"P-API não ficou pronta em {url}/ready")
+
+
+def rodar(workers, args, saida):
+    url = f"http://127.0.0.1:{args.porta}"
+    env = dict(os.environ, P_API_WORKERS=str(workers), P_API_PORT=str(args.porta))
+    if args.mock is not None:
+        env.update(SERVER_A_HOST="127.0.0.1", SERVER_B_HOST="127.0.0.1")
+    api = subprocess.Popen([sys.executable, "launcher.py"], cwd=P_API, env=env)
+    try:
+        esperar_pronto(url)
+        prefixo = os.path.join(saida, f"workers_{workers}")
+        subprocess.run(
+            [
+                "locust", "-f", os.path.join(CAR_BUILD, "locustfile.py"),
+                "--headless", "--only-summary",
+                "--host", url,
+                "--users", str(args.usuarios),
+                "--spawn-rate", str(args.spawn_rate),
+                "--run-time", args.duracao,
+                "--csv", prefixo,
+            ],
+            check=True,
+        )
+        return ler_agregado(prefixo)
+    finally:
+        api.terminate()
+        api.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--usuarios", type=int, default=2500)
+    parser.add_argument("--spawn-rate", type=float, default=100)
+    parser.add_argument("--duracao", default="2m")
+    parser.add_argument("--porta", type=int, default=8010)
+    parser.add_argument("--saida", default=None, help="diretório para os CSVs do Locust")
+    parser.add_argument("--mock", nargs="?", const="", default=None, metavar="ARGS",
+                        help="sobe o mock_backends.py no lugar do Server A/B (ARGS vão para ele)")
+    args = parser.parse_args()
+
+    saida = args.saida or tempfile.mkdtemp(prefix="bench-workers-")
+    os.makedirs(saida, exist_ok=True)
+
+    mock = None
+    if args.mock is not None:
+        mock = subprocess.Popen([sys.executable, MOCK, "--host", "127.0.0.1", *shlex.split(args.mock)])
+    try:
+        resultados = [(workers, rodar(workers, args, saida)) for workers in args.workers]
+    finally:
+        if mock is not None:
+            mock.terminate()
+            mock.wait(timeout=30)
+
+    print(f"\nCSVs em {saida}\n")
+    print(f"{'workers':>8}{'RPS':>10}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}{'falhas':>9}")
+    base = resultados[0][1]["rps"] or 1
+    for workers, r in resultados:
+        print(
+            f"{workers:>8}{r['rps']:>10.1f}{r['p50']:>10.0f}{r['p95']:>10.0f}{r['p99']:>10.0f}"
+            f"{r['falhas']:>9}   ({r['rps'] / base:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
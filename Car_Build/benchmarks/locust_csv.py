@@ -0,0 +1,18 @@
+"""Leitura dos CSVs gerados pelo Locust com `--csv <prefixo>`."""
+import csv
+
+
+def ler_agregado(prefixo):
+    """Linha "Aggregated" de `<prefixo>_stats.csv` com os números já convertidos."""
+    with open(f"{prefixo}_stats.csv", newline="") as f:
+        for linha in csv.DictReader(f):
+            if linha["Name"] == "Aggregated":
+                return {
+                    "requisicoes": int(linha["Request Count"]),
+                    "falhas": int(linha["Failure Count"]),
+                    "rps": float(linha["Requests/s"]),
+                    "p50": float(linha["50%"]),
+                    "p95": float(linha["95%"]),
+                    "p99": float(linha["99%"]),
+                }
+    raise ValueError(f"{prefixo}_stats.csv sem a linha 'Aggregated'")
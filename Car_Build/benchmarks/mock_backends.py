@@ -0,0 +1,287 @@
+"""
+Server A e Server B falsos, em Python, para medir a P-API sem o Node e sem o
+PostgreSQL.
+
+Implementam CatalogoService (GetPecas, GetVersao) e OrcamentoService
+(Calcular, RealizarCompra, CalcularLote) sobre os servicers gerados em
+P-Api/generated:
+
+- as peças vêm dos INSERTs de database/init.sql (mesmos ids do SERIAL e
+  mesma ordem por nome do Server A); `--pecas-extras N` acrescenta N peças
+  sintéticas por modelo para aumentar a resposta do GetPecas;
+- Calcular, CalcularLote e RealizarCompra seguem as regras do Server B (um
+  chassi por pedido, R$ 15 de frete por item com mínimo de R$ 20, frete
+  grátis acima de R$ 10.000, total conferido com tolerância de 1 centavo);
+- RealizarCompra com o metadata idempotency-key devolve a compra anterior da
+  chave (repetida=true), como o registro em PostgreSQL do Server B;
+- latência e erros são injetados por método:
+    --latencia GetPecas=lognormal:0.005:0.5 --latencia Calcular=fixa:0.002
+    --erros RealizarCompra=0.01 --codigo-erro UNAVAILABLE
+  Distribuições (valores em segundos): fixa:s, uniforme:min:max,
+  exponencial:media, lognormal:mediana:sigma.
+
+Como subprocesso (a P-API acha os dois em localhost:50051/50052):
+    python benchmarks/mock_backends.py --latencia GetPecas=fixa:0.005
+
+No mesmo processo (ex.: em outro benchmark):
+    import mock_backends
+    servidores = mock_backends.iniciar(latencias={"GetPecas": "fixa:0.005"})
+    ...
+    mock_backends.parar(servidores)
+
+As RPCs rodam no pool de `--threads` threads do servidor gRPC; a latência
+injetada ocupa uma thread, então o pool limita a vazão a threads / latência.
+"""
+import argparse
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from concurrent import futures
+from datetime import datetime, timezone
+
+import grpc
+
+CAR_BUILD = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(CAR_BUILD, "P-Api"))
+
+from generated import catalogo_pb2, catalogo_pb2_grpc, common_pb2, pricing_pb2, pricing_pb2_grpc  # noqa: E402
+
+
+INIT_SQL = os.path.join(CAR_BUILD, "database", "init.sql")
+METODOS = ("GetPecas", "GetVersao", "Calcular", "RealizarCompra", "CalcularLote")
+
+_PECA_SQL = re.compile(r"\('((?:[^']|'')*)',\s*([\d.]+),\s*'([^']*)'\)")
+
+
+def carregar_catalogo(caminho=INIT_SQL, extras=0):
+    """{modelo: [Peca, ...]} a partir dos INSERT INTO pecas do init.sql."""
+    with open(caminho, encoding="utf-8") as f:
+        sql = f.read()
+    catalogo = {}
+    proximo_id = 1
+    for bloco in re.findall(r"INSERT INTO pecas \(nome, valor, modelo_fk\) VALUES(.*?);", sql, re.S):
+        for nome, valor, modelo in _PECA_SQL.findall(bloco):
+            catalogo.setdefault(modelo.lower(), []).append(
+                common_pb2.Peca(id=str(proximo_id), nome=nome.replace("''", "'"), valor=float(valor))
+            )
+            proximo_id += 1
+    for modelo, pecas in catalogo.items():
+        for i in range(extras):
+            pecas.append(common_pb2.Peca(id=str(proximo_id), nome=f"Peça extra {i + 1:05d}", valor=10.0 + i % 90))
+            proximo_id += 1
+        # O Server A ordena por nome (ORDER BY nome)
+        pecas.sort(key=lambda peca: peca.nome)
+    # Catálogo fixo: a versão nunca muda
+    return {modelo: catalogo_pb2.PecasResponse(pecas=pecas, versao="1") for modelo, pecas in catalogo.items()}
+
+
+def distribuicao(especificacao):
+    """"lognormal:0.005:0.5" -> função sem argumentos que sorteia a latência em segundos."""
+    nome, *parametros = especificacao.split(":")
+    try:
+        valores = [float(p) for p in parametros]
+        if nome == "fixa":
+            (segundos,) = valores
+            return lambda: segundos
+        if nome == "uniforme":
+            minimo, maximo = valores
+            return lambda: random.uniform(minimo, maximo)
+        if nome == "exponencial":
+            (media,) = valores
+            return lambda: random.expovariate(1 / media)
+        if nome == "lognormal":
+            mediana, sigma = valores
+            return lambda: random.lognormvariate(math.log(mediana), sigma)
+    except ValueError:
+        pass
+    raise ValueError(f"distribuição de latência inválida: {especificacao}")
+
+
+def _por_metodo(valores, converter):
+    """{"GetPecas": "fixa:0.005"} ou ["GetPecas=fixa:0.005"] -> {"GetPecas": converter(...)}"""
+    if not valores:
+        return {}
+    if not isinstance(valores, dict):
+        valores = dict(item.split("=", 1) for item in valores)
+    desconhecidos = set(valores) - set(METODOS)
+    if desconhecidos:
+        raise ValueError(f"métodos desconhecidos: {', '.join(sorted(desconhecidos))}")
+    return {metodo: converter(valor) for metodo, valor in valores.items()}
+
+
+class Falhas:
+    """Latência e erros injetados, sorteados a cada chamada."""
+
+    def __init__(self, latencias=None, erros=None, codigo_erro=grpc.StatusCode.UNAVAILABLE):
+        self.latencias = _por_metodo(latencias, lambda v: distribuicao(v) if isinstance(v, str) else v)
+        self.erros = _por_metodo(erros, float)
+        self.codigo_erro = codigo_erro
+
+    def aplicar(self, metodo, context):
+        latencia = self.latencias.get(metodo)
+        if latencia is not None:
+            time.sleep(latencia())
+        if random.random() < self.erros.get(metodo, 0.0):
+            context.abort(self.codigo_erro, f"erro injetado pelo mock em {metodo}")
+
+
+def _calcular(itens):
+    """Regras do calcularPrecoTotal do Server B: (subtotal, frete, total)."""
+    chassis = sum(item.quantidade for item in itens if "chassi" in item.peca.nome.lower())
+    if chassis > 1:
+        raise ValueError("Somente um chassi é permitido por pedido")
+    subtotal = sum(item.peca.valor * item.quantidade for item in itens)
+    frete = sum(item.quantidade for item in itens) * 15.0
+    if subtotal > 10000:
+        frete = 0.0
+    if 0 < frete < 20:
+        frete = 20.0
+    return subtotal, frete, subtotal + frete
+
+
+class CatalogoMock(catalogo_pb2_grpc.CatalogoServiceServicer):
+    def __init__(self, catalogo, falhas):
+        self.catalogo = catalogo
+        self.falhas = falhas
+        self.vazio = catalogo_pb2.PecasResponse(versao="0")
+
+    def GetPecas(self, request, context):
+        self.falhas.aplicar("GetPecas", context)
+        return self.catalogo.get(request.modelo.lower(), self.vazio)
+
+    def GetVersao(self, request, context):
+        self.falhas.aplicar("GetVersao", context)
+        return catalogo_pb2.VersaoCatalogo(versao="1" if request.modelo.lower() in self.catalogo else "0")
+
+
+class OrcamentoMock(pricing_pb2_grpc.OrcamentoServiceServicer):
+    def __init__(self, falhas):
+        self.falhas = falhas
+        # Idempotency-Key -> (impressão do pedido, CompraResponse); sem validade, vale pelo processo
+        self.compras = {}
+        self._trava = threading.Lock()
+
+    def Calcular(self, request, context):
+        self.falhas.aplicar("Calcular", context)
+        try:
+            subtotal, frete, total = _calcular(request.itens)
+        except ValueError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        return pricing_pb2.Preco(preco=subtotal, frete=frete, total=total)
+
+    def CalcularLote(self, request, context):
+        self.falhas.aplicar("CalcularLote", context)
+        resultados = []
+        for pedido in request.pedidos:
+            try:
+                subtotal, frete, total = _calcular(pedido.itens)
+                resultados.append(pricing_pb2.OrcamentoResultado(
+                    preco=pricing_pb2.Preco(preco=subtotal, frete=frete, total=total)
+                ))
+            except ValueError as e:
+                resultados.append(pricing_pb2.OrcamentoResultado(erro=str(e)))
+        return pricing_pb2.OrcamentoLoteResponse(resultados=resultados)
+
+    def RealizarCompra(self, request, context):
+        self.falhas.aplicar("RealizarCompra", context)
+        chave = dict(context.invocation_metadata()).get("idempotency-key")
+        if chave is None:
+            return self._comprar(request, context)
+        impressao = request.SerializeToString(deterministic=True)
+        # A compra do mock é instantânea: segurar a trava durante ela dispensa o estado "em andamento"
+        with self._trava:
+            anterior = self.compras.get(chave)
+            if anterior is None:
+                resposta = self._comprar(request, context)
+                self.compras[chave] = (impressao, resposta)
+                return resposta
+        impressao_original, resposta = anterior
+        if impressao != impressao_original:
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, "Idempotency-Key já usada com outro corpo de requisição")
+        repetida = pricing_pb2.CompraResponse()
+        repetida.CopyFrom(resposta)
+        repetida.repetida = True
+        return repetida
+
+    def _comprar(self, request, context):
+        try:
+            subtotal, frete, total = _calcular(request.itens)
+        except ValueError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        if abs(total - request.valor_total) > 0.01:
+            context.abort(
+                grpc.StatusCode.INVALID_ARGUMENT,
+                f"Valor total não confere. Calculado: R$ {total:.2f}, Enviado: R$ {request.valor_total:.2f}",
+            )
+        return pricing_pb2.CompraResponse(
+            pedido_id=f"PED-{int(time.time() * 1000)}-{uuid.uuid4().hex[:9].upper()}",
+            status="CONFIRMADO",
+            valor_total=total,
+            data_pedido=datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+            itens_comprados=request.itens,
+            subtotal=subtotal,
+            frete=frete,
+        )
+
+
+def iniciar(host="127.0.0.1", porta_catalogo=50051, porta_orcamento=50052, latencias=None, erros=None,
+            codigo_erro=grpc.StatusCode.UNAVAILABLE, pecas_extras=0, threads=64):
+    """Sobe os dois servidores em threads deste processo e retorna (catalogo, orcamento)."""
+    falhas = Falhas(latencias, erros, codigo_erro)
+
+    catalogo = grpc.server(futures.ThreadPoolExecutor(max_workers=threads))
+    catalogo_pb2_grpc.add_CatalogoServiceServicer_to_server(
+        CatalogoMock(carregar_catalogo(extras=pecas_extras), falhas), catalogo
+    )
+    catalogo.add_insecure_port(f"{host}:{porta_catalogo}")
+
+    orcamento = grpc.server(futures.ThreadPoolExecutor(max_workers=threads))
+    pricing_pb2_grpc.add_OrcamentoServiceServicer_to_server(OrcamentoMock(falhas), orcamento)
+    orcamento.add_insecure_port(f"{host}:{porta_orcamento}")
+
+    catalogo.start()
+    orcamento.start()
+    return catalogo, orcamento
+
+
+def parar(servidores, espera=1):
+    for servidor in servidores:
+        servidor.stop(espera).wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--porta-catalogo", type=int, default=50051)
+    parser.add_argument("--porta-orcamento", type=int, default=50052)
+    parser.add_argument("--latencia", action="append", default=[], metavar="METODO=DISTRIBUICAO")
+    parser.add_argument("--erros", action="append", default=[], metavar="METODO=TAXA")
+    parser.add_argument("--codigo-erro", default="UNAVAILABLE", choices=[c.name for c in grpc.StatusCode])
+    parser.add_argument("--pecas-extras", type=int, default=0, help="peças sintéticas a mais por modelo")
+    parser.add_argument("--threads", type=int, default=64)
+    args = parser.parse_args()
+
+    try:
+        servidores = iniciar(
+            args.host, args.porta_catalogo, args.porta_orcamento, args.latencia, args.erros,
+            grpc.StatusCode[args.codigo_erro], args.pecas_extras, args.threads,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"[MOCK] CatalogoService em {args.host}:{args.porta_catalogo}, "
+          f"OrcamentoService em {args.host}:{args.porta_orcamento}", flush=True)
+    try:
+        servidores[0].wait_for_termination()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        parar(servidores)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Gravação dos resumos dos benchmarks em JSON e leitura/gravação das baselines."""
+import json
+import os
+import subprocess
+
+
+CAR_BUILD = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def commit_atual():
+    """Hash curto do HEAD, ou None fora de um repositório git."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=CAR_BUILD, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def salvar_json(caminho, dados):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, "w") as f:
+        json.dump(dados, f, indent=2, ensure_ascii=False)
+
+
+def baseline_para_comparar(caminho, atual, salvar, prefixo=""):
+    """
+    Com `salvar`, grava `atual` como a baseline em `caminho` e retorna None.
+    Sem ele, retorna a baseline gravada (None se ainda não existir).
+    `prefixo` vai no começo das mensagens (ex.: "[carga_2500] ").
+    """
+    if salvar:
+        salvar_json(caminho, atual)
+        print(f"{prefixo}baseline salva em {caminho}")
+        return None
+    if not os.path.exists(caminho):
+        print(f"{prefixo}sem baseline em {caminho}; use --salvar-baseline para criar")
+        return None
+    with open(caminho) as f:
+        baseline = json.load(f)
+    print(f"{prefixo}comparando com a baseline de {baseline['data']} (commit {baseline['commit']})")
+    return baseline
@@ -20,6 +20,45 @@ CREATE TABLE IF NOT EXISTS pecas (
 CREATE INDEX IF NOT EXISTS idx_pecas_modelo_fk ON pecas(modelo_fk);
 CREATE INDEX IF NOT EXISTS idx_carros_modelo ON carros(modelo);
 
+-- Versão do catálogo por modelo (GetVersao do Server A): incrementada a cada
+-- INSERT/UPDATE/DELETE em pecas, permite à P-API revalidar o cache sem
+-- buscar as peças de novo
+CREATE TABLE IF NOT EXISTS catalogo_versao (
+    modelo VARCHAR(50) PRIMARY KEY,
+    versao BIGINT NOT NULL DEFAULT 1
+);
+
+CREATE OR REPLACE FUNCTION incrementar_versao_catalogo()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO catalogo_versao (modelo) VALUES (LOWER(OLD.modelo_fk))
+        ON CONFLICT (modelo) DO UPDATE SET versao = catalogo_versao.versao + 1;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO catalogo_versao (modelo) VALUES (LOWER(NEW.modelo_fk))
+        ON CONFLICT (modelo) DO UPDATE SET versao = catalogo_versao.versao + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER trg_pecas_versao_catalogo
+AFTER INSERT OR UPDATE OR DELETE ON pecas
+FOR EACH ROW EXECUTE FUNCTION incrementar_versao_catalogo();
+
+-- Compras por Idempotency-Key (RealizarCompra do Server B): a chave é
+-- registrada antes da compra e guarda a resposta, então repetições vindas de
+-- qualquer worker/pod da P-API ou réplica do Server B recebem o mesmo pedido.
+-- resposta NULL = compra em andamento
+CREATE TABLE IF NOT EXISTS compras_idempotentes (
+    chave VARCHAR(255) PRIMARY KEY,
+    impressao CHAR(64) NOT NULL,
+    resposta JSONB,
+    criado_em TIMESTAMP NOT NULL DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_compras_idempotentes_criado_em ON compras_idempotentes(criado_em);
+
 -- Popular tabela de carros
 INSERT INTO carros (modelo, ano) VALUES 
     ('fusca', 2014),
@@ -1,6 +1,12 @@
 from locust import HttpUser, task, between
+import os
 import random
 
+# Semente fixa para repetir a mesma sequência de escolhas entre execuções
+# (usada pelo benchmarks/bench_cenarios.py)
+if os.getenv("LOCUST_SEED"):
+    random.seed(int(os.environ["LOCUST_SEED"]))
+
 class CarBuildUser(HttpUser):
     """
     Simula usuários interagindo com a API de peças de carros.
@@ -162,6 +168,62 @@ class CarBuildUser(HttpUser):
             except Exception as e:
                 print(f"Erro no fluxo de compra: {e}")
 
+    @task(0)
+    def checkout(self):
+        """Fluxo de compra em uma requisição (/checkout); fora do mix padrão (peso 0)"""
+        carro = random.choice([
+            {"modelo": "Civic", "ano": 2023},
+            {"modelo": "Corolla", "ano": 2020},
+        ])
+        pecas_response = self.client.post("/get-pecas", json=carro)
+        if pecas_response.status_code != 200:
+            return
+        pecas = pecas_response.json().get("pecas", [])
+        if not pecas:
+            return
+
+        selecionadas = random.sample(pecas, random.randint(1, min(3, len(pecas))))
+        payload = {
+            "carro": carro,
+            "itens": [{"id": peca["id"], "quantidade": 1} for peca in selecionadas],
+        }
+        with self.client.post("/checkout", json=payload, catch_response=True) as response:
+            if response.status_code == 200 and "pedidoId" in response.text:
+                response.success()
+            else:
+                response.failure(f"Status {response.status_code}")
+
+
+def aplicar_pesos(user_class, pesos):
+    """
+    Substitui os pesos das tarefas de `user_class` a partir de
+    "tarefa=peso,..." (tarefas não listadas mantêm o peso do @task).
+    """
+    tarefas = {
+        nome: metodo for nome, metodo in vars(user_class).items()
+        if hasattr(metodo, "locust_task_weight")
+    }
+    definidos = {}
+    for item in pesos.split(","):
+        if not item.strip():
+            continue
+        nome, _, peso = item.partition("=")
+        nome = nome.strip()
+        if nome not in tarefas:
+            raise ValueError(f"tarefa desconhecida em LOCUST_TASK_WEIGHTS: {nome}")
+        definidos[nome] = int(peso)
+    lista = []
+    for nome, metodo in tarefas.items():
+        lista.extend([metodo] * definidos.get(nome, metodo.locust_task_weight))
+    if not lista:
+        raise ValueError("LOCUST_TASK_WEIGHTS zerou todas as tarefas")
+    user_class.tasks = lista
+
+
+# Pesos por cenário, ex.: LOCUST_TASK_WEIGHTS="get_pecas=3,calcular=1,pagar=1,health_check=0"
+if os.getenv("LOCUST_TASK_WEIGHTS"):
+    aplicar_pesos(CarBuildUser, os.environ["LOCUST_TASK_WEIGHTS"])
+
 
 # class HeavyLoadUser(HttpUser):
 #     """
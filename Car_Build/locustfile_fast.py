@@ -0,0 +1,24 @@
+"""
+Variante do CarBuildUser com o FastHttpUser (geventhttpclient).
+
+O HttpUser usa `requests`, que gasta bem mais CPU por requisição; com
+milhares de usuários em uma máquina, o próprio Locust satura antes da
+P-API. As tarefas (e os pesos de LOCUST_TASK_WEIGHTS) são as mesmas do
+locustfile.py.
+
+Uso:
+    locust -f locustfile.py,locustfile_fast.py CarBuildFastUser
+"""
+from locust import FastHttpUser, between
+
+# Importa o módulo, não a classe: o Locust só roda as classes User que
+# aparecem no namespace do locustfile
+import locustfile
+
+
+class CarBuildFastUser(FastHttpUser):
+    """Mesmas tarefas e ritmo do CarBuildUser, com o cliente HTTP do FastHttpUser."""
+
+    wait_time = between(1, 3)
+    host = "http://localhost:8000"
+    tasks = locustfile.CarBuildUser.tasks
@@ -0,0 +1,107 @@
+"""
+Usuários do Locust que chamam o Server A e o Server B direto por gRPC, sem
+passar pela P-API, com os stubs de P-Api/generated.
+
+Cada RPC vai para o evento `request` do Locust com request_type "gRPC" e o
+nome do endpoint HTTP equivalente (/get-pecas, /calcular, /pagar). Rodando
+junto com o CarBuildUser, cada endpoint aparece em duas linhas nas
+estatísticas (POST e gRPC) e a diferença entre elas é o custo da P-API:
+
+    locust -f locustfile.py,locustfile_grpc.py CarBuildUser CarBuildGrpcUser
+
+Endereços dos backends: LOCUST_GRPC_CATALOGO (padrão localhost:50051) e
+LOCUST_GRPC_ORCAMENTO (padrão localhost:50052).
+"""
+import os
+import random
+import sys
+import time
+
+import grpc
+import grpc.experimental.gevent as grpc_gevent
+from locust import User, task, between
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "P-Api"))
+
+from generated import catalogo_pb2, catalogo_pb2_grpc, pricing_pb2, pricing_pb2_grpc  # noqa: E402
+
+# O Locust roda os usuários em greenlets: sem isso, cada RPC bloquearia o processo inteiro
+grpc_gevent.init_gevent()
+
+CATALOGO = os.getenv("LOCUST_GRPC_CATALOGO", "localhost:50051")
+ORCAMENTO = os.getenv("LOCUST_GRPC_ORCAMENTO", "localhost:50052")
+TIMEOUT = float(os.getenv("LOCUST_GRPC_TIMEOUT", "10"))
+
+
+class CarBuildGrpcUser(User):
+    """Mesmos fluxos do CarBuildUser (get-pecas, calcular, pagar), direto nos backends."""
+
+    wait_time = between(1, 3)
+
+    # Um canal por processo e backend, como a P-API faz: 7500 usuários não
+    # devem abrir 7500 conexões
+    _catalogo = None
+    _orcamento = None
+
+    def on_start(self):
+        cls = CarBuildGrpcUser
+        if cls._catalogo is None:
+            cls._catalogo = catalogo_pb2_grpc.CatalogoServiceStub(grpc.insecure_channel(CATALOGO))
+            cls._orcamento = pricing_pb2_grpc.OrcamentoServiceStub(grpc.insecure_channel(ORCAMENTO))
+
+    def _rpc(self, nome, metodo, request):
+        """Chama o RPC e reporta ao Locust; retorna a resposta ou None em erro."""
+        inicio = time.perf_counter()
+        resposta = None
+        erro = None
+        try:
+            resposta = metodo(request, timeout=TIMEOUT)
+        except grpc.RpcError as e:
+            erro = e
+        self.environment.events.request.fire(
+            request_type="gRPC",
+            name=nome,
+            response_time=(time.perf_counter() - inicio) * 1000,
+            response_length=resposta.ByteSize() if resposta is not None else 0,
+            response=resposta,
+            context={},
+            exception=erro,
+        )
+        return resposta
+
+    def _pecas(self, modelo, ano):
+        resposta = self._rpc("/get-pecas", self._catalogo.GetPecas, catalogo_pb2.Carro(modelo=modelo, ano=ano))
+        return list(resposta.pecas) if resposta is not None else []
+
+    @task(1)
+    def get_pecas(self):
+        carro = random.choice([("Civic", 2023), ("Corolla", 2020), ("Fusca", 2014)])
+        self._pecas(*carro)
+
+    @task(1)
+    def calcular(self):
+        pecas = self._pecas("Civic", 2023)
+        if not pecas:
+            return
+        itens = [
+            pricing_pb2.Item(peca=peca, quantidade=1)
+            for peca in random.sample(pecas, random.randint(1, min(5, len(pecas))))
+        ]
+        self._rpc("/calcular", self._orcamento.Calcular, pricing_pb2.OrcamentoRequest(itens=itens))
+
+    @task(1)
+    def pagar(self):
+        pecas = self._pecas("Corolla", 2021)
+        if not pecas:
+            return
+        itens = [
+            pricing_pb2.Item(peca=peca, quantidade=1)
+            for peca in random.sample(pecas, random.randint(1, min(3, len(pecas))))
+        ]
+        preco = self._rpc("/calcular", self._orcamento.Calcular, pricing_pb2.OrcamentoRequest(itens=itens))
+        if preco is None:
+            return
+        self._rpc(
+            "/pagar", self._orcamento.RealizarCompra,
+            pricing_pb2.CompraRequest(itens=itens, valor_total=preco.total),
+        )